@@ -1,14 +1,217 @@
-from django.contrib import admin
-from .models import SRIFactura
+from datetime import date
+
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import ValidationError
+from django.db.models import Max, Sum
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from inventario_de_obra.admin import VerificarStockAlEliminarMixin
+from inventario_de_obra.models import EntradaInventario, GastoMaterialMes
+from rubros.autocompletar import AutocompletarRecursosMixin
+from tareas.models import Tarea
+
+from .materiales import CatalogoMateriales, aprender_codigo, registrar_entradas
+from .models import CodigoProveedorMaterial, DetalleFactura, GastoProveedorMes, SRIFactura, inicio_de_mes
+from .sri import importar_facturas, leer_archivos_subidos
+
+
+class ArchivosMultiplesInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class ArchivosMultiplesField(forms.FileField):
+    def clean(self, data, initial=None):
+        if isinstance(data, (list, tuple)):
+            return [super(ArchivosMultiplesField, self).clean(archivo, initial) for archivo in data]
+        return [super().clean(data, initial)]
+
+
+class ImportarFacturasForm(forms.Form):
+    archivos = ArchivosMultiplesField(
+        widget=ArchivosMultiplesInput(attrs={'accept': '.xml,.zip'}),
+        help_text="XML de autorización del SRI o zips con varios de ellos.",
+    )
+    entradas = forms.BooleanField(
+        required=False, initial=True,
+        help_text="Registrar como entradas de inventario las líneas que coincidan con un material.",
+    )
+    segundo_plano = forms.BooleanField(
+        required=False, initial=True,
+        help_text="Encolar la importación como tarea; el resultado queda en Tareas.",
+    )
+
+
+class ReporteGastosForm(forms.Form):
+    desde = forms.DateField(input_formats=['%Y-%m'], widget=forms.DateInput(attrs={'type': 'month'}, format='%Y-%m'))
+    hasta = forms.DateField(input_formats=['%Y-%m'], widget=forms.DateInput(attrs={'type': 'month'}, format='%Y-%m'))
+
+    def clean(self):
+        datos = super().clean()
+        if datos.get('desde') and datos.get('hasta') and datos['desde'] > datos['hasta']:
+            raise ValidationError("El mes inicial es posterior al final.")
+        return datos
+
+
+class DetalleFacturaInline(AutocompletarRecursosMixin, admin.TabularInline):
+    model = DetalleFactura
+    extra = 0
+    fields = ('codigo_principal', 'descripcion', 'cantidad', 'precio_unitario', 'precio_total_sin_impuesto', 'material', 'entrada')
+    readonly_fields = ('codigo_principal', 'descripcion', 'cantidad', 'precio_unitario', 'precio_total_sin_impuesto', 'entrada')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.action(description="Registrar entradas de inventario de las líneas con material")
+def registrar_entradas_facturas(modeladmin, request, queryset):
+    detalles = list(DetalleFactura.objects.filter(factura__in=queryset, entrada=None).select_related('factura'))
+    catalogo = CatalogoMateriales()
+    catalogo.cargar_proveedores({detalle.factura.ruc for detalle in detalles})
+    catalogo.emparejar(detalles, lambda detalle: detalle.factura.ruc)
+    DetalleFactura.objects.bulk_update([detalle for detalle in detalles if detalle.material_id], ['material'], batch_size=500)
+    catalogo.guardar_codigos()
+    try:
+        creadas = registrar_entradas(detalles)
+    except ValidationError as error:
+        modeladmin.message_user(request, ' '.join(error.messages), messages.ERROR)
+        return
+    sin_material = sum(1 for detalle in detalles if not detalle.material_id)
+    modeladmin.message_user(request, f"Entradas registradas: {creadas}. Líneas sin material: {sin_material}.")
+
 
 @admin.register(SRIFactura)
-class SRIFacturaAdmin(admin.ModelAdmin):
-    list_display = ('numero_factura', 'nombre', 'nombre_comercial', 'ruc', 'numero_autorizacion', 'fecha',)
+class SRIFacturaAdmin(VerificarStockAlEliminarMixin, admin.ModelAdmin):
+    list_display = ('numero_factura', 'nombre', 'nombre_comercial', 'ruc', 'numero_autorizacion', 'fecha', 'importe_total')
     search_fields = ('ruc', 'numero_factura', 'numero_autorizacion', 'nombre', 'nombre_comercial')
     list_filter = ( 'nombre_comercial',)
+    change_list_template = 'admin/contabilidad/srifactura/change_list.html'
+    inlines = [DetalleFacturaInline]
+    actions = [registrar_entradas_facturas]
+
+    def retiros_al_eliminar(self, objs):
+        # Las entradas de inventario de la factura se eliminan con ella
+        return EntradaInventario.retiros_al_eliminar(EntradaInventario.objects.filter(factura__in=[obj.pk for obj in objs]))
+
+    def save_formset(self, request, form, formset, change):
+        super().save_formset(request, form, formset, change)
+        # El material elegido a mano para una linea se recuerda para ese codigo del proveedor
+        for formulario in formset.forms:
+            if 'material' in formulario.changed_data:
+                aprender_codigo(formulario.instance)
+
+    def get_urls(self):
+        urls = [
+            path('importar-xml/', self.admin_site.admin_view(self.importar_xml_view), name='contabilidad_importar_facturas'),
+        ]
+        return urls + super().get_urls()
+
+    # Carga de facturas desde los XML del SRI: encolada como tarea o, en la peticion, en el mismo proceso
+    def importar_xml_view(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:contabilidad_srifactura_changelist')
+
+        resultado = None
+        form = ImportarFacturasForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid() and form.cleaned_data['segundo_plano']:
+            tarea = Tarea.encolar(
+                'importar_facturas_sri', {'entradas': form.cleaned_data['entradas']},
+                archivos=[(archivo.name, archivo.read()) for archivo in form.cleaned_data['archivos']], usuario=request.user,
+            )
+            self.message_user(request, f"Importación encolada como tarea #{tarea.pk}.")
+            return redirect('admin:tareas_tarea_change', tarea.pk)
+        if request.method == 'POST' and form.is_valid():
+            resultado = importar_facturas(
+                leer_archivos_subidos(form.cleaned_data['archivos']), procesos=1, entradas=form.cleaned_data['entradas'],
+            )
+            self.message_user(
+                request,
+                f"Facturas importadas: {resultado.creadas}. Ya registradas: {len(resultado.duplicadas)}. "
+                f"En conflicto: {len(resultado.conflictos)}. "
+                f"Entradas de inventario: {resultado.entradas} de {resultado.detalles} líneas.",
+            )
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Importar facturas del SRI',
+            'form': form,
+            'resultado': resultado,
+        }
+        return TemplateResponse(request, 'admin/contabilidad/importar_facturas.html', context)
+
+
+@admin.register(CodigoProveedorMaterial)
+class CodigoProveedorMaterialAdmin(AutocompletarRecursosMixin, admin.ModelAdmin):
+    list_display = ('ruc', 'codigo', 'material')
+    search_fields = ('ruc', 'codigo', 'material__nombre')
+    list_select_related = ('material',)
+
+
+@admin.register(GastoProveedorMes)
+class GastoProveedorMesAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'ruc', 'mes', 'facturas', 'total_sin_impuestos', 'importe_total')
+    search_fields = ('ruc', 'nombre')
+    date_hierarchy = 'mes'
+    ordering = ('-mes', '-importe_total')
+    change_list_template = 'admin/contabilidad/gastoproveedormes/change_list.html'
+    LIMITE_REPORTE = 50
+
+    # Se mantiene con las facturas (reconstruir_gastos_proveedores)
+    def has_add_permission(self, request):
+        return False
 
+    def has_change_permission(self, request, obj=None):
+        return False
 
+    def has_delete_permission(self, request, obj=None):
+        return False
 
+    def get_urls(self):
+        urls = [
+            path('reporte/', self.admin_site.admin_view(self.reporte_view), name='contabilidad_reporte_gastos'),
+        ]
+        return urls + super().get_urls()
 
+    # Gasto por mes, proveedor y material en un rango de meses; solo lee las tablas de gasto mensual
+    def reporte_view(self, request):
+        if not self.has_view_permission(request):
+            return redirect('admin:index')
 
+        hoy = date.today()
+        inicial = {'desde': date(hoy.year - 1, hoy.month, 1), 'hasta': inicio_de_mes(hoy)}
+        form = ReporteGastosForm(request.GET if 'desde' in request.GET else None, initial=inicial)
+        rango = (form.cleaned_data['desde'], form.cleaned_data['hasta']) if form.is_valid() else (inicial['desde'], inicial['hasta'])
 
+        proveedores = GastoProveedorMes.objects.filter(mes__range=rango)
+        materiales = GastoMaterialMes.objects.filter(mes__range=rango)
+        facturas_por_mes = {
+            fila['mes']: fila for fila in proveedores.order_by().values('mes').annotate(
+                facturas=Sum('facturas'), total_sin_impuestos=Sum('total_sin_impuestos'), importe_total=Sum('importe_total'),
+            )
+        }
+        compras_por_mes = dict(materiales.order_by().values('mes').annotate(valor=Sum('valor')).values_list('mes', 'valor'))
+        por_mes = [
+            {'mes': mes, **facturas_por_mes.get(mes, {}), 'compras_materiales': compras_por_mes.get(mes)}
+            for mes in sorted(facturas_por_mes.keys() | compras_por_mes.keys())
+        ]
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Reporte de gastos',
+            'form': form,
+            'por_mes': por_mes,
+            'totales': proveedores.aggregate(
+                facturas=Sum('facturas'), total_sin_impuestos=Sum('total_sin_impuestos'), importe_total=Sum('importe_total'),
+            ),
+            'proveedores': proveedores.order_by().values('ruc').annotate(
+                nombre=Max('nombre'), facturas=Sum('facturas'), importe_total=Sum('importe_total'),
+            ).order_by('-importe_total')[:self.LIMITE_REPORTE],
+            'materiales': materiales.order_by().values('material', 'material__nombre', 'material__unidad__abreviatura').annotate(
+                cantidad=Sum('cantidad'), valor=Sum('valor'),
+            ).order_by('-valor')[:self.LIMITE_REPORTE],
+            'limite': self.LIMITE_REPORTE,
+        }
+        return TemplateResponse(request, 'admin/contabilidad/reporte_gastos.html', context)
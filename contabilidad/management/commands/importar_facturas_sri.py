@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from contabilidad.sri import TAMANO_LOTE, importar_facturas, leer_rutas
+
+
+class Command(BaseCommand):
+    help = "Importa facturas electronicas del SRI desde archivos XML de autorizacion, directorios o zips."
+
+    def add_arguments(self, parser):
+        parser.add_argument('rutas', nargs='+', help="Archivos .xml o .zip, o directorios (se recorren completos).")
+        parser.add_argument('--procesos', type=int, default=None, help="Procesos que leen los XML (por defecto, uno por CPU).")
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help="Facturas por transaccion.")
+        parser.add_argument('--sin-entradas', action='store_true',
+                            help="Solo guarda facturas y detalles, sin registrar entradas de inventario.")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        resultado = importar_facturas(
+            leer_rutas(options['rutas']), procesos=options['procesos'], tamano_lote=options['lote'],
+            entradas=not options['sin_entradas'],
+        )
+        duracion = time.perf_counter() - inicio
+
+        for archivo, mensaje in resultado.errores:
+            self.stdout.write(self.style.WARNING(f"{archivo}: {mensaje}"))
+        for archivo, mensaje in resultado.conflictos:
+            self.stdout.write(self.style.ERROR(f"{archivo}: {mensaje}"))
+        self.stdout.write(
+            f"Archivos: {resultado.archivos}. Creadas: {resultado.creadas}. "
+            f"Ya registradas: {len(resultado.duplicadas)}. En conflicto: {len(resultado.conflictos)}. Con errores: {len(resultado.errores)}. "
+            f"Detalles: {resultado.detalles}. Entradas de inventario: {resultado.entradas}. "
+            f"({duracion:.1f} s)"
+        )
+        if resultado.creadas:
+            self.stdout.write(self.style.SUCCESS(f"Facturas importadas: {resultado.creadas}."))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from contabilidad.models import GastoProveedorMes
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el gasto mensual por proveedor desde las facturas del SRI."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verificar', action='store_true',
+                            help="Solo compara con lo almacenado y reporta las diferencias, sin corregirlas.")
+
+    def handle(self, *args, **options):
+        calculadas = GastoProveedorMes.calcular()
+        guardadas = {(fila['ruc'], fila['mes']): fila for fila in GastoProveedorMes.objects.values('ruc', 'mes', *GastoProveedorMes.CAMPOS_SUMA)}
+        diferentes = [
+            clave for clave in calculadas.keys() | guardadas.keys()
+            if any(calculadas.get(clave, {}).get(campo, 0) != guardadas.get(clave, {}).get(campo, 0) for campo in GastoProveedorMes.CAMPOS_SUMA)
+        ]
+        for ruc, mes in sorted(diferentes)[:20]:
+            self.stdout.write(self.style.WARNING(f"{ruc} {mes:%m/%Y}: {guardadas.get((ruc, mes))} -> {calculadas.get((ruc, mes))}"))
+        self.stdout.write(f"Proveedores por mes: {len(calculadas)}. Diferentes de lo almacenado: {len(diferentes)}.")
+
+        if options['verificar']:
+            if diferentes:
+                raise CommandError(f"Hay {len(diferentes)} gastos por proveedor desactualizados.")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Filas reconstruidas: {GastoProveedorMes.reconstruir()}."))
@@ -0,0 +1,104 @@
+"""
+Emparejamiento de las lineas de factura con el catalogo de materiales.
+
+CatalogoMateriales carga una vez las claves normalizadas de todos los
+materiales (normalizar_clave, como Material.clave) y, por proveedor, los
+codigos aprendidos en CodigoProveedorMaterial; cada linea se resuelve con
+dos busquedas en diccionarios: primero el codigo del proveedor y despues
+la descripcion. Lo que se empareja por nombre se aprende como codigo del
+proveedor, asi la siguiente factura del mismo proveedor lo encuentra
+aunque cambie la descripcion.
+
+registrar_entradas() convierte las lineas emparejadas en entradas de
+inventario con el servicio de movimientos en lote.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+
+from rubros.models import Material, normalizar_clave
+
+from .models import CodigoProveedorMaterial, DetalleFactura
+
+CENTAVOS = Decimal('0.01')
+
+
+class CatalogoMateriales:
+    def __init__(self):
+        self.por_clave = dict(Material.objects.exclude(clave=None).values_list('clave', 'pk').iterator(chunk_size=5000))
+        self.por_codigo = {}  # (ruc, codigo) -> material_id
+        self.rucs = set()
+        self.nuevos_codigos = {}
+
+    def cargar_proveedores(self, rucs):
+        faltantes = set(rucs) - self.rucs
+        if faltantes:
+            for ruc, codigo, material in CodigoProveedorMaterial.objects.filter(ruc__in=faltantes).values_list('ruc', 'codigo', 'material_id'):
+                self.por_codigo[ruc, codigo] = material
+            self.rucs |= faltantes
+
+    def material(self, ruc, codigo, descripcion):
+        if codigo and (ruc, codigo) in self.por_codigo:
+            return self.por_codigo[ruc, codigo]
+        material = self.por_clave.get(normalizar_clave(descripcion))
+        if material is not None and codigo:
+            self.por_codigo[ruc, codigo] = self.nuevos_codigos[ruc, codigo] = material
+        return material
+
+    def emparejar(self, detalles, ruc_de):
+        """Asigna material a los detalles sin material; ruc_de(detalle) da el RUC del proveedor."""
+        for detalle in detalles:
+            if detalle.material_id is None:
+                detalle.material_id = self.material(ruc_de(detalle), detalle.codigo_principal, detalle.descripcion)
+
+    def guardar_codigos(self):
+        CodigoProveedorMaterial.objects.bulk_create([
+            CodigoProveedorMaterial(ruc=ruc, codigo=codigo, material_id=material)
+            for (ruc, codigo), material in self.nuevos_codigos.items()
+        ], ignore_conflicts=True)
+        self.nuevos_codigos = {}
+
+
+def aprender_codigo(detalle):
+    """Recuerda el material elegido a mano para el codigo de esta linea (reemplaza el anterior)."""
+    if detalle.material_id and detalle.codigo_principal:
+        CodigoProveedorMaterial.objects.update_or_create(
+            ruc=detalle.factura.ruc, codigo=detalle.codigo_principal, defaults={'material_id': detalle.material_id},
+        )
+
+
+def registrar_entradas(detalles):
+    """
+    Crea una entrada de inventario por cada detalle con material y sin
+    entrada, en un solo lote: el stock de cada material se actualiza una
+    vez. Los detalles necesitan su factura cargada. Devuelve cuantas
+    entradas se crearon; ValidationError si el lote no es valido.
+    """
+    from inventario_de_obra.servicios import registrar_movimientos
+
+    pendientes = [
+        detalle for detalle in detalles
+        if detalle.material_id and detalle.entrada_id is None and detalle.cantidad.quantize(CENTAVOS, ROUND_HALF_UP) > 0
+    ]
+    if not pendientes:
+        return 0
+    movimientos = []
+    for detalle in pendientes:
+        cantidad = detalle.cantidad.quantize(CENTAVOS, ROUND_HALF_UP)
+        movimientos.append({
+            'tipo': 'entrada',
+            'material': detalle.material_id,
+            'cantidad': cantidad,
+            # Costo neto de descuento, sobre la cantidad facturada
+            'costo_unitario': (detalle.precio_total_sin_impuesto / detalle.cantidad).quantize(Decimal('0.0001')),
+            'fecha': detalle.factura.fecha,
+            'factura': detalle.factura_id,
+            'descripcion': detalle.descripcion,
+        })
+    with transaction.atomic():
+        resultado = registrar_movimientos(movimientos)
+        for detalle, entrada in zip(pendientes, resultado.registros):
+            detalle.entrada = entrada
+        DetalleFactura.objects.bulk_update(pendientes, ['entrada'], batch_size=500)
+    return len(pendientes)
+
@@ -0,0 +1,81 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:25
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('rubros', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DetalleFactura',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo_principal', models.CharField(blank=True, max_length=100, verbose_name='Código del proveedor')),
+                ('codigo_auxiliar', models.CharField(blank=True, max_length=100)),
+                ('descripcion', models.CharField(max_length=500)),
+                ('cantidad', models.DecimalField(decimal_places=6, max_digits=18)),
+                ('precio_unitario', models.DecimalField(decimal_places=6, max_digits=18)),
+                ('descuento', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('precio_total_sin_impuesto', models.DecimalField(decimal_places=2, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Detalle de factura',
+                'verbose_name_plural': 'Detalles de factura',
+            },
+        ),
+        migrations.CreateModel(
+            name='GastoProveedorMes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ruc', models.CharField(max_length=13, verbose_name='RUC')),
+                ('mes', models.DateField(help_text='Primer día del mes')),
+                ('nombre', models.CharField(max_length=255)),
+                ('facturas', models.IntegerField(default=0)),
+                ('total_sin_impuestos', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('importe_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'verbose_name': 'Gasto mensual por proveedor',
+                'verbose_name_plural': 'Gastos mensuales por proveedor',
+            },
+        ),
+        migrations.CreateModel(
+            name='SRIFactura',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ruc', models.CharField(max_length=13, verbose_name='RUC')),
+                ('numero_factura', models.CharField(max_length=50, verbose_name='Número de Factura')),
+                ('numero_autorizacion', models.CharField(error_messages={'unique': 'Ya existe una factura con este número de autorización.'}, max_length=255, unique=True, verbose_name='Número de Autorización')),
+                ('nombre', models.CharField(max_length=255, verbose_name='Nombre')),
+                ('nombre_comercial', models.CharField(default='', max_length=255, verbose_name='Nombre Comercial')),
+                ('fecha', models.DateField(default=datetime.date.today, verbose_name='Fecha de emisión de la factura')),
+                ('total_sin_impuestos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('importe_total', models.DecimalField(decimal_places=2, default=0, help_text='Total con impuestos', max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Factura SRI',
+                'verbose_name_plural': 'Facturas SRI',
+            },
+        ),
+        migrations.CreateModel(
+            name='CodigoProveedorMaterial',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ruc', models.CharField(max_length=13, verbose_name='RUC')),
+                ('codigo', models.CharField(max_length=100, verbose_name='Código del proveedor')),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='codigos_proveedor', to='rubros.material')),
+            ],
+            options={
+                'verbose_name': 'Código de proveedor',
+                'verbose_name_plural': 'Códigos de proveedor',
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contabilidad', '0001_initial'),
+        ('inventario_de_obra', '0001_initial'),
+        ('rubros', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detallefactura',
+            name='entrada',
+            field=models.OneToOneField(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='detalle_factura', to='inventario_de_obra.entradainventario'),
+        ),
+        migrations.AddField(
+            model_name='detallefactura',
+            name='material',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='detalles_factura', to='rubros.material'),
+        ),
+        migrations.AddIndex(
+            model_name='gastoproveedormes',
+            index=models.Index(fields=['mes'], name='contabilida_mes_b5fb5f_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='gastoproveedormes',
+            constraint=models.UniqueConstraint(fields=('ruc', 'mes'), name='gasto_proveedor_por_mes'),
+        ),
+        migrations.AddConstraint(
+            model_name='srifactura',
+            constraint=models.UniqueConstraint(fields=('ruc', 'numero_factura'), name='factura_unica_por_ruc'),
+        ),
+        migrations.AddField(
+            model_name='detallefactura',
+            name='factura',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detalles', to='contabilidad.srifactura'),
+        ),
+        migrations.AddConstraint(
+            model_name='codigoproveedormaterial',
+            constraint=models.UniqueConstraint(fields=('ruc', 'codigo'), name='codigo_unico_por_proveedor'),
+        ),
+    ]
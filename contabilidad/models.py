@@ -1,45 +1,192 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 import re
 from unidecode import unidecode
 from datetime import date
+from decimal import Decimal
+
+
+def limpiar_numero(valor):
+    return re.sub(r'\s+', '', valor.strip())  # Elimina espacios
+
+
+def normalizar_nombre(valor):
+    return unidecode(re.sub(r'\s+', ' ', valor.strip().title()))  # Normaliza y elimina espacios extras
+
+
+def inicio_de_mes(fecha):
+    return fecha.replace(day=1)
+
 
 class SRIFactura(models.Model):
     ruc = models.CharField(max_length=13, verbose_name="RUC", blank=False, null=False)
     numero_factura = models.CharField(max_length=50, verbose_name="Número de Factura", blank=False, null=False)
-    numero_autorizacion = models.CharField(max_length=255, unique=True, verbose_name="Número de Autorización", blank=False, null=False)
+    numero_autorizacion = models.CharField(max_length=255, unique=True, verbose_name="Número de Autorización", blank=False, null=False,
+                                           error_messages={'unique': "Ya existe una factura con este número de autorización."})
     nombre = models.CharField(max_length=255, verbose_name="Nombre", blank=False, null=False)
     nombre_comercial = models.CharField(max_length=255, verbose_name="Nombre Comercial", blank=False, null=False, default='')
     fecha = models.DateField(verbose_name='Fecha de emisión de la factura', default=date.today)
+    total_sin_impuestos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    importe_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Total con impuestos")
 
     class Meta:
         verbose_name = "Factura SRI"
         verbose_name_plural = "Facturas SRI"
+        # El numero de factura (establecimiento-punto-secuencial) solo se repite entre proveedores distintos
+        constraints = [
+            models.UniqueConstraint(fields=['ruc', 'numero_factura'], name='factura_unica_por_ruc'),
+        ]
+
+    def unique_error_message(self, model_class, unique_check):
+        if tuple(unique_check) == ('ruc', 'numero_factura'):
+            return ValidationError({'numero_factura': "Este proveedor ya tiene una factura con este número."})
+        return super().unique_error_message(model_class, unique_check)
 
     def clean(self):
         # Limpieza y normalización de campos
-        self.ruc = re.sub(r'\s+', '', self.ruc.strip())  # Elimina espacios
+        self.ruc = limpiar_numero(self.ruc)
         if not re.match(r'^\d{13}$', self.ruc):
             raise ValidationError({'ruc': "El RUC debe tener exactamente 13 dígitos numéricos."})
 
-        self.numero_factura = re.sub(r'\s+', '', self.numero_factura.strip())  # Elimina espacios
-        self.numero_autorizacion = re.sub(r'\s+', '', self.numero_autorizacion.strip())  # Elimina espacios
+        self.numero_factura = limpiar_numero(self.numero_factura)
+        self.numero_autorizacion = limpiar_numero(self.numero_autorizacion)
+        # La unicidad del número de autorización y de (ruc, número de factura) la validan
+        # validate_unique y validate_constraints de full_clean, con los valores ya limpios
 
-        # Validar unicidad del número de autorización
-        if SRIFactura.objects.exclude(id=self.id).filter(numero_autorizacion=self.numero_autorizacion).exists():
-            raise ValidationError({'numero_autorizacion': "Ya existe una factura con este número de autorización."})
+        # Normalizar nombres
+        self.nombre = normalizar_nombre(self.nombre)
+        self.nombre_comercial = normalizar_nombre(self.nombre_comercial)
 
-        # Validar unicidad del número de factura
-        if SRIFactura.objects.exclude(id=self.id).filter(numero_factura=self.numero_factura).exists():
-            raise ValidationError({'numero_factura': "Ya existe una factura con este número de factura."})
+    # Campos que suman al gasto mensual del proveedor
+    CAMPOS_GASTO = ('ruc', 'nombre', 'fecha', 'total_sin_impuestos', 'importe_total')
 
-        # Normalizar nombres
-        self.nombre = unidecode(re.sub(r'\s+', ' ', self.nombre.strip().title()))  # Normaliza y elimina espacios extras
-        self.nombre_comercial = unidecode(re.sub(r'\s+', ' ', self.nombre_comercial.strip().title()))
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._original = tuple(instancia.__dict__.get(campo) for campo in cls.CAMPOS_GASTO)
+        return instancia
 
     def save(self, *args, **kwargs):
         self.full_clean()  # Aplica validaciones antes de guardar
-        super().save(*args, **kwargs)
+        anterior = getattr(self, '_original', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            actual = tuple(getattr(self, campo) for campo in self.CAMPOS_GASTO)
+            if anterior != actual:
+                GastoProveedorMes.registrar([self])
+                if anterior is not None:
+                    GastoProveedorMes.registrar([SRIFactura(**dict(zip(self.CAMPOS_GASTO, anterior)))], signo=-1)
+        self._original = actual
 
     def __str__(self):
         return f"{self.numero_factura} - {self.nombre} ({self.ruc})"
+
+
+# Linea (detalle) de una factura, tal como viene en el XML del SRI
+class DetalleFactura(models.Model):
+    factura = models.ForeignKey(SRIFactura, on_delete=models.CASCADE, related_name="detalles")
+    codigo_principal = models.CharField(max_length=100, blank=True, verbose_name="Código del proveedor")
+    codigo_auxiliar = models.CharField(max_length=100, blank=True)
+    descripcion = models.CharField(max_length=500)
+    cantidad = models.DecimalField(max_digits=18, decimal_places=6)
+    precio_unitario = models.DecimalField(max_digits=18, decimal_places=6)
+    descuento = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    precio_total_sin_impuesto = models.DecimalField(max_digits=14, decimal_places=2)
+    material = models.ForeignKey('rubros.Material', on_delete=models.SET_NULL, null=True, blank=True, related_name="detalles_factura")
+    entrada = models.OneToOneField('inventario_de_obra.EntradaInventario', on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name="detalle_factura", editable=False)
+
+    class Meta:
+        verbose_name = "Detalle de factura"
+        verbose_name_plural = "Detalles de factura"
+
+    def __str__(self):
+        return f"{self.cantidad} x {self.descripcion}"
+
+
+# Codigo de producto de un proveedor (RUC) -> material del catalogo, aprendido
+# al emparejar las lineas de sus facturas
+class CodigoProveedorMaterial(models.Model):
+    ruc = models.CharField(max_length=13, verbose_name="RUC")
+    codigo = models.CharField(max_length=100, verbose_name="Código del proveedor")
+    material = models.ForeignKey('rubros.Material', on_delete=models.CASCADE, related_name="codigos_proveedor")
+
+    class Meta:
+        verbose_name = "Código de proveedor"
+        verbose_name_plural = "Códigos de proveedor"
+        constraints = [models.UniqueConstraint(fields=['ruc', 'codigo'], name='codigo_unico_por_proveedor')]
+
+    def __str__(self):
+        return f"{self.ruc} / {self.codigo} -> {self.material}"
+
+
+# Gasto de cada proveedor por mes, mantenido al guardar, importar o eliminar
+# facturas; los reportes leen solo esta tabla. reconstruir_gastos_proveedores la rehace.
+class GastoProveedorMes(models.Model):
+    ruc = models.CharField(max_length=13, verbose_name="RUC")
+    mes = models.DateField(help_text="Primer día del mes")
+    nombre = models.CharField(max_length=255)
+    facturas = models.IntegerField(default=0)
+    total_sin_impuestos = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    importe_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    CAMPOS_SUMA = ('facturas', 'total_sin_impuestos', 'importe_total')
+
+    class Meta:
+        verbose_name = "Gasto mensual por proveedor"
+        verbose_name_plural = "Gastos mensuales por proveedor"
+        constraints = [models.UniqueConstraint(fields=['ruc', 'mes'], name='gasto_proveedor_por_mes')]
+        indexes = [models.Index(fields=['mes'])]
+
+    @classmethod
+    def registrar(cls, facturas, signo=1):
+        """Suma las facturas al mes de cada una (o las resta, con signo=-1): un UPDATE por (ruc, mes)."""
+        deltas = {}
+        nombres = {}
+        for factura in facturas:
+            clave = (factura.ruc, inicio_de_mes(factura.fecha))
+            cantidad, sin_impuestos, total = deltas.get(clave, (0, Decimal('0'), Decimal('0')))
+            deltas[clave] = (cantidad + signo, sin_impuestos + signo * factura.total_sin_impuestos, total + signo * factura.importe_total)
+            nombres.setdefault(clave, factura.nombre)
+        if not deltas:
+            return
+        cls.objects.bulk_create([cls(ruc=ruc, mes=mes, nombre=nombres[ruc, mes]) for ruc, mes in deltas], ignore_conflicts=True)
+        for (ruc, mes), (cantidad, sin_impuestos, total) in deltas.items():
+            cls.objects.filter(ruc=ruc, mes=mes).update(
+                facturas=F('facturas') + cantidad,
+                total_sin_impuestos=F('total_sin_impuestos') + sin_impuestos,
+                importe_total=F('importe_total') + total,
+            )
+        # Un mes que se quedo sin facturas (se movieron o eliminaron) no se reporta
+        cls.objects.filter(mes__in={mes for _, mes in deltas}, facturas__lte=0).delete()
+
+    @classmethod
+    def calcular(cls):
+        """Gasto por (ruc, mes) desde las facturas, en una sola agregacion: {(ruc, mes): fila}."""
+        filas = (SRIFactura.objects.annotate(mes=TruncMonth('fecha')).order_by().values('ruc', 'mes')
+                 .annotate(nombre=Max('nombre'), facturas=Count('pk'),
+                           total_sin_impuestos=Sum('total_sin_impuestos'), importe_total=Sum('importe_total')))
+        return {(fila['ruc'], fila['mes']): fila for fila in filas.iterator()}
+
+    @classmethod
+    def reconstruir(cls):
+        """Rehace la tabla completa desde las facturas y devuelve cuantas filas quedaron."""
+        filas = cls.calcular()
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create([cls(**fila) for fila in filas.values()], batch_size=1000)
+        return len(filas)
+
+    def __str__(self):
+        return f"{self.nombre} ({self.ruc}) {self.mes:%m/%Y}: {self.importe_total}"
+
+
+@receiver(post_delete, sender=SRIFactura)
+def descontar_factura_eliminada(sender, instance, **kwargs):
+    anterior = getattr(instance, '_original', None)
+    factura = SRIFactura(**dict(zip(SRIFactura.CAMPOS_GASTO, anterior))) if anterior else instance
+    GastoProveedorMes.registrar([factura], signo=-1)
@@ -0,0 +1,413 @@
+"""
+Importacion de facturas electronicas del SRI (XML de autorizacion).
+
+Cada archivo es un <autorizacion> con la factura dentro de un CDATA en
+<comprobante>; tambien se acepta la <factura> sola. leer_comprobante()
+lee ambos con iterparse sin construir el arbol completo. clasificar() separa
+las nuevas de las duplicadas y en conflicto con una consulta por lote antes
+de escribir. importar_facturas() recorre directorios, zips y archivos XML,
+reparte la lectura en un pool de procesos y crea las facturas y sus detalles con bulk_create en
+transacciones por lote; los detalles que se emparejan con un material
+(materiales.py) se registran como entradas de inventario. Un archivo con
+errores se reporta y no detiene a los demas.
+
+Lo que corre en los procesos del pool no usa el ORM: los modelos se
+importan dentro de las funciones del proceso principal.
+"""
+import io
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from xml.etree.ElementTree import ParseError, iterparse
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+
+TAMANO_LOTE = 500
+COD_DOC_FACTURA = '01'
+NUEVA, DUPLICADA, CONFLICTO = 'nueva', 'duplicada', 'conflicto'
+
+# etiqueta del XML -> seccion de la que se lee
+CAMPOS = {
+    'infoTributaria': ('razonSocial', 'nombreComercial', 'ruc', 'claveAcceso', 'codDoc', 'estab', 'ptoEmi', 'secuencial'),
+    'infoFactura': ('fechaEmision', 'totalSinImpuestos', 'importeTotal'),
+}
+# etiqueta de cada <detalle> -> campo de DetalleFactura
+DETALLE = {
+    'codigoPrincipal': 'codigo_principal',
+    'codigoAuxiliar': 'codigo_auxiliar',
+    'descripcion': 'descripcion',
+    'cantidad': 'cantidad',
+    'precioUnitario': 'precio_unitario',
+    'descuento': 'descuento',
+    'precioTotalSinImpuesto': 'precio_total_sin_impuesto',
+}
+NUMERICOS = ('cantidad', 'precio_unitario', 'descuento', 'precio_total_sin_impuesto')
+VALOR_MAXIMO = Decimal('1000000000000')
+
+
+@dataclass
+class ResultadoImportacion:
+    archivos: int = 0
+    creadas: int = 0
+    detalles: int = 0
+    entradas: int = 0  # detalles registrados como entradas de inventario
+    duplicadas: list = field(default_factory=list)  # archivos con facturas ya registradas
+    conflictos: list = field(default_factory=list)  # (archivo, motivo): numero o autorizacion de otra factura
+    errores: list = field(default_factory=list)  # (archivo, mensaje)
+
+
+def _etiqueta(elemento):
+    return elemento.tag.rsplit('}', 1)[-1]  # sin espacio de nombres
+
+
+def _leer_factura(fuente, datos):
+    pila = []
+    datos['detalles'] = []
+    detalle = {}
+    for evento, elemento in iterparse(fuente, events=('start', 'end')):
+        etiqueta = _etiqueta(elemento)
+        if evento == 'start':
+            pila.append(etiqueta)
+            continue
+        pila.pop()
+        if pila and pila[-1] in CAMPOS and etiqueta in CAMPOS[pila[-1]]:
+            datos[etiqueta] = (elemento.text or '').strip()
+        elif pila and pila[-1] == 'detalle' and etiqueta in DETALLE:
+            detalle[DETALLE[etiqueta]] = (elemento.text or '').strip()
+        elif etiqueta == 'detalle':
+            datos['detalles'].append(detalle)
+            detalle = {}
+        if etiqueta in ('detalle', 'infoTributaria', 'infoFactura'):
+            elemento.clear()  # los detalles pueden ser muchos; solo se guarda lo leido
+    return datos
+
+
+def leer_comprobante(contenido):
+    """
+    Lee el XML (bytes) de una autorizacion del SRI o de una factura suelta y
+    devuelve un diccionario con los campos de CAMPOS, detalles (lista de
+    diccionarios con los campos de DETALLE) y, si vienen, estado y
+    numeroAutorizacion. Lanza ValueError si el XML no se puede leer.
+    """
+    datos = {}
+    comprobante = None
+    try:
+        for _, elemento in iterparse(io.BytesIO(contenido), events=('end',)):
+            etiqueta = _etiqueta(elemento)
+            if etiqueta in ('estado', 'numeroAutorizacion', 'fechaAutorizacion'):
+                datos[etiqueta] = (elemento.text or '').strip()
+            elif etiqueta == 'comprobante':
+                comprobante = (elemento.text or '').strip()
+                elemento.clear()
+            elif etiqueta == 'factura' and comprobante is None:
+                comprobante = ''  # factura sin envoltorio de autorizacion
+        if comprobante == '':
+            return _leer_factura(io.BytesIO(contenido), datos)
+        if comprobante is None:
+            raise ValueError("No contiene un comprobante ni una factura.")
+        return _leer_factura(io.BytesIO(comprobante.encode('utf-8')), datos)
+    except ParseError as error:
+        raise ValueError(f"XML no valido: {error}")
+
+
+def _leer(tarea):
+    # Se ejecuta en los procesos del pool
+    nombre, contenido = tarea
+    try:
+        return nombre, leer_comprobante(contenido), None
+    except ValueError as error:
+        return nombre, None, str(error)
+
+
+def _desde_zip(nombre, archivo):
+    try:
+        with zipfile.ZipFile(archivo) as zip_:
+            for miembro in sorted(zip_.namelist()):
+                if miembro.lower().endswith('.xml') and not miembro.endswith('/'):
+                    yield f"{nombre}:{miembro}", zip_.read(miembro), None
+    except zipfile.BadZipFile:
+        yield nombre, None, "Archivo zip no valido."
+
+
+def leer_rutas(rutas):
+    """(nombre, contenido, error) de cada XML en las rutas: archivos, directorios (recursivo) o zips."""
+    for ruta in map(Path, rutas):
+        if ruta.is_dir():
+            archivos = sorted(p for p in ruta.rglob('*') if p.suffix.lower() in ('.xml', '.zip') and p.is_file())
+        elif ruta.exists():
+            archivos = [ruta]
+        else:
+            yield str(ruta), None, "No existe."
+            continue
+        for archivo in archivos:
+            if archivo.suffix.lower() == '.zip':
+                yield from _desde_zip(str(archivo), archivo)
+            else:
+                yield str(archivo), archivo.read_bytes(), None
+
+
+def leer_archivos_subidos(archivos):
+    """Como leer_rutas, para archivos subidos (XML o zip)."""
+    for archivo in archivos:
+        if archivo.name.lower().endswith('.zip'):
+            yield from _desde_zip(archivo.name, archivo)
+        else:
+            yield archivo.name, archivo.read(), None
+
+
+def _limpiar_codigo(valor):
+    return (valor or '').strip()[:100]
+
+
+def _detalle_desde_datos(numero, datos):
+    from .models import DetalleFactura
+
+    valores = {}
+    for campo in NUMERICOS:
+        texto = datos.get(campo) or ('0' if campo == 'descuento' else '')
+        try:
+            valor = Decimal(texto)
+            if not valor.is_finite() or abs(valor) >= VALOR_MAXIMO:
+                raise InvalidOperation
+        except InvalidOperation:
+            raise ValueError(f"Detalle {numero}: {campo} '{texto}' no valido.")
+        valores[campo] = valor
+    return DetalleFactura(
+        codigo_principal=_limpiar_codigo(datos.get('codigo_principal')),
+        codigo_auxiliar=_limpiar_codigo(datos.get('codigo_auxiliar')),
+        descripcion=re.sub(r'\s+', ' ', datos.get('descripcion') or '').strip()[:500],
+        cantidad=valores['cantidad'].quantize(Decimal('0.000001')),
+        precio_unitario=valores['precio_unitario'].quantize(Decimal('0.000001')),
+        descuento=valores['descuento'].quantize(Decimal('0.01')),
+        precio_total_sin_impuesto=valores['precio_total_sin_impuesto'].quantize(Decimal('0.01')),
+    )
+
+
+def factura_desde_datos(datos):
+    """
+    Construye (sin guardar) la SRIFactura de los datos leidos y sus
+    DetalleFactura; ValueError si no son validos.
+    """
+    from .models import SRIFactura, limpiar_numero, normalizar_nombre
+
+    if datos.get('estado') and datos['estado'].upper() != 'AUTORIZADO':
+        raise ValueError(f"El comprobante no esta autorizado (estado {datos['estado']}).")
+    if datos.get('codDoc', COD_DOC_FACTURA) != COD_DOC_FACTURA:
+        raise ValueError(f"El comprobante no es una factura (codDoc {datos['codDoc']}).")
+    faltantes = [campo for campo in ('ruc', 'razonSocial', 'estab', 'ptoEmi', 'secuencial', 'fechaEmision') if not datos.get(campo)]
+    if faltantes:
+        raise ValueError(f"Faltan campos: {', '.join(faltantes)}.")
+
+    ruc = limpiar_numero(datos['ruc'])
+    if not re.match(r'^\d{13}$', ruc):
+        raise ValueError("El RUC debe tener exactamente 13 dígitos numéricos.")
+    numero_autorizacion = limpiar_numero(datos.get('numeroAutorizacion') or datos.get('claveAcceso') or '')
+    if not numero_autorizacion:
+        raise ValueError("Falta el número de autorización.")
+    try:
+        fecha = datetime.strptime(datos['fechaEmision'], '%d/%m/%Y').date()
+    except ValueError:
+        raise ValueError(f"Fecha de emisión '{datos['fechaEmision']}' no valida.")
+
+    totales = {}
+    for campo, etiqueta in (('total_sin_impuestos', 'totalSinImpuestos'), ('importe_total', 'importeTotal')):
+        texto = datos.get(etiqueta) or '0'
+        try:
+            totales[campo] = Decimal(texto).quantize(Decimal('0.01'))
+            if not totales[campo].is_finite() or abs(totales[campo]) >= VALOR_MAXIMO:
+                raise InvalidOperation
+        except InvalidOperation:
+            raise ValueError(f"{etiqueta} '{texto}' no valido.")
+
+    detalles = [_detalle_desde_datos(numero, detalle) for numero, detalle in enumerate(datos.get('detalles', ()), start=1)]
+    nombre = normalizar_nombre(datos['razonSocial'])
+    factura = SRIFactura(
+        ruc=ruc,
+        numero_factura=limpiar_numero(f"{datos['estab']}-{datos['ptoEmi']}-{datos['secuencial']}"),
+        numero_autorizacion=numero_autorizacion,
+        nombre=nombre,
+        nombre_comercial=normalizar_nombre(datos.get('nombreComercial') or '') or nombre,
+        fecha=fecha,
+        **totales,
+    )
+    return factura, detalles
+
+
+def clasificar(facturas):
+    """
+    Clasifica facturas sin guardar, antes de escribir nada: devuelve
+    (clase, motivo) por cada una, en el mismo orden. NUEVA si no existe,
+    DUPLICADA si su autorizacion ya esta registrada para la misma factura
+    (o se repite en la lista) y CONFLICTO si la autorizacion o el par (ruc,
+    numero de factura) ya pertenecen a otra. Una sola consulta, por los
+    indices unicos de numero_autorizacion y (ruc, numero_factura).
+    """
+    from .models import SRIFactura
+
+    if not facturas:
+        return []
+    por_autorizacion = {}  # numero_autorizacion -> (ruc, numero_factura)
+    por_numero = {}  # (ruc, numero_factura) -> numero_autorizacion
+    # rucs y numeros por separado dan un superconjunto de los pares; se filtra en memoria
+    existentes = SRIFactura.objects.filter(
+        Q(numero_autorizacion__in={factura.numero_autorizacion for factura in facturas})
+        | Q(ruc__in={factura.ruc for factura in facturas}, numero_factura__in={factura.numero_factura for factura in facturas})
+    ).values_list('numero_autorizacion', 'ruc', 'numero_factura')
+    for autorizacion, ruc, numero in existentes:
+        por_autorizacion[autorizacion] = (ruc, numero)
+        por_numero[ruc, numero] = autorizacion
+
+    clases = []
+    for factura in facturas:
+        par = (factura.ruc, factura.numero_factura)
+        registrada = por_autorizacion.get(factura.numero_autorizacion)
+        if registrada == par:
+            clases.append((DUPLICADA, ''))
+        elif registrada is not None:
+            clases.append((CONFLICTO, f"La autorización ya está registrada para la factura {registrada[1]} del RUC {registrada[0]}."))
+        elif par in por_numero:
+            clases.append((CONFLICTO, f"El RUC {par[0]} ya tiene la factura {par[1]} con otra autorización ({por_numero[par]})."))
+        else:
+            clases.append((NUEVA, ''))
+            por_autorizacion[factura.numero_autorizacion] = par
+            por_numero[par] = factura.numero_autorizacion
+    return clases
+
+
+def _guardar_lote(leidos, resultado, catalogo):
+    from .materiales import registrar_entradas
+    from .models import DetalleFactura, GastoProveedorMes, SRIFactura
+
+    facturas = []
+    for nombre, datos in leidos:
+        try:
+            facturas.append((nombre, *factura_desde_datos(datos)))
+        except ValueError as error:
+            resultado.errores.append((nombre, str(error)))
+
+    if not facturas:
+        return
+
+    # La clasificacion va en la misma transaccion que las inserciones: con SQLite
+    # (transacciones IMMEDIATE) dos importaciones simultaneas no pueden tomar
+    # la misma factura como nueva
+    with transaction.atomic():
+        nuevas = []
+        for (nombre, factura, detalles), (clase, motivo) in zip(facturas, clasificar([factura for _, factura, _ in facturas])):
+            if clase == NUEVA:
+                nuevas.append((nombre, factura, detalles))
+            elif clase == DUPLICADA:
+                resultado.duplicadas.append(nombre)
+            else:
+                resultado.conflictos.append((nombre, motivo))
+        if not nuevas:
+            return
+
+        # ignore_conflicts por si otra base de datos deja pasar una importacion
+        # simultanea; con el no se asignan las claves primarias, se leen despues
+        SRIFactura.objects.bulk_create([factura for _, factura, _ in nuevas], ignore_conflicts=True)
+        ids = {
+            (autorizacion, ruc, numero): pk
+            for autorizacion, ruc, numero, pk in SRIFactura.objects.filter(
+                numero_autorizacion__in=[factura.numero_autorizacion for _, factura, _ in nuevas]
+            ).values_list('numero_autorizacion', 'ruc', 'numero_factura', 'pk')
+        }
+        guardadas = []
+        for nombre, factura, detalles in nuevas:
+            factura.pk = ids.get((factura.numero_autorizacion, factura.ruc, factura.numero_factura))
+            if factura.pk is None:
+                resultado.conflictos.append((nombre, "Otra importación registró al mismo tiempo esta autorización o este número."))
+            else:
+                guardadas.append((nombre, factura, detalles))
+        nuevas = guardadas
+        GastoProveedorMes.registrar([factura for _, factura, _ in nuevas])
+        lineas = []
+        for _, factura, detalles in nuevas:
+            for detalle in detalles:
+                detalle.factura = factura
+            lineas.extend(detalles)
+
+        if catalogo is not None:
+            catalogo.cargar_proveedores({factura.ruc for _, factura, _ in nuevas})
+            catalogo.emparejar(lineas, lambda detalle: detalle.factura.ruc)
+            catalogo.guardar_codigos()
+        DetalleFactura.objects.bulk_create(lineas, batch_size=TAMANO_LOTE)
+        resultado.creadas += len(nuevas)
+        resultado.detalles += len(lineas)
+
+        if catalogo is not None:
+            try:
+                with transaction.atomic():
+                    resultado.entradas += registrar_entradas(lineas)
+            except ValidationError as error:
+                # Las facturas quedan; sus entradas se pueden registrar despues desde el admin
+                resultado.errores.append(
+                    (', '.join(nombre for nombre, _, _ in nuevas[:3]) + ('...' if len(nuevas) > 3 else ''),
+                     "No se registraron las entradas de inventario: " + ' '.join(error.messages))
+                )
+
+
+def procesadores_disponibles():
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))  # respeta los limites del contenedor
+    return os.cpu_count() or 1
+
+
+def importar_facturas(fuentes, procesos=None, tamano_lote=TAMANO_LOTE, entradas=True):
+    """
+    Importa las facturas de fuentes, un iterable de (nombre, contenido,
+    error) como los de leer_rutas(). Con procesos > 1 los XML se leen en un
+    pool de procesos mientras el proceso principal guarda el lote anterior.
+    Con entradas, los detalles se emparejan con materiales y los emparejados
+    se registran como entradas de inventario.
+    """
+    from .materiales import CatalogoMateriales
+
+    procesos = procesos or procesadores_disponibles()
+    resultado = ResultadoImportacion()
+    catalogo = CatalogoMateriales() if entradas else None
+    pool = ProcessPoolExecutor(max_workers=procesos) if procesos > 1 else None
+
+    def enviar(tareas):
+        if pool is None:
+            return map(_leer, tareas)
+        return pool.map(_leer, tareas, chunksize=max(1, len(tareas) // (procesos * 4)))
+
+    def guardar(leidos):
+        validos = []
+        for nombre, datos, error in leidos:
+            if error:
+                resultado.errores.append((nombre, error))
+            else:
+                validos.append((nombre, datos))
+        for inicio in range(0, len(validos), tamano_lote):
+            _guardar_lote(validos[inicio:inicio + tamano_lote], resultado, catalogo)
+
+    try:
+        pendiente = None  # lote enviado al pool que aun no se guardo
+        tareas = []
+        for nombre, contenido, error in fuentes:
+            resultado.archivos += 1
+            if error:
+                resultado.errores.append((nombre, error))
+                continue
+            tareas.append((nombre, contenido))
+            if len(tareas) >= tamano_lote * procesos:
+                enviado = enviar(tareas)
+                if pendiente is not None:
+                    guardar(pendiente)
+                pendiente, tareas = enviado, []
+        if pendiente is not None:
+            guardar(pendiente)
+        guardar(enviar(tareas))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return resultado
@@ -1,3 +1,163 @@
+import io
+import zipfile
+from decimal import Decimal
+
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
 
-# Create your tests here.
+from inventario_de_obra.models import EntradaInventario, Inventario
+from rubros.models import Material, Unidad
+
+from .models import CodigoProveedorMaterial, DetalleFactura, SRIFactura
+from .sri import (
+    CONFLICTO, DUPLICADA, NUEVA, clasificar, factura_desde_datos, importar_facturas, leer_archivos_subidos, leer_comprobante,
+)
+
+RUC = '0104660477001'
+
+
+def comprobante(autorizacion, secuencial, ruc=RUC, detalles=(('CEM-50', 'Cemento', '10', '8.00'),)):
+    """XML de autorizacion del SRI con la factura en CDATA, como lo entrega el portal."""
+    lineas = ''.join(
+        f'<detalle><codigoPrincipal>{codigo}</codigoPrincipal><descripcion>{descripcion}</descripcion>'
+        f'<cantidad>{cantidad}</cantidad><precioUnitario>{precio}</precioUnitario><descuento>0.00</descuento>'
+        f'<precioTotalSinImpuesto>{Decimal(cantidad) * Decimal(precio):.2f}</precioTotalSinImpuesto></detalle>'
+        for codigo, descripcion, cantidad, precio in detalles
+    )
+    factura = (
+        '<?xml version="1.0" encoding="UTF-8"?><factura version="1.1.0" id="comprobante"><infoTributaria>'
+        '<razonSocial>PAUCAR FARFAN SILVIA</razonSocial><nombreComercial>FERRETERIA AZUL</nombreComercial>'
+        f'<ruc>{ruc}</ruc><claveAcceso>{autorizacion}</claveAcceso><codDoc>01</codDoc><estab>002</estab>'
+        f'<ptoEmi>021</ptoEmi><secuencial>{secuencial}</secuencial></infoTributaria><infoFactura>'
+        '<fechaEmision>02/10/2024</fechaEmision><totalSinImpuestos>80.00</totalSinImpuestos>'
+        f'<importeTotal>92.00</importeTotal></infoFactura><detalles>{lineas}</detalles></factura>'
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><autorizacion><estado>AUTORIZADO</estado>'
+        f'<numeroAutorizacion>{autorizacion}</numeroAutorizacion><comprobante><![CDATA[{factura}]]></comprobante>'
+        '</autorizacion>'
+    ).encode('utf-8')
+
+
+def zip_de(archivos):
+    contenido = io.BytesIO()
+    with zipfile.ZipFile(contenido, 'w') as zip_:
+        for nombre, xml in archivos.items():
+            zip_.writestr(nombre, xml)
+    return contenido.getvalue()
+
+
+def importar(archivos, entradas=False):
+    """Importa [(nombre, contenido)] como archivos subidos, en el mismo proceso, como el admin."""
+    subidos = [SimpleUploadedFile(nombre, contenido) for nombre, contenido in archivos]
+    return importar_facturas(leer_archivos_subidos(subidos), procesos=1, entradas=entradas)
+
+
+class ImportacionFacturasTests(TestCase):
+    def test_importa_facturas_de_xml_y_zip(self):
+        resultado = importar([
+            ('f1.xml', comprobante('1001', '000000001')),
+            ('lote.zip', zip_de({'sub/f2.xml': comprobante('1002', '000000002'), 'f3.xml': comprobante('1003', '000000003')})),
+        ])
+
+        self.assertEqual((resultado.archivos, resultado.creadas, resultado.detalles), (3, 3, 3))
+        self.assertEqual((resultado.duplicadas, resultado.conflictos, resultado.errores), ([], [], []))
+        factura = SRIFactura.objects.get(numero_autorizacion='1002')
+        self.assertEqual((factura.ruc, factura.numero_factura, factura.importe_total), (RUC, '002-021-000000002', Decimal('92.00')))
+        self.assertEqual(DetalleFactura.objects.get(factura=factura).cantidad, Decimal('10'))
+
+    def test_reimportar_marca_las_facturas_como_duplicadas(self):
+        importar([('f1.xml', comprobante('1001', '000000001'))])
+
+        resultado = importar([('f1.xml', comprobante('1001', '000000001')), ('f2.xml', comprobante('1002', '000000002'))])
+
+        self.assertEqual(resultado.creadas, 1)
+        self.assertEqual(resultado.duplicadas, ['f1.xml'])
+        self.assertEqual(SRIFactura.objects.count(), 2)
+        self.assertEqual(DetalleFactura.objects.count(), 2)
+
+    def test_factura_repetida_en_el_mismo_lote_es_duplicada(self):
+        resultado = importar([
+            ('f1.xml', comprobante('1001', '000000001')),
+            ('lote.zip', zip_de({'copia.xml': comprobante('1001', '000000001')})),
+        ])
+
+        self.assertEqual(resultado.creadas, 1)
+        self.assertEqual(resultado.duplicadas, ['lote.zip:copia.xml'])
+
+    def test_autorizacion_de_otra_factura_es_conflicto(self):
+        importar([('f1.xml', comprobante('1001', '000000001'))])
+
+        resultado = importar([('f2.xml', comprobante('1001', '000000099'))])
+
+        self.assertEqual(resultado.creadas, 0)
+        self.assertEqual([nombre for nombre, _ in resultado.conflictos], ['f2.xml'])
+        self.assertIn('000000001', resultado.conflictos[0][1])
+
+    def test_mismo_ruc_y_numero_con_otra_autorizacion_es_conflicto(self):
+        importar([('f1.xml', comprobante('1001', '000000001'))])
+
+        # Sin la clasificacion previa, la restriccion unica (ruc, numero_factura) daria IntegrityError
+        resultado = importar([('f2.xml', comprobante('2002', '000000001')), ('f3.xml', comprobante('1003', '000000003'))])
+
+        self.assertEqual(resultado.creadas, 1)
+        self.assertEqual([nombre for nombre, _ in resultado.conflictos], ['f2.xml'])
+        self.assertIn('1001', resultado.conflictos[0][1])
+        self.assertFalse(SRIFactura.objects.filter(numero_autorizacion='2002').exists())
+
+    def test_mismo_numero_de_otro_proveedor_es_nueva(self):
+        importar([('f1.xml', comprobante('1001', '000000001'))])
+
+        resultado = importar([('f2.xml', comprobante('2002', '000000001', ruc='1790012345001'))])
+
+        self.assertEqual((resultado.creadas, resultado.conflictos), (1, []))
+
+    def test_archivos_con_errores_no_detienen_a_los_demas(self):
+        resultado = importar([
+            ('roto.xml', b'<autorizacion><comprobante>'),
+            ('malo.zip', b'no es un zip'),
+            ('f1.xml', comprobante('1001', '000000001')),
+        ])
+
+        self.assertEqual(resultado.creadas, 1)
+        self.assertEqual(sorted(nombre for nombre, _ in resultado.errores), ['malo.zip', 'roto.xml'])
+
+    def test_lineas_emparejadas_se_registran_como_entradas(self):
+        unidad = Unidad.objects.create(nombre='saco', abreviatura='sc')
+        cemento = Material.objects.create(nombre='Cemento', unidad=unidad, costo_por_unidad=Decimal('7.50'))
+
+        resultado = importar([('f1.xml', comprobante('1001', '000000001', detalles=(
+            ('CEM-50', 'Cemento', '10', '8.00'), ('X-1', 'Clavos sin catalogo', '2', '1.00'),
+        )))], entradas=True)
+
+        self.assertEqual((resultado.creadas, resultado.detalles, resultado.entradas), (1, 2, 1))
+        entrada = EntradaInventario.objects.get()
+        self.assertEqual((entrada.material, entrada.cantidad, entrada.costo_unitario), (cemento, Decimal('10'), Decimal('8')))
+        self.assertEqual(Inventario.objects.get(material=cemento).stock_actual, Decimal('10'))
+        # El codigo del proveedor queda aprendido para las siguientes facturas
+        self.assertTrue(CodigoProveedorMaterial.objects.filter(ruc=RUC, codigo='CEM-50', material=cemento).exists())
+
+
+class ClasificarTests(TestCase):
+    def factura(self, autorizacion, secuencial, ruc=RUC):
+        return factura_desde_datos(leer_comprobante(comprobante(autorizacion, secuencial, ruc)))[0]
+
+    def test_clases_en_una_sola_consulta(self):
+        importar([('f1.xml', comprobante('1001', '000000001'))])
+        facturas = [
+            self.factura('1001', '000000001'),  # ya registrada
+            self.factura('1002', '000000002'),  # nueva
+            self.factura('1001', '000000005'),  # autorizacion de otra factura
+            self.factura('3003', '000000001'),  # (ruc, numero) de otra autorizacion
+            self.factura('1002', '000000002'),  # repetida en la lista
+            self.factura('4004', '000000002'),  # (ruc, numero) de una nueva de la lista
+        ]
+
+        with self.assertNumQueries(1):
+            clases = [clase for clase, _ in clasificar(facturas)]
+
+        self.assertEqual(clases, [DUPLICADA, NUEVA, CONFLICTO, CONFLICTO, DUPLICADA, CONFLICTO])
+
+    def test_lista_vacia_no_consulta(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(clasificar([]), [])
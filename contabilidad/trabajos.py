@@ -0,0 +1,38 @@
+"""Tareas en segundo plano de contabilidad."""
+from dataclasses import asdict
+
+from django.core.files.base import ContentFile
+
+from tareas.models import ArchivoTarea
+from tareas.registro import Trabajo, registrar
+
+from .admin import ImportarFacturasForm
+from .sri import importar_facturas, leer_archivos_subidos
+
+ARCHIVOS_POR_PARTE = 200
+
+
+class ImportarFacturasTareaForm(ImportarFacturasForm):
+    segundo_plano = None
+
+
+@registrar
+class ImportarFacturasSRI(Trabajo):
+    nombre = 'importar_facturas_sri'
+    descripcion = "Importar facturas del SRI (XML o zip)"
+    formulario = ImportarFacturasTareaForm
+    # importar_facturas guarda por lotes; repetir una parte solo reporta como
+    # ya registradas las facturas que alcanzo a guardar
+    atomico = False
+
+    def partes(self, tarea):
+        ids = list(tarea.archivos.order_by('pk').values_list('pk', flat=True))
+        return [ids[inicio:inicio + ARCHIVOS_POR_PARTE] for inicio in range(0, len(ids), ARCHIVOS_POR_PARTE)]
+
+    def ejecutar(self, tarea, datos):
+        archivos = (
+            ContentFile(bytes(archivo.contenido), name=archivo.nombre)
+            for archivo in ArchivoTarea.objects.filter(pk__in=datos).order_by('pk').iterator(chunk_size=20)
+        )
+        resultado = importar_facturas(leer_archivos_subidos(archivos), procesos=1, entradas=tarea.parametros.get('entradas', True))
+        return asdict(resultado)
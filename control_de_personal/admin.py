@@ -1,9 +1,20 @@
 from django.contrib import admin
 
 # Register your models here.
-from django.contrib import admin
-from .models import Personal, RegistroAsistencia
-from django.db import models
+from datetime import date
+
+from django import forms
+from django.contrib import messages
+from django.core.exceptions import ValidationError
+from django.db.models.functions import TruncMonth
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+
+from .asistencia import lista_del_dia, pasar_lista
+from .models import Nomina, Personal, RegistroAsistencia
+from .nomina import calcular_nomina, periodo_del_mes
+
 
 @admin.register(Personal)
 class PersonalAdmin(admin.ModelAdmin):
@@ -12,18 +23,148 @@ class PersonalAdmin(admin.ModelAdmin):
     list_filter = ('activo', 'fecha_ingreso')
 
 
-@admin.action(description='Calcular suma de sueldos seleccionados')
-def calcular_suma_sueldos(modeladmin, request, queryset):
-    total_sueldos = queryset.aggregate(total=models.Sum('empleado__sueldo'))['total']
-    modeladmin.message_user(request, f"El total de los sueldos seleccionados es: {total_sueldos}")
+@admin.action(description='Calcular la nómina de los meses seleccionados')
+def calcular_nomina_del_mes(modeladmin, request, queryset):
+    # Un calculo por mes, solo para los empleados de los registros seleccionados
+    empleados = list(queryset.order_by().values_list('empleado', flat=True).distinct())
+    meses = queryset.order_by().annotate(mes=TruncMonth('fecha')).values_list('mes', flat=True).distinct()
+    for mes in sorted(meses):
+        resultado = calcular_nomina(*periodo_del_mes(mes), empleados=empleados)
+        modeladmin.message_user(
+            request, f"Nómina de {mes:%m/%Y}: {resultado.empleados} empleados, total {resultado.total}."
+        )
+
+
+class PasarListaForm(forms.Form):
+    fecha = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+
 
 @admin.register(RegistroAsistencia)
 class RegistroAsistenciaAdmin(admin.ModelAdmin):
     list_display = ('empleado', 'fecha', 'presente', 'get_sueldo', 'observaciones')
     list_filter = ('empleado', 'fecha', 'presente')
     search_fields = ('empleado__nombre', 'observaciones')
-    actions = [calcular_suma_sueldos]  # Añade la acción
+    list_select_related = ('empleado__cargo',)
+    actions = [calcular_nomina_del_mes]  # Añade la acción
+    change_list_template = 'admin/control_de_personal/registroasistencia/change_list.html'
 
     def get_sueldo(self, obj):
         return obj.sueldo
-    get_sueldo.short_description = 'Sueldo'
\ No newline at end of file
+    get_sueldo.short_description = 'Sueldo'
+
+    def get_urls(self):
+        urls = [
+            path('pasar-lista/', self.admin_site.admin_view(self.pasar_lista_view), name='control_de_personal_pasar_lista'),
+        ]
+        return urls + super().get_urls()
+
+    # Asistencia de todo el personal activo en una sola pantalla. Cada fila
+    # envia observaciones_<id> y, si esta marcada, presente=<id>: dos campos
+    # por empleado, dentro de DATA_UPLOAD_MAX_NUMBER_FIELDS para cuadrillas
+    # de hasta unas 500 personas.
+    def pasar_lista_view(self, request):
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            return redirect('admin:index')
+
+        datos = request.POST if request.method == 'POST' else (request.GET if 'fecha' in request.GET else None)
+        form = PasarListaForm(datos, initial={'fecha': date.today()})
+        fecha = form.cleaned_data['fecha'] if form.is_valid() else date.today()
+
+        enviados = {}
+        if request.method == 'POST' and form.is_valid():
+            presentes = set(request.POST.getlist('presente'))
+            enviados = {
+                clave.removeprefix('observaciones_'): {
+                    'empleado': clave.removeprefix('observaciones_'),
+                    'presente': clave.removeprefix('observaciones_') in presentes,
+                    'observaciones': valor,
+                }
+                for clave, valor in request.POST.items() if clave.startswith('observaciones_')
+            }
+            try:
+                resultado = pasar_lista(fecha, enviados.values())
+            except ValidationError as error:
+                for mensaje in error.messages:
+                    self.message_user(request, mensaje, messages.ERROR)
+            else:
+                self.message_user(
+                    request,
+                    f"Asistencia del {resultado.fecha}: {resultado.presentes} presentes y {resultado.ausentes} ausentes.",
+                    messages.SUCCESS,
+                )
+                return redirect(f"{reverse('admin:control_de_personal_pasar_lista')}?fecha={fecha}")
+
+        personal = list(lista_del_dia(fecha))
+        for empleado in personal:
+            # Si no se pudo guardar se muestra lo enviado, no lo registrado
+            enviado = enviados.get(str(empleado.pk))
+            if enviado is not None:
+                empleado.presente, empleado.observaciones = enviado['presente'], enviado['observaciones']
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Pasar lista',
+            'form': form,
+            'fecha': fecha,
+            'personal': personal,
+            'registrados': sum(empleado.presente is not None for empleado in personal),
+        }
+        return TemplateResponse(request, 'admin/control_de_personal/pasar_lista.html', context)
+
+
+class CalcularNominaForm(forms.Form):
+    desde = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    hasta = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+
+
+@admin.register(Nomina)
+class NominaAdmin(admin.ModelAdmin):
+    list_display = ('empleado', 'desde', 'hasta', 'dias_presente', 'dias_ausente', 'sueldo', 'monto', 'calculada')
+    list_filter = ('desde', 'hasta')
+    search_fields = ('empleado__nombre',)
+    date_hierarchy = 'desde'
+    list_select_related = ('empleado',)
+    readonly_fields = ('empleado', 'desde', 'hasta', 'dias_presente', 'dias_ausente', 'sueldo', 'monto', 'calculada')
+    change_list_template = 'admin/control_de_personal/nomina/change_list.html'
+
+    def has_add_permission(self, request):
+        # Se genera desde la asistencia (Calcular nómina o calcular_nomina)
+        return False
+
+    def get_urls(self):
+        urls = [
+            path('calcular/', self.admin_site.admin_view(self.calcular_view), name='control_de_personal_calcular_nomina'),
+        ]
+        return urls + super().get_urls()
+
+    def calcular_view(self, request):
+        if not self.has_change_permission(request):
+            return redirect('admin:index')
+
+        if request.method == 'POST':
+            form = CalcularNominaForm(request.POST)
+            if form.is_valid():
+                try:
+                    resultado = calcular_nomina(form.cleaned_data['desde'], form.cleaned_data['hasta'])
+                except ValidationError as error:
+                    form.add_error(None, error)
+                else:
+                    self.message_user(
+                        request,
+                        f"Nómina del {resultado.desde} al {resultado.hasta}: {resultado.empleados} empleados, "
+                        f"{resultado.dias_presente} días presentes, total {resultado.total}.",
+                        messages.SUCCESS,
+                    )
+                    url = reverse('admin:control_de_personal_nomina_changelist')
+                    return redirect(f"{url}?desde={resultado.desde}&hasta={resultado.hasta}")
+        else:
+            desde, hasta = periodo_del_mes(date.today())
+            form = CalcularNominaForm(initial={'desde': desde, 'hasta': hasta})
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Calcular nómina',
+            'form': form,
+        }
+        return TemplateResponse(request, 'admin/control_de_personal/calcular_nomina.html', context)
@@ -0,0 +1,115 @@
+"""
+Registro de asistencia de toda la cuadrilla a la vez (pasar lista).
+
+lista_del_dia() trae en una consulta el personal activo con lo ya
+registrado ese dia; pasar_lista() valida el lote completo y lo guarda con
+un solo bulk_create que, por la restriccion unica (empleado, fecha),
+actualiza los registros que ya existian: enviar la misma lista dos veces
+no duplica nada.
+"""
+from dataclasses import dataclass
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils.dateparse import parse_date
+
+from .models import Personal, RegistroAsistencia
+
+TAMANO_LOTE = 500
+VERDADEROS = {'1', 'true', 'si', 'sí', 'on', 'presente'}
+FALSOS = {'0', 'false', 'no', 'off', 'ausente', ''}
+
+
+@dataclass
+class ResultadoAsistencia:
+    fecha: date
+    registros: int = 0
+    presentes: int = 0
+    ausentes: int = 0
+
+
+def _fecha(valor):
+    if isinstance(valor, date):
+        return valor
+    try:
+        fecha = parse_date(str(valor or ''))
+    except ValueError:
+        fecha = None
+    if fecha is None:
+        raise ValidationError(f"Fecha '{valor}' no valida (AAAA-MM-DD).")
+    return fecha
+
+
+def _booleano(valor):
+    if isinstance(valor, bool):
+        return valor
+    texto = str(valor if valor is not None else '').strip().lower()
+    if texto in VERDADEROS:
+        return True
+    if texto in FALSOS:
+        return False
+    raise ValueError
+
+
+def lista_del_dia(fecha):
+    """Personal activo con su registro de la fecha (presente y observaciones en None si no tiene)."""
+    fecha = _fecha(fecha)
+    registro = RegistroAsistencia.objects.filter(empleado=OuterRef('pk'), fecha=fecha)
+    return (
+        Personal.objects.filter(activo=True).select_related('cargo').order_by('nombre', 'pk')
+        .annotate(presente=Subquery(registro.values('presente')[:1]),
+                  observaciones=Subquery(registro.values('observaciones')[:1]))
+    )
+
+
+def pasar_lista(fecha, registros):
+    """
+    Guarda la asistencia de la fecha: registros es una lista de
+    diccionarios con empleado (id), presente (por defecto True) y
+    observaciones opcionales. Solo se aceptan empleados activos y cada uno
+    una vez. Si algun registro no es valido no se guarda ninguno.
+    """
+    fecha = _fecha(fecha)
+    registros = list(registros)
+    activos = set(Personal.objects.filter(activo=True).values_list('pk', flat=True))
+
+    errores = []
+    vistos = set()
+    asistencias = []
+    for numero, registro in enumerate(registros, start=1):
+        if not isinstance(registro, dict):
+            errores.append(f"Registro {numero}: formato no valido.")
+            continue
+        try:
+            empleado = int(str(registro.get('empleado')).strip())
+        except (TypeError, ValueError):
+            empleado = None
+        if empleado not in activos:
+            errores.append(f"Registro {numero}: no existe un empleado activo '{registro.get('empleado')}'.")
+            continue
+        if empleado in vistos:
+            errores.append(f"Registro {numero}: el empleado {empleado} ya esta en la lista.")
+            continue
+        vistos.add(empleado)
+        try:
+            presente = _booleano(registro.get('presente', True))
+        except ValueError:
+            errores.append(f"Registro {numero}: presente '{registro.get('presente')}' no valido.")
+            continue
+        asistencias.append(RegistroAsistencia(
+            empleado_id=empleado, fecha=fecha, presente=presente,
+            observaciones=str(registro.get('observaciones') or '').strip(),
+        ))
+
+    if errores:
+        raise ValidationError(errores)
+
+    with transaction.atomic():
+        RegistroAsistencia.objects.bulk_create(
+            asistencias, batch_size=TAMANO_LOTE,
+            update_conflicts=True, unique_fields=['empleado', 'fecha'], update_fields=['presente', 'observaciones'],
+        )
+    presentes = sum(asistencia.presente for asistencia in asistencias)
+    return ResultadoAsistencia(fecha=fecha, registros=len(asistencias), presentes=presentes, ausentes=len(asistencias) - presentes)
@@ -0,0 +1,46 @@
+import time
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from control_de_personal.nomina import calcular_nomina, periodo_del_mes
+
+
+class Command(BaseCommand):
+    help = "Calcula la nomina de un periodo desde los registros de asistencia (por defecto el mes actual)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mes', help="Mes a calcular, AAAA-MM.")
+        parser.add_argument('--desde', help="Inicio de un periodo distinto a un mes, AAAA-MM-DD (con --hasta).")
+        parser.add_argument('--hasta', help="Fin del periodo, AAAA-MM-DD.")
+
+    def handle(self, *args, **options):
+        if options['desde'] or options['hasta']:
+            if options['mes']:
+                raise CommandError("Use --mes o --desde/--hasta, no ambos.")
+            try:
+                desde, hasta = parse_date(options['desde'] or ''), parse_date(options['hasta'] or '')
+            except ValueError:
+                desde = hasta = None
+            if desde is None or hasta is None:
+                raise CommandError("--desde y --hasta deben ser fechas AAAA-MM-DD.")
+        else:
+            try:
+                mes = parse_date(f"{options['mes']}-01") if options['mes'] else date.today()
+            except ValueError:
+                mes = None
+            if mes is None:
+                raise CommandError("--mes debe tener la forma AAAA-MM.")
+            desde, hasta = periodo_del_mes(mes)
+
+        inicio = time.perf_counter()
+        try:
+            resultado = calcular_nomina(desde, hasta)
+        except ValidationError as error:
+            raise CommandError(' '.join(error.messages))
+        self.stdout.write(self.style.SUCCESS(
+            f"Nómina del {desde} al {hasta}: {resultado.empleados} empleados, {resultado.dias_presente} días presentes, "
+            f"{resultado.dias_ausente} ausentes, total {resultado.total} ({time.perf_counter() - inicio:.2f} s)."
+        ))
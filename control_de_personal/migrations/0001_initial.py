@@ -0,0 +1,65 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('rubros', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Personal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255)),
+                ('sueldo', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('fecha_ingreso', models.DateField()),
+                ('activo', models.BooleanField(default=True)),
+                ('cargo', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='personal', to='rubros.manoobra')),
+            ],
+            options={
+                'verbose_name': 'Personal',
+                'verbose_name_plural': 'Personal',
+            },
+        ),
+        migrations.CreateModel(
+            name='Nomina',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('desde', models.DateField()),
+                ('hasta', models.DateField()),
+                ('dias_presente', models.PositiveIntegerField(default=0)),
+                ('dias_ausente', models.PositiveIntegerField(default=0)),
+                ('sueldo', models.DecimalField(decimal_places=2, help_text='Sueldo mensual al calcular la nómina', max_digits=10)),
+                ('monto', models.DecimalField(decimal_places=2, help_text='A pagar por los días presentes', max_digits=12)),
+                ('calculada', models.DateTimeField(auto_now=True)),
+                ('empleado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nominas', to='control_de_personal.personal')),
+            ],
+            options={
+                'verbose_name': 'Nómina',
+                'verbose_name_plural': 'Nóminas',
+                'indexes': [models.Index(fields=['desde', 'hasta'], name='control_de__desde_ea971f_idx')],
+                'constraints': [models.UniqueConstraint(fields=('empleado', 'desde', 'hasta'), name='nomina_por_periodo')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RegistroAsistencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('presente', models.BooleanField(default=True)),
+                ('observaciones', models.TextField(blank=True, null=True)),
+                ('empleado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='asistencias', to='control_de_personal.personal')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha', 'empleado', 'presente'], name='control_de__fecha_0fe2a5_idx')],
+                'constraints': [models.UniqueConstraint(fields=('empleado', 'fecha'), name='asistencia_por_dia')],
+            },
+        ),
+    ]
@@ -28,6 +28,11 @@ class RegistroAsistencia(models.Model):
     presente = models.BooleanField(default=True)
     observaciones = models.TextField(blank=True, null=True)
 
+    class Meta:
+        # Un registro por empleado y dia: volver a pasar lista lo actualiza
+        constraints = [models.UniqueConstraint(fields=['empleado', 'fecha'], name='asistencia_por_dia')]
+        # La nomina agrupa por empleado los registros de un rango de fechas
+        indexes = [models.Index(fields=['fecha', 'empleado', 'presente'])]
 
     @property
     def sueldo(self):
@@ -37,3 +42,25 @@ class RegistroAsistencia(models.Model):
     def __str__(self):
         return f"Asistencia de {self.empleado.nombre} - {self.fecha}"
 
+
+
+# Resultado de la nomina de un empleado en un periodo, con el sueldo de ese
+# momento; se reemplaza al volver a calcular el mismo periodo (calcular_nomina).
+class Nomina(models.Model):
+    empleado = models.ForeignKey(Personal, on_delete=models.CASCADE, related_name='nominas')
+    desde = models.DateField()
+    hasta = models.DateField()
+    dias_presente = models.PositiveIntegerField(default=0)
+    dias_ausente = models.PositiveIntegerField(default=0)
+    sueldo = models.DecimalField(max_digits=10, decimal_places=2, help_text="Sueldo mensual al calcular la nómina")
+    monto = models.DecimalField(max_digits=12, decimal_places=2, help_text="A pagar por los días presentes")
+    calculada = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Nómina"
+        verbose_name_plural = "Nóminas"
+        constraints = [models.UniqueConstraint(fields=['empleado', 'desde', 'hasta'], name='nomina_por_periodo')]
+        indexes = [models.Index(fields=['desde', 'hasta'])]
+
+    def __str__(self):
+        return f"Nómina de {self.empleado.nombre} del {self.desde} al {self.hasta}: {self.monto}"
@@ -0,0 +1,77 @@
+"""
+Calculo de la nomina desde los registros de asistencia.
+
+calcular_nomina() cuenta los dias presentes y ausentes de cada empleado en
+un periodo con una sola consulta agrupada sobre RegistroAsistencia y guarda
+una Nomina por empleado, reemplazando el calculo anterior del mismo
+periodo. El sueldo de Personal es mensual: cada dia presente se paga como
+sueldo / DIAS_MES.
+"""
+import calendar
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import Nomina, RegistroAsistencia
+
+DIAS_MES = 30
+
+
+@dataclass
+class ResultadoNomina:
+    desde: object
+    hasta: object
+    empleados: int = 0
+    dias_presente: int = 0
+    dias_ausente: int = 0
+    total: Decimal = Decimal('0')
+
+
+def periodo_del_mes(fecha):
+    """(primer dia, ultimo dia) del mes de la fecha."""
+    return fecha.replace(day=1), fecha.replace(day=calendar.monthrange(fecha.year, fecha.month)[1])
+
+
+def monto(sueldo, dias_presente):
+    return (sueldo * dias_presente / DIAS_MES).quantize(Decimal('0.01'))
+
+
+def calcular_nomina(desde, hasta, empleados=None):
+    """
+    Calcula y guarda la nomina del periodo [desde, hasta] de los empleados
+    con registros de asistencia en el (o solo de los ids en empleados).
+    """
+    if desde > hasta:
+        raise ValidationError("La fecha inicial del periodo es posterior a la final.")
+
+    registros = RegistroAsistencia.objects.filter(fecha__range=(desde, hasta))
+    anteriores = Nomina.objects.filter(desde=desde, hasta=hasta)
+    if empleados is not None:
+        registros = registros.filter(empleado__in=empleados)
+        anteriores = anteriores.filter(empleado__in=empleados)
+    filas = registros.order_by().values('empleado', 'empleado__sueldo').annotate(
+        dias_presente=Count('pk', filter=Q(presente=True)),
+        dias_ausente=Count('pk', filter=Q(presente=False)),
+    )
+
+    resultado = ResultadoNomina(desde=desde, hasta=hasta)
+    nominas = []
+    for fila in filas:
+        nomina = Nomina(
+            empleado_id=fila['empleado'], desde=desde, hasta=hasta,
+            dias_presente=fila['dias_presente'], dias_ausente=fila['dias_ausente'],
+            sueldo=fila['empleado__sueldo'], monto=monto(fila['empleado__sueldo'], fila['dias_presente']),
+        )
+        nominas.append(nomina)
+        resultado.dias_presente += nomina.dias_presente
+        resultado.dias_ausente += nomina.dias_ausente
+        resultado.total += nomina.monto
+    resultado.empleados = len(nominas)
+
+    with transaction.atomic():
+        anteriores.delete()
+        Nomina.objects.bulk_create(nominas, batch_size=1000)
+    return resultado
@@ -1,3 +1,190 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import Permission, User
+from django.core.exceptions import ValidationError
 from django.test import TestCase
 
-# Create your tests here.
+from .asistencia import lista_del_dia, pasar_lista
+from .models import Nomina, Personal, RegistroAsistencia
+from .nomina import calcular_nomina, periodo_del_mes
+
+OCTUBRE = periodo_del_mes(date(2024, 10, 15))
+
+
+def registrar(empleado, dias, presente=True):
+    RegistroAsistencia.objects.bulk_create(
+        RegistroAsistencia(empleado=empleado, fecha=date(2024, 10, dia), presente=presente) for dia in dias
+    )
+
+
+class NominaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = Personal.objects.create(nombre='Ana', sueldo=Decimal('450.00'), fecha_ingreso=date(2024, 1, 1))
+        cls.luis = Personal.objects.create(nombre='Luis', sueldo=Decimal('500.00'), fecha_ingreso=date(2024, 1, 1))
+        registrar(cls.ana, [1, 2, 3])
+        registrar(cls.ana, [4], presente=False)
+        registrar(cls.luis, [1])
+        registrar(cls.luis, [2, 3], presente=False)
+        # Fuera del periodo
+        RegistroAsistencia.objects.create(empleado=cls.ana, fecha=date(2024, 11, 1))
+
+    def nomina(self, empleado):
+        return Nomina.objects.get(empleado=empleado, desde=OCTUBRE[0], hasta=OCTUBRE[1])
+
+    def test_periodo_del_mes(self):
+        self.assertEqual(OCTUBRE, (date(2024, 10, 1), date(2024, 10, 31)))
+        self.assertEqual(periodo_del_mes(date(2024, 2, 10)), (date(2024, 2, 1), date(2024, 2, 29)))
+
+    def test_cuenta_dias_por_empleado_y_redondea_el_monto(self):
+        resultado = calcular_nomina(*OCTUBRE)
+
+        ana, luis = self.nomina(self.ana), self.nomina(self.luis)
+        self.assertEqual((ana.dias_presente, ana.dias_ausente, ana.sueldo, ana.monto), (3, 1, Decimal('450.00'), Decimal('45.00')))
+        # 500 / 30 = 16.666...
+        self.assertEqual((luis.dias_presente, luis.dias_ausente, luis.monto), (1, 2, Decimal('16.67')))
+        self.assertEqual(
+            (resultado.empleados, resultado.dias_presente, resultado.dias_ausente, resultado.total),
+            (2, 4, 3, Decimal('61.67')),
+        )
+
+    def test_recalcular_reemplaza_la_nomina_del_periodo(self):
+        calcular_nomina(*OCTUBRE)
+        RegistroAsistencia.objects.filter(empleado=self.luis, fecha=date(2024, 10, 2)).update(presente=True)
+        Personal.objects.filter(pk=self.luis.pk).update(sueldo=Decimal('600.00'))
+
+        calcular_nomina(*OCTUBRE)
+
+        self.assertEqual(Nomina.objects.count(), 2)
+        luis = self.nomina(self.luis)
+        self.assertEqual((luis.dias_presente, luis.dias_ausente, luis.sueldo, luis.monto), (2, 1, Decimal('600.00'), Decimal('40.00')))
+
+    def test_recalcular_algunos_empleados_conserva_a_los_demas(self):
+        calcular_nomina(*OCTUBRE)
+        RegistroAsistencia.objects.filter(empleado=self.ana).delete()
+        Personal.objects.filter(pk=self.luis.pk).update(sueldo=Decimal('600.00'))
+
+        resultado = calcular_nomina(*OCTUBRE, empleados=[self.ana.pk])
+
+        # Ana ya no tiene registros: su nomina anterior se borra y la de Luis no cambia
+        self.assertEqual(resultado.empleados, 0)
+        self.assertFalse(Nomina.objects.filter(empleado=self.ana).exists())
+        self.assertEqual(self.nomina(self.luis).monto, Decimal('16.67'))
+
+    def test_otro_periodo_no_reemplaza(self):
+        calcular_nomina(*OCTUBRE)
+
+        calcular_nomina(date(2024, 10, 1), date(2024, 10, 2))
+
+        self.assertEqual(Nomina.objects.filter(desde=OCTUBRE[0], hasta=OCTUBRE[1]).count(), 2)
+        self.assertEqual(Nomina.objects.get(empleado=self.ana, hasta=date(2024, 10, 2)).dias_presente, 2)
+
+    def test_periodo_invertido(self):
+        with self.assertRaises(ValidationError):
+            calcular_nomina(OCTUBRE[1], OCTUBRE[0])
+        self.assertFalse(Nomina.objects.exists())
+
+
+class PasarListaTests(TestCase):
+    FECHA = date(2024, 10, 7)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = Personal.objects.create(nombre='Ana', sueldo=Decimal('450.00'), fecha_ingreso=date(2024, 1, 1))
+        cls.luis = Personal.objects.create(nombre='Luis', sueldo=Decimal('500.00'), fecha_ingreso=date(2024, 1, 1))
+        cls.retirado = Personal.objects.create(
+            nombre='Pedro', sueldo=Decimal('500.00'), fecha_ingreso=date(2024, 1, 1), activo=False,
+        )
+
+    def asistencia(self):
+        return {
+            registro.empleado_id: (registro.presente, registro.observaciones)
+            for registro in RegistroAsistencia.objects.filter(fecha=self.FECHA)
+        }
+
+    def test_reenviar_la_lista_actualiza_sin_duplicar(self):
+        pasar_lista(self.FECHA, [{'empleado': self.ana.pk}, {'empleado': self.luis.pk, 'presente': 'no'}])
+
+        resultado = pasar_lista('2024-10-07', [
+            {'empleado': self.ana.pk, 'presente': False, 'observaciones': ' Permiso medico '},
+            {'empleado': str(self.luis.pk), 'presente': 'si'},
+        ])
+
+        self.assertEqual((resultado.registros, resultado.presentes, resultado.ausentes), (2, 1, 1))
+        self.assertEqual(RegistroAsistencia.objects.count(), 2)
+        self.assertEqual(self.asistencia(), {self.ana.pk: (False, 'Permiso medico'), self.luis.pk: (True, '')})
+
+    def test_un_registro_invalido_rechaza_todo_el_lote(self):
+        pasar_lista(self.FECHA, [{'empleado': self.ana.pk}])
+
+        for invalido in (
+            {'empleado': self.retirado.pk},
+            {'empleado': 9999},
+            {'empleado': self.ana.pk},  # repetido en la lista
+            {'empleado': self.luis.pk, 'presente': 'tal vez'},
+            'Luis',
+        ):
+            with self.subTest(invalido=invalido), self.assertRaises(ValidationError) as error:
+                pasar_lista(self.FECHA, [{'empleado': self.ana.pk, 'presente': False}, invalido])
+            self.assertEqual(len(error.exception.messages), 1)
+            self.assertTrue(error.exception.messages[0].startswith('Registro 2:'))
+            self.assertEqual(self.asistencia(), {self.ana.pk: (True, '')})
+
+    def test_lista_del_dia_trae_el_personal_activo_con_su_registro(self):
+        pasar_lista(self.FECHA, [{'empleado': self.luis.pk, 'presente': False, 'observaciones': 'Lluvia'}])
+
+        with self.assertNumQueries(1):
+            lista = [(empleado.nombre, empleado.presente, empleado.observaciones) for empleado in lista_del_dia(self.FECHA)]
+
+        self.assertEqual(lista, [('Ana', None, None), ('Luis', False, 'Lluvia')])
+
+    def test_fecha_no_valida(self):
+        with self.assertRaises(ValidationError):
+            pasar_lista('07/10/2024', [{'empleado': self.ana.pk}])
+
+
+class PasarListaApiTests(TestCase):
+    URL = '/api/personal/asistencia/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empleados = Personal.objects.bulk_create(
+            Personal(nombre=f'Obrero {numero:03}', sueldo=Decimal('460.00'), fecha_ingreso=date(2024, 1, 1))
+            for numero in range(300)
+        )
+        cls.usuario = User.objects.create_user('supervisor', password='clave')
+        cls.usuario.user_permissions.set(Permission.objects.filter(
+            content_type__app_label='control_de_personal',
+            codename__in=['view_registroasistencia', 'add_registroasistencia', 'change_registroasistencia'],
+        ))
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def enviar(self, registros, fecha='2024-10-07'):
+        return self.client.post(self.URL, {'fecha': fecha, 'registros': registros}, content_type='application/json')
+
+    def test_registra_toda_la_cuadrilla_en_una_solicitud_y_reenviar_no_duplica(self):
+        registros = [{'empleado': empleado.pk, 'presente': numero % 10 != 0} for numero, empleado in enumerate(self.empleados)]
+
+        for _ in range(2):
+            respuesta = self.enviar(registros)
+            self.assertEqual(respuesta.status_code, 201)
+            self.assertEqual(respuesta.json(), {'fecha': '2024-10-07', 'registros': 300, 'presentes': 270, 'ausentes': 30})
+
+        self.assertEqual(RegistroAsistencia.objects.count(), 300)
+        lista = self.client.get(self.URL, {'fecha': '2024-10-07'}).json()
+        self.assertEqual(sum(empleado['presente'] is False for empleado in lista), 30)
+
+    def test_lote_con_errores_no_guarda_nada(self):
+        respuesta = self.enviar([{'empleado': self.empleados[0].pk}, {'empleado': 9999}])
+
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(len(respuesta.json()['errores']), 1)
+        self.assertFalse(RegistroAsistencia.objects.exists())
+
+    def test_sin_permiso(self):
+        self.usuario.user_permissions.clear()
+
+        self.assertEqual(self.enviar([{'empleado': self.empleados[0].pk}]).status_code, 403)
@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .views import PasarListaView
+
+urlpatterns = [
+    path('asistencia/', PasarListaView.as_view(), name='personal_pasar_lista'),
+]
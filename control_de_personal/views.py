@@ -1,3 +1,57 @@
-from django.shortcuts import render
+from datetime import date
 
-# Create your views here.
+from django.core.exceptions import ValidationError
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .asistencia import lista_del_dia, pasar_lista
+
+
+class PasarListaView(APIView):
+    """
+    GET ?fecha=AAAA-MM-DD: el personal activo con lo registrado ese dia.
+    POST {"fecha": "AAAA-MM-DD", "registros": [{"empleado": id,
+    "presente": true|false, "observaciones": "..."}]}: guarda la
+    asistencia de todos a la vez; reenviar la lista actualiza los mismos
+    registros. Se guardan todos o ninguno.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.has_perm('control_de_personal.view_registroasistencia'):
+            return Response({'detail': "No tiene permiso para ver la asistencia."}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            personal = lista_del_dia(request.query_params.get('fecha') or date.today())
+        except ValidationError as error:
+            return Response({'errores': error.messages}, status=status.HTTP_400_BAD_REQUEST)
+        return Response([
+            {
+                'empleado': empleado.pk,
+                'nombre': empleado.nombre,
+                'cargo': str(empleado.cargo) if empleado.cargo else None,
+                'presente': empleado.presente,
+                'observaciones': empleado.observaciones,
+            }
+            for empleado in personal
+        ])
+
+    def post(self, request):
+        if not request.user.has_perms(['control_de_personal.add_registroasistencia', 'control_de_personal.change_registroasistencia']):
+            return Response({'detail': "No tiene permiso para registrar asistencia."}, status=status.HTTP_403_FORBIDDEN)
+
+        registros = request.data.get('registros') if isinstance(request.data, dict) else None
+        if not isinstance(registros, list) or not registros:
+            return Response({'errores': ["Envie la fecha y una lista de registros."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            resultado = pasar_lista(request.data.get('fecha') or date.today(), registros)
+        except ValidationError as error:
+            return Response({'errores': error.messages}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'fecha': resultado.fecha,
+            'registros': resultado.registros,
+            'presentes': resultado.presentes,
+            'ausentes': resultado.ausentes,
+        }, status=status.HTTP_201_CREATED)
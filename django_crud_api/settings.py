@@ -43,7 +43,8 @@ INSTALLED_APPS = [
     'inventario_de_obra',
     'control_de_personal',
     'contabilidad',
-    'seguimiento_de_obra'
+    'seguimiento_de_obra',
+    'tareas',
 ]
 
 MIDDLEWARE = [
@@ -85,6 +86,13 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Las transacciones toman el bloqueo de escritura al empezar: dos retiros
+            # simultaneos esperan su turno (hasta timeout segundos) en vez de fallar
+            # con "database is locked" al pasar de lectura a escritura
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -141,3 +149,12 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CORS_ALLOWED_ORIGINS = [
 
 ]
+
+# Metodo de valoracion del inventario: 'promedio' (promedio ponderado) o 'fifo'.
+# Despues de cambiarlo ejecute: python manage.py revalorar_inventario
+VALORACION_INVENTARIO = 'promedio'
+
+# Cola de tareas en segundo plano; las procesa: python manage.py procesar_tareas
+TAREAS_INTENTOS = 3  # intentos de cada parte antes de fallar la tarea
+TAREAS_ESPERA_REINTENTO = 30  # segundos antes del primer reintento; se duplica en cada uno
+TAREAS_TIEMPO_MAXIMO = 3600  # segundos; una parte en curso por mas tiempo se da por abandonada
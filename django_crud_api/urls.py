@@ -15,8 +15,14 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
+
+from rubros.autocompletar import AutocompletarRecursoView
 
 urlpatterns = [
+    path('admin/autocompletar/', admin.site.admin_view(AutocompletarRecursoView.as_view(admin_site=admin.site)),
+         name='autocompletar_recurso'),
     path('admin/', admin.site.urls),
+    path('api/inventario/', include('inventario_de_obra.urls')),
+    path('api/personal/', include('control_de_personal.urls')),
 ]
@@ -2,8 +2,12 @@
 # inventario_de_obra/admin.py
 
 from django.contrib import admin
-from .models import Inventario, EntradaInventario, SalidaInventario
-from rubros.models import Material
+from .models import (
+    CorteInventario, EntradaInventario, GastoMaterialMes, Inventario, ReservaInventario, SalidaInventario, StockUbicacion,
+    TransferenciaInventario, Ubicacion, ValoracionInventario, faltantes_al_eliminar,
+)
+from rubros.autocompletar import AutocompletarRecursosMixin
+from rubros.busqueda import BusquedaIndexadaMixin
 from django.db import models
 
 # # Inline para mostrar Entradas de Inventario dentro de la vista del Material en el inventario
@@ -21,44 +25,53 @@ from django.db import models
 #     fields = ('fecha', 'cantidad', 'descripcion')
 
 
+# Lo que no se puede eliminar porque su stock ya se uso aparece como protegido en la
+# confirmacion, en lugar de fallar al borrar
+class VerificarStockAlEliminarMixin:
+    def retiros_al_eliminar(self, objs):
+        raise NotImplementedError
+
+    def get_deleted_objects(self, objs, request):
+        eliminados, conteo, permisos, protegidos = super().get_deleted_objects(objs, request)
+        return eliminados, conteo, permisos, list(protegidos) + faltantes_al_eliminar(*self.retiros_al_eliminar(objs))
+
+
 # Registro de los modelos EntradaInventario y SalidaInventario para ver el historial completo
 @admin.register(EntradaInventario)
-class EntradaInventarioAdmin(admin.ModelAdmin):
-    list_display = ('material', 'factura', 'cantidad', 'descripcion', 'fecha')
-    list_filter = ( 'factura', 'material')
-    search_fields = ('material__nombre', 'proveedor__nombre_comercial', 'factura__numero')
+class EntradaInventarioAdmin(VerificarStockAlEliminarMixin, AutocompletarRecursosMixin, BusquedaIndexadaMixin, admin.ModelAdmin):
+    list_display = ('material', 'factura', 'cantidad', 'costo_unitario', 'ubicacion', 'descripcion', 'fecha')
+    list_filter = ( 'factura', 'material', 'ubicacion')
+    search_fields = ('material__nombre', 'factura__nombre_comercial', 'factura__numero_factura')
+    # El material se busca en el indice; el proveedor y la factura con icontains
+    indice_busqueda = 'material'
+    ruta_busqueda = 'material'
+    campos_busqueda_adicionales = ('factura__nombre_comercial', 'factura__numero_factura')
     readonly_fields = ('get_unidad',)
 
+    def retiros_al_eliminar(self, objs):
+        return EntradaInventario.retiros_al_eliminar(EntradaInventario.objects.filter(pk__in=[obj.pk for obj in objs]))
 
     # Método para mostrar la unidad en el listado
     def get_unidad(self, obj):
         return obj.material.unidad.abreviatura if obj.material.unidad else ""
     get_unidad.short_description = 'Unidad'
 
-    def formfield_for_foreignkey(self, db_field, request, **kwargs):
-        if db_field.name == "material":
-            kwargs["queryset"] = Material.objects.all()
-            form_field = super().formfield_for_foreignkey(db_field, request, **kwargs)
-            # Modificar las opciones para incluir la unidad en el texto
-            form_field.choices = [
-                (material.id, f"{material.nombre} ({material.unidad.abreviatura if material.unidad else 'N/A'})")
-                for material in Material.objects.all()
-            ]
-            return form_field
-        return super().formfield_for_foreignkey(db_field, request, **kwargs)
-
 @admin.register(SalidaInventario)
-class SalidaInventarioAdmin(admin.ModelAdmin):
-    list_display = ('material', 'cantidad', 'get_unidad', 'descripcion')
-    list_filter = ('material',)
+class SalidaInventarioAdmin(AutocompletarRecursosMixin, BusquedaIndexadaMixin, admin.ModelAdmin):
+    list_display = ('material', 'cantidad', 'get_unidad', 'costo', 'ubicacion', 'descripcion')
+    list_filter = ('material', 'ubicacion')
     search_fields = ('material__nombre', 'descripcion')
-    readonly_fields = ('fecha','get_unidad',)
+    indice_busqueda = 'material'
+    ruta_busqueda = 'material'
+    campos_busqueda_adicionales = ('descripcion',)
+    readonly_fields = ('fecha','get_unidad', 'costo')
+    autocomplete_fields = ('reserva',)
     
 
         # Move the fields to display `get_unidad` before `descripcion`
     fieldsets = (
         (None, {
-            'fields': ('material', 'fecha', 'cantidad', 'get_unidad', 'descripcion')
+            'fields': ('material', 'reserva', 'ubicacion', 'fecha', 'cantidad', 'get_unidad', 'costo', 'descripcion')
         }),
     )
 
@@ -69,10 +82,13 @@ class SalidaInventarioAdmin(admin.ModelAdmin):
 
 
 @admin.register(Inventario)
-class InventarioAdmin(admin.ModelAdmin):
-    list_display = ('material', 'stock_actual', 'get_unidad')
+class InventarioAdmin(AutocompletarRecursosMixin, BusquedaIndexadaMixin, admin.ModelAdmin):
+    list_display = ('material', 'stock_actual', 'stock_reservado', 'get_unidad', 'get_costo_promedio', 'get_valor')
+    list_select_related = ('material__unidad', 'material__valoracion')
     search_fields = ('material__nombre',)
-    readonly_fields = ('stock_actual',)
+    indice_busqueda = 'material'
+    ruta_busqueda = 'material'
+    readonly_fields = ('stock_actual', 'stock_reservado')
 
     def get_queryset(self, request):
         # Muestra todos los materiales que tienen entradas o salidas
@@ -83,5 +99,100 @@ class InventarioAdmin(admin.ModelAdmin):
         return obj.material.unidad.abreviatura if obj.material.unidad else ""
     get_unidad.short_description = 'Unidad'
 
+    def get_costo_promedio(self, obj):
+        valoracion = getattr(obj.material, 'valoracion', None)
+        return valoracion.costo_promedio if valoracion else None
+    get_costo_promedio.short_description = 'Costo promedio'
+
+    def get_valor(self, obj):
+        valoracion = getattr(obj.material, 'valoracion', None)
+        return valoracion.valor if valoracion else None
+    get_valor.short_description = 'Valor'
+
+
+
+
+
+@admin.register(CorteInventario)
+class CorteInventarioAdmin(admin.ModelAdmin):
+    list_display = ('material', 'fecha', 'stock')
+    list_filter = ('fecha',)
+    search_fields = ('material__nombre',)
+    readonly_fields = ('material', 'fecha', 'stock')
+    list_select_related = ('material',)
+
 
+@admin.register(Ubicacion)
+class UbicacionAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'tipo', 'direccion', 'activa')
+    list_filter = ('tipo', 'activa')
+    search_fields = ('nombre', 'direccion')
 
+
+@admin.register(StockUbicacion)
+class StockUbicacionAdmin(BusquedaIndexadaMixin, admin.ModelAdmin):
+    list_display = ('material', 'ubicacion', 'cantidad')
+    list_filter = ('ubicacion',)
+    search_fields = ('material__nombre',)
+    indice_busqueda = 'material'
+    ruta_busqueda = 'material'
+    list_select_related = ('material', 'ubicacion')
+    readonly_fields = ('material', 'ubicacion', 'cantidad')
+
+    def has_add_permission(self, request):
+        # El stock por ubicacion solo cambia con entradas, salidas y transferencias
+        return False
+
+
+@admin.register(ReservaInventario)
+class ReservaInventarioAdmin(AutocompletarRecursosMixin, BusquedaIndexadaMixin, admin.ModelAdmin):
+    list_display = ('material', 'ubicacion', 'cantidad', 'fecha', 'descripcion')
+    list_filter = ('ubicacion', 'fecha')
+    search_fields = ('material__nombre', 'ubicacion__nombre', 'descripcion')
+    indice_busqueda = 'material'
+    ruta_busqueda = 'material'
+    campos_busqueda_adicionales = ('ubicacion__nombre', 'descripcion')
+    list_select_related = ('ubicacion',)
+
+
+@admin.register(TransferenciaInventario)
+class TransferenciaInventarioAdmin(VerificarStockAlEliminarMixin, AutocompletarRecursosMixin, BusquedaIndexadaMixin, admin.ModelAdmin):
+    list_display = ('material', 'cantidad', 'origen', 'destino', 'fecha')
+    list_filter = ('origen', 'destino', 'fecha')
+    search_fields = ('material__nombre', 'descripcion')
+    indice_busqueda = 'material'
+    ruta_busqueda = 'material'
+    campos_busqueda_adicionales = ('descripcion',)
+    list_select_related = ('origen', 'destino')
+
+    def retiros_al_eliminar(self, objs):
+        return TransferenciaInventario.retiros_al_eliminar(TransferenciaInventario.objects.filter(pk__in=[obj.pk for obj in objs]))
+
+
+@admin.register(ValoracionInventario)
+class ValoracionInventarioAdmin(BusquedaIndexadaMixin, admin.ModelAdmin):
+    list_display = ('material', 'cantidad', 'costo_promedio', 'valor', 'ultima_fecha')
+    search_fields = ('material__nombre',)
+    indice_busqueda = 'material'
+    ruta_busqueda = 'material'
+    list_select_related = ('material',)
+    readonly_fields = ('material', 'cantidad', 'valor', 'ultima_fecha', 'ultimo_orden', 'ultimo_id')
+
+    def has_add_permission(self, request):
+        # Se calcula con los movimientos (revalorar_inventario)
+        return False
+
+
+@admin.register(GastoMaterialMes)
+class GastoMaterialMesAdmin(BusquedaIndexadaMixin, admin.ModelAdmin):
+    list_display = ('material', 'mes', 'entradas', 'cantidad', 'valor')
+    date_hierarchy = 'mes'
+    search_fields = ('material__nombre',)
+    indice_busqueda = 'material'
+    ruta_busqueda = 'material'
+    list_select_related = ('material',)
+    readonly_fields = ('material', 'mes', 'entradas', 'cantidad', 'valor')
+
+    def has_add_permission(self, request):
+        # Se mantiene con las entradas de inventario (reconstruir_gastos_materiales)
+        return False
@@ -0,0 +1,87 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from inventario_de_obra.models import EntradaInventario, Inventario, SalidaInventario
+from rubros.models import Material, Unidad
+
+NOMBRE_MATERIAL = 'Material de prueba (benchmark_retiros)'
+
+
+class Command(BaseCommand):
+    help = ("Mide retiros simultaneos de un mismo material desde varios hilos y verifica que "
+            "no se retire mas que el stock ni quede descuadrado. Crea y elimina un material de prueba.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8)
+        parser.add_argument('--retiros', type=int, default=500, help="Retiros por hilo.")
+        parser.add_argument('--stock', type=Decimal, default=Decimal('1000'), help="Stock inicial del material.")
+        parser.add_argument('--cantidad', type=Decimal, default=Decimal('1'), help="Cantidad de cada retiro.")
+
+    def handle(self, *args, **options):
+        nombre = str(connection.settings_dict['NAME'])
+        if connection.vendor == 'sqlite' and (nombre in ('', ':memory:') or 'mode=memory' in nombre):
+            raise CommandError("Los hilos necesitan una base de datos en archivo, no en memoria.")
+
+        Material.objects.filter(nombre=NOMBRE_MATERIAL).delete()
+        unidad = Unidad.objects.order_by('pk').first()
+        unidad_creada = unidad is None
+        if unidad_creada:
+            unidad = Unidad.objects.create(nombre='unidad', abreviatura='u')
+        material = Material.objects.create(nombre=NOMBRE_MATERIAL, unidad=unidad)
+        EntradaInventario.objects.create(material=material, cantidad=options['stock'], costo_unitario=Decimal('1'))
+        cantidad = options['cantidad']
+
+        aceptados = [0] * options['hilos']
+        rechazados = [0] * options['hilos']
+        errores = []
+
+        def retirar(hilo):
+            try:
+                for _ in range(options['retiros']):
+                    try:
+                        SalidaInventario.objects.create(material=material, cantidad=cantidad, descripcion='benchmark')
+                        aceptados[hilo] += 1
+                    except ValidationError:
+                        rechazados[hilo] += 1
+            except OperationalError as error:
+                errores.append(str(error))
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=retirar, args=(hilo,)) for hilo in range(options['hilos'])]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        try:
+            stock = Inventario.objects.get(material=material).stock_actual
+            retirado = SalidaInventario.objects.filter(material=material).count() * cantidad
+            total = sum(aceptados) + sum(rechazados)
+            self.stdout.write(
+                f"{total} intentos en {duracion:.2f} s ({total / duracion:.0f} por segundo): "
+                f"{sum(aceptados)} aceptados, {sum(rechazados)} rechazados por falta de stock."
+            )
+            self.stdout.write(f"Stock inicial {options['stock']}, retirado {retirado}, stock final {stock}.")
+            problemas = list(errores)
+            if stock < 0:
+                problemas.append(f"El stock quedo negativo ({stock}).")
+            if stock != options['stock'] - retirado:
+                problemas.append(f"El stock ({stock}) no coincide con los movimientos ({options['stock'] - retirado}).")
+            if sum(aceptados) * cantidad != retirado:
+                problemas.append("Hay salidas aceptadas que no se guardaron o salidas guardadas que se rechazaron.")
+        finally:
+            material.delete()
+            if unidad_creada:
+                unidad.delete()
+
+        if problemas:
+            raise CommandError(' '.join(problemas))
+        self.stdout.write(self.style.SUCCESS("Totales correctos."))
@@ -0,0 +1,90 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Max, Min, Sum
+
+from inventario_de_obra.models import EntradaInventario, Inventario, SalidaInventario
+
+
+def _sumas(modelo, desde, hasta):
+    return dict(
+        modelo.objects.filter(material_id__gte=desde, material_id__lt=hasta)
+        .order_by().values('material').annotate(total=Sum('cantidad')).values_list('material', 'total')
+    )
+
+
+def revisar_lote(desde, hasta):
+    """Diferencias (material, stock almacenado, stock segun movimientos) de un rango de materiales."""
+    entradas = _sumas(EntradaInventario, desde, hasta)
+    salidas = _sumas(SalidaInventario, desde, hasta)
+    almacenados = dict(
+        Inventario.objects.filter(material_id__gte=desde, material_id__lt=hasta).values_list('material_id', 'stock_actual')
+    )
+    diferencias = []
+    for material in sorted(set(entradas) | set(salidas) | set(almacenados)):
+        esperado = entradas.get(material, Decimal('0')) - salidas.get(material, Decimal('0'))
+        almacenado = almacenados.get(material)
+        if almacenado != esperado and not (almacenado is None and esperado == 0):
+            diferencias.append((material, almacenado, esperado))
+    return diferencias
+
+
+def _revisar_en_hilo(desde, hasta):
+    try:
+        return revisar_lote(desde, hasta)
+    finally:
+        # Cada hilo abre su propia conexion
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Compara el stock almacenado de cada material con la suma de sus entradas y salidas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corregir', action='store_true', help="Recalcula el stock de los materiales con diferencias.")
+        parser.add_argument('--lote', type=int, default=1000, help="Materiales por lote.")
+        parser.add_argument('--hilos', type=int, default=4, help="Lotes revisados en paralelo.")
+
+    def handle(self, *args, **options):
+        rangos = [
+            modelo.objects.aggregate(desde=Min('material_id'), hasta=Max('material_id'))
+            for modelo in (EntradaInventario, SalidaInventario, Inventario)
+        ]
+        rangos = [rango for rango in rangos if rango['desde'] is not None]
+        if not rangos:
+            self.stdout.write("No hay movimientos de inventario.")
+            return
+        desde = min(rango['desde'] for rango in rangos)
+        hasta = max(rango['hasta'] for rango in rangos) + 1
+        lote = options['lote']
+
+        inicios = range(desde, hasta, lote)
+        if options['hilos'] > 1:
+            with ThreadPoolExecutor(max_workers=options['hilos']) as hilos:
+                resultados = list(hilos.map(lambda inicio: _revisar_en_hilo(inicio, min(inicio + lote, hasta)), inicios))
+        else:
+            resultados = [revisar_lote(inicio, min(inicio + lote, hasta)) for inicio in inicios]
+        diferencias = [diferencia for resultado in resultados for diferencia in resultado]
+
+        for material, almacenado, esperado in diferencias:
+            self.stdout.write(self.style.WARNING(
+                f"Material {material}: stock almacenado {almacenado if almacenado is not None else '(sin inventario)'}, "
+                f"segun movimientos {esperado}."
+            ))
+        self.stdout.write(f"Materiales con diferencias: {len(diferencias)}.")
+
+        if not diferencias:
+            return
+        if not options['corregir']:
+            raise CommandError(f"Hay {len(diferencias)} inventarios descuadrados; use --corregir para recalcularlos.")
+
+        ids = [material for material, _, _ in diferencias]
+        for inicio in range(0, len(ids), lote):
+            parte = ids[inicio:inicio + lote]
+            with transaction.atomic():
+                Inventario.objects.bulk_create([Inventario(material_id=material) for material in parte], ignore_conflicts=True)
+                # El stock se recalcula dentro del mismo UPDATE para no pisar movimientos concurrentes
+                Inventario.objects.filter(material_id__in=parte).update(stock_actual=Inventario.stock_segun_movimientos())
+        self.stdout.write(self.style.SUCCESS(f"Inventarios corregidos: {len(ids)}."))
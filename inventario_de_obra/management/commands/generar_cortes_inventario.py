@@ -0,0 +1,58 @@
+import calendar
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils.dateparse import parse_date
+
+from inventario_de_obra.models import CorteInventario, EntradaInventario, SalidaInventario
+from inventario_de_obra.servicios import stock_al
+
+
+def fin_de_mes(fecha):
+    return fecha.replace(day=calendar.monthrange(fecha.year, fecha.month)[1])
+
+
+class Command(BaseCommand):
+    help = "Genera los cortes mensuales de inventario (stock de cada material al fin de cada mes) que falten."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hasta', help="Ultima fecha a considerar, AAAA-MM-DD (por defecto hoy).")
+        parser.add_argument('--reconstruir', action='store_true', help="Elimina los cortes existentes y los genera de nuevo.")
+
+    def handle(self, *args, **options):
+        hasta = parse_date(options['hasta']) if options['hasta'] else date.today()
+        if hasta is None:
+            raise CommandError("Fecha --hasta no valida.")
+
+        if options['reconstruir']:
+            CorteInventario.objects.all().delete()
+
+        # Cada corte parte del anterior y solo suma los movimientos de su mes
+        anterior = CorteInventario.objects.aggregate(ultimo=Max('fecha'))['ultimo']
+        if anterior is not None:
+            corte = fin_de_mes(anterior + timedelta(days=1))
+        else:
+            primeras = [
+                fecha for fecha in (modelo.objects.aggregate(primera=Min('fecha'))['primera']
+                                    for modelo in (EntradaInventario, SalidaInventario))
+                if fecha is not None
+            ]
+            if not primeras:
+                self.stdout.write("No hay movimientos de inventario.")
+                return
+            corte = fin_de_mes(min(primeras))
+
+        generados = 0
+        while corte <= hasta:
+            with transaction.atomic():
+                stock = stock_al(corte)
+                CorteInventario.objects.bulk_create(
+                    [CorteInventario(material_id=material, fecha=corte, stock=valor) for material, valor in stock.items()],
+                    batch_size=1000,
+                )
+            self.stdout.write(f"Corte al {corte}: {len(stock)} materiales.")
+            generados += 1
+            corte = fin_de_mes(corte + timedelta(days=1))
+        self.stdout.write(self.style.SUCCESS(f"Cortes generados: {generados}."))
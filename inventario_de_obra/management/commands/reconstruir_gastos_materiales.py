@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario_de_obra.models import GastoMaterialMes
+
+
+class Command(BaseCommand):
+    help = "Reconstruye las compras mensuales por material desde las entradas de inventario."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verificar', action='store_true',
+                            help="Solo compara con lo almacenado y reporta las diferencias, sin corregirlas.")
+
+    def handle(self, *args, **options):
+        calculadas = GastoMaterialMes.calcular()
+        guardadas = {(fila['material_id'], fila['mes']): fila for fila in GastoMaterialMes.objects.values('material_id', 'mes', *GastoMaterialMes.CAMPOS_SUMA)}
+        diferentes = [
+            clave for clave in calculadas.keys() | guardadas.keys()
+            if any(calculadas.get(clave, {}).get(campo, 0) != guardadas.get(clave, {}).get(campo, 0) for campo in GastoMaterialMes.CAMPOS_SUMA)
+        ]
+        for material, mes in sorted(diferentes)[:20]:
+            self.stdout.write(self.style.WARNING(f"Material {material} {mes:%m/%Y}: {guardadas.get((material, mes))} -> {calculadas.get((material, mes))}"))
+        self.stdout.write(f"Materiales por mes: {len(calculadas)}. Diferentes de lo almacenado: {len(diferentes)}.")
+
+        if options['verificar']:
+            if diferentes:
+                raise CommandError(f"Hay {len(diferentes)} gastos por material desactualizados.")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Filas reconstruidas: {GastoMaterialMes.reconstruir()}."))
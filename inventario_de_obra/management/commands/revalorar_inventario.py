@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from inventario_de_obra.models import SalidaInventario, ValoracionInventario
+from inventario_de_obra.valoracion import metodo, revalorar, valor_inventario
+
+
+class _Comprobacion(Exception):
+    pass
+
+
+def _foto():
+    valoraciones = dict(ValoracionInventario.objects.values_list('material_id', 'valor'))
+    costos = dict(SalidaInventario.objects.values_list('pk', 'costo'))
+    return valoraciones, costos
+
+
+class Command(BaseCommand):
+    help = "Recalcula la valoracion del inventario (capas, costo de las salidas y valor por material) desde todos los movimientos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('materiales', nargs='*', type=int, help="Ids de materiales (por defecto todos).")
+        parser.add_argument('--comprobar', action='store_true',
+                            help="Solo compara el resultado con la valoracion actual, sin guardar cambios.")
+
+    def handle(self, *args, **options):
+        try:
+            metodo_actual = metodo()
+        except ValueError as error:
+            raise CommandError(error)
+
+        if not options['comprobar']:
+            with transaction.atomic():
+                total = revalorar(options['materiales'] or None)
+            self.stdout.write(self.style.SUCCESS(
+                f"Materiales revalorados ({metodo_actual}): {total}. Valor del inventario: {valor_inventario()}."
+            ))
+            return
+
+        antes = _foto()
+        try:
+            with transaction.atomic():
+                revalorar(options['materiales'] or None)
+                despues = _foto()
+                raise _Comprobacion  # deshace la revaloracion
+        except _Comprobacion:
+            pass
+
+        diferencias = 0
+        for indice, (nombre, campo) in enumerate((('Material', 'valor'), ('Salida', 'costo'))):
+            actuales, recalculados = antes[indice], despues[indice]
+            for pk in sorted(set(actuales) | set(recalculados)):
+                if options['materiales'] and indice == 0 and pk not in options['materiales']:
+                    continue
+                if actuales.get(pk) != recalculados.get(pk):
+                    diferencias += 1
+                    self.stdout.write(self.style.WARNING(
+                        f"{nombre} {pk}: {campo} actual {actuales.get(pk)}, recalculado {recalculados.get(pk)}."
+                    ))
+        if diferencias:
+            raise CommandError(f"Hay {diferencias} diferencias; ejecute revalorar_inventario sin --comprobar.")
+        self.stdout.write(self.style.SUCCESS("La valoracion coincide con la historia de movimientos."))
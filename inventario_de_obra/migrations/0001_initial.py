@@ -0,0 +1,193 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:25
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contabilidad', '0001_initial'),
+        ('rubros', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ubicacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255, unique=True)),
+                ('tipo', models.CharField(choices=[('obra', 'Obra'), ('bodega', 'Bodega')], default='obra', max_length=10)),
+                ('direccion', models.CharField(blank=True, max_length=255)),
+                ('activa', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name': 'Ubicación',
+                'verbose_name_plural': 'Ubicaciones',
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EntradaInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('descripcion', models.TextField(blank=True, help_text='Descripción de la entrada')),
+                ('fecha', models.DateField(default=datetime.date.today, verbose_name='Fecha de entradada del material')),
+                ('costo_unitario', models.DecimalField(blank=True, decimal_places=4, help_text='Costo de compra por unidad; vacío toma el costo unitario del material', max_digits=12, null=True)),
+                ('factura', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='entrada_inventario', to='contabilidad.srifactura')),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entradas', to='rubros.material')),
+                ('ubicacion', models.ForeignKey(blank=True, help_text='Obra o bodega que recibe el material', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='entradas', to='inventario_de_obra.ubicacion')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Inventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock_actual', models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10)),
+                ('stock_reservado', models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10)),
+                ('material', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='inventario', to='rubros.material')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReservaInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('fecha', models.DateField(default=datetime.date.today)),
+                ('descripcion', models.TextField(blank=True)),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='rubros.material')),
+                ('ubicacion', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='reservas', to='inventario_de_obra.ubicacion', verbose_name='Obra')),
+            ],
+            options={
+                'verbose_name': 'Reserva de inventario',
+                'verbose_name_plural': 'Reservas de inventario',
+            },
+        ),
+        migrations.CreateModel(
+            name='ValoracionInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('valor', models.DecimalField(decimal_places=4, default=0, max_digits=16)),
+                ('ultima_fecha', models.DateField(blank=True, null=True)),
+                ('ultimo_orden', models.PositiveSmallIntegerField(default=0)),
+                ('ultimo_id', models.BigIntegerField(default=0)),
+                ('material', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='valoracion', to='rubros.material')),
+            ],
+            options={
+                'verbose_name': 'Valoración de inventario',
+                'verbose_name_plural': 'Valoración de inventario',
+            },
+        ),
+        migrations.CreateModel(
+            name='CorteInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(db_index=True)),
+                ('stock', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cortes_inventario', to='rubros.material')),
+            ],
+            options={
+                'verbose_name': 'Corte de inventario',
+                'verbose_name_plural': 'Cortes de inventario',
+                'constraints': [models.UniqueConstraint(fields=('material', 'fecha'), name='corte_inventario_por_fecha')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CapaCosto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('costo_unitario', models.DecimalField(decimal_places=4, max_digits=12)),
+                ('cantidad_restante', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('material', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='capas_costo', to='rubros.material')),
+                ('entrada', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='capa_costo', to='inventario_de_obra.entradainventario')),
+            ],
+            options={
+                'verbose_name': 'Capa de costo',
+                'verbose_name_plural': 'Capas de costo',
+                'indexes': [models.Index(fields=['material', 'fecha', 'entrada'], name='inventario__materia_bdd850_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GastoMaterialMes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes')),
+                ('entradas', models.IntegerField(default=0)),
+                ('cantidad', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('valor', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('material', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='gastos_mensuales', to='rubros.material')),
+            ],
+            options={
+                'verbose_name': 'Gasto mensual por material',
+                'verbose_name_plural': 'Gastos mensuales por material',
+                'indexes': [models.Index(fields=['mes'], name='inventario__mes_0b6c43_idx')],
+                'constraints': [models.UniqueConstraint(fields=('material', 'mes'), name='gasto_material_por_mes')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TransferenciaInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('fecha', models.DateField(default=datetime.date.today)),
+                ('descripcion', models.TextField(blank=True)),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transferencias', to='rubros.material')),
+                ('destino', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transferencias_entrantes', to='inventario_de_obra.ubicacion')),
+                ('origen', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transferencias_salientes', to='inventario_de_obra.ubicacion')),
+            ],
+            options={
+                'verbose_name': 'Transferencia de inventario',
+                'verbose_name_plural': 'Transferencias de inventario',
+                'constraints': [models.CheckConstraint(condition=models.Q(('origen', models.F('destino')), _negated=True), name='transferencia_entre_ubicaciones_distintas'), models.CheckConstraint(condition=models.Q(('cantidad__gt', 0)), name='transferencia_cantidad_positiva')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockUbicacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12)),
+                ('material', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='stock_por_ubicacion', to='rubros.material')),
+                ('ubicacion', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='stocks', to='inventario_de_obra.ubicacion')),
+            ],
+            options={
+                'verbose_name': 'Stock por ubicación',
+                'verbose_name_plural': 'Stock por ubicación',
+                'indexes': [models.Index(fields=['ubicacion', 'material'], name='inventario__ubicaci_1ed13e_idx')],
+                'constraints': [models.UniqueConstraint(fields=('material', 'ubicacion'), name='stock_por_material_y_ubicacion')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SalidaInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(auto_now_add=True)),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('descripcion', models.TextField(blank=True, help_text='Descripción del uso')),
+                ('costo', models.DecimalField(blank=True, decimal_places=4, editable=False, help_text='Costo del material consumido según la valoración del inventario', max_digits=14, null=True)),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='salidas', to='rubros.material')),
+                ('reserva', models.ForeignKey(blank=True, help_text='Reserva de la obra que consume esta salida', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='salidas', to='inventario_de_obra.reservainventario')),
+                ('ubicacion', models.ForeignKey(blank=True, help_text='Obra o bodega de donde sale el material', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='salidas', to='inventario_de_obra.ubicacion')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['material', 'fecha'], name='inventario__materia_cef737_idx'), models.Index(fields=['fecha'], name='inventario__fecha_690dc9_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reservainventario',
+            constraint=models.CheckConstraint(condition=models.Q(('cantidad__gte', 0)), name='reserva_cantidad_no_negativa'),
+        ),
+        migrations.AddIndex(
+            model_name='entradainventario',
+            index=models.Index(fields=['material', 'fecha'], name='inventario__materia_9012a0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entradainventario',
+            index=models.Index(fields=['fecha'], name='inventario__fecha_b8671f_idx'),
+        ),
+    ]
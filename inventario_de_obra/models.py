@@ -1,12 +1,15 @@
 # inventario_de_obra/models.py
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from rubros.models import Material
-from contabilidad.models import SRIFactura
-from django.db.models import Sum
-from django.db.models.signals import post_save, post_delete
+from contabilidad.models import SRIFactura, inicio_de_mes
+from django.db.models import F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, pre_delete
 from django.dispatch import receiver
 from django.core.exceptions import ValidationError
+from collections import defaultdict
 from datetime import date
+from decimal import Decimal
 import re
 import unicodedata
     
@@ -26,24 +29,176 @@ import unicodedata
 #         unidad = self.material.unidad.abreviatura if self.material.unidad else ""
 #         return f"Inventario de {self.material.nombre} - Stock Actual: {self.stock_actual} {unidad}"
 
+# Obra o bodega donde se guarda el material
+class Ubicacion(models.Model):
+    TIPOS = [
+        ('obra', 'Obra'),
+        ('bodega', 'Bodega'),
+    ]
+    nombre = models.CharField(max_length=255, unique=True)
+    tipo = models.CharField(max_length=10, choices=TIPOS, default='obra')
+    direccion = models.CharField(max_length=255, blank=True)
+    activa = models.BooleanField(default=True)
+
+    class Meta:
+        verbose_name = "Ubicación"
+        verbose_name_plural = "Ubicaciones"
+        ordering = ['nombre']
+
+    def __str__(self):
+        return f"{self.nombre} ({self.get_tipo_display()})"
+
+
+# Base de los movimientos: cada alta, cambio o baja ajusta el stock solo por su diferencia
+class MovimientoInventario(models.Model):
+    signo = 1  # +1 entradas, -1 salidas
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._original = tuple(instancia.__dict__.get(campo) for campo in ('material_id', 'cantidad', 'fecha', 'ubicacion_id'))
+        instancia._costo_original = instancia.__dict__.get('costo_unitario')
+        return instancia
+
+    def deltas_de_stock(self):
+        """
+        Lo que guardar el movimiento cambia en el stock: ({material_id: delta},
+        {(material_id, ubicacion_id): delta}), descontando sus valores guardados.
+        """
+        material_anterior, cantidad_anterior, _, ubicacion_anterior = getattr(self, '_original', (None, None, None, None))
+        por_material = {self.material_id: self.signo * self.cantidad}
+        por_ubicacion = {(self.material_id, self.ubicacion_id): self.signo * self.cantidad}
+        if material_anterior is not None:
+            por_material[material_anterior] = por_material.get(material_anterior, 0) - self.signo * cantidad_anterior
+            clave = (material_anterior, ubicacion_anterior)
+            por_ubicacion[clave] = por_ubicacion.get(clave, 0) - self.signo * cantidad_anterior
+        return por_material, por_ubicacion
+
+    def disponible_para(self, material_id):
+        # Lo que el movimiento puede descontar del material
+        return Inventario.disponible(material_id)
+
+    def clean(self):
+        # Aviso en el formulario, tambien al editar; save() lo vuelve a verificar al descontar
+        if not self.material_id or self.cantidad is None:
+            return
+        por_material, por_ubicacion = self.deltas_de_stock()
+        for material, delta in por_material.items():
+            if delta < 0:
+                disponible = self.disponible_para(material)
+                if disponible < -delta:
+                    raise ValidationError({'cantidad': f"Stock insuficiente: hay {disponible} disponible y se retiran {-delta}."})
+        for (material, ubicacion), delta in por_ubicacion.items():
+            if delta < 0 and ubicacion is not None:
+                en_ubicacion = StockUbicacion.cantidad_en(material, ubicacion)
+                if en_ubicacion < -delta:
+                    raise ValidationError({'ubicacion': f"Stock insuficiente en la ubicación: hay {en_ubicacion} y se retiran {-delta}."})
+
+    def save(self, *args, **kwargs):
+        from .valoracion import movimiento_guardado
+        material_anterior, cantidad_anterior, fecha_anterior, ubicacion_anterior = getattr(self, '_original', (None, None, None, None))
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            movimiento_guardado(self, material_anterior, (cantidad_anterior, fecha_anterior, getattr(self, '_costo_original', None)))
+            deltas, deltas_por_ubicacion = self.deltas_de_stock()
+            for material, delta in deltas.items():
+                if delta < 0:
+                    # Todo lo que baja el stock (una salida nueva o mayor, una entrada
+                    # menor o cambiada de material) solo se aplica si hay disponible
+                    reserva = getattr(self, 'reserva_id', None) if material_anterior is None else None
+                    Inventario.retirar(material, -delta, reserva)
+                else:
+                    Inventario.aplicar_delta(material, delta)
+            # Los cortes posteriores a un movimiento con fecha pasada tambien cambian
+            if (material_anterior, cantidad_anterior, fecha_anterior) != (self.material_id, self.cantidad, self.fecha):
+                deltas = {(self.material_id, self.fecha): self.signo * self.cantidad}
+                if material_anterior is not None:
+                    clave = (material_anterior, fecha_anterior)
+                    deltas[clave] = deltas.get(clave, 0) - self.signo * cantidad_anterior
+                CorteInventario.ajustar(deltas)
+            if (material_anterior, cantidad_anterior, ubicacion_anterior) != (self.material_id, self.cantidad, self.ubicacion_id):
+                StockUbicacion.aplicar(deltas_por_ubicacion)
+            if self.signo > 0:
+                costo_anterior = getattr(self, '_costo_original', None)
+                if (material_anterior, cantidad_anterior, fecha_anterior, costo_anterior) != (self.material_id, self.cantidad, self.fecha, self.costo_unitario):
+                    deltas = {(self.material_id, self.fecha): GastoMaterialMes.delta(self.cantidad, self.costo_unitario)}
+                    if material_anterior is not None:
+                        clave = (material_anterior, fecha_anterior)
+                        deltas[clave] = GastoMaterialMes.delta(cantidad_anterior, costo_anterior, -1, deltas.get(clave))
+                    GastoMaterialMes.ajustar(deltas)
+        self._original = (self.material_id, self.cantidad, self.fecha, self.ubicacion_id)
+        self._costo_original = getattr(self, 'costo_unitario', None)
+
+
 # Modelo actualizado para Entrada de Inventario
-class EntradaInventario(models.Model):
+class EntradaInventario(MovimientoInventario):
     material = models.ForeignKey(Material, on_delete=models.CASCADE, related_name="entradas")
     factura = models.ForeignKey(SRIFactura, on_delete=models.CASCADE, related_name="entrada_inventario", null=True, blank=True) 
     cantidad = models.DecimalField(max_digits=10, decimal_places=2)
     descripcion = models.TextField(blank=True, help_text="Descripción de la entrada")
     fecha = models.DateField(verbose_name='Fecha de entradada del material', default=date.today)
+    ubicacion = models.ForeignKey(Ubicacion, on_delete=models.PROTECT, related_name="entradas", null=True, blank=True,
+                                  help_text="Obra o bodega que recibe el material")
+    costo_unitario = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True,
+                                         help_text="Costo de compra por unidad; vacío toma el costo unitario del material")
+
+    @staticmethod
+    def retiros_al_eliminar(entradas):
+        """Lo que eliminar estas entradas retira del stock, para faltantes_al_eliminar()."""
+        por_material, por_ubicacion = defaultdict(Decimal), defaultdict(Decimal)
+        for material, ubicacion, cantidad in entradas.values_list('material_id', 'ubicacion_id', 'cantidad'):
+            por_material[material] += cantidad
+            por_ubicacion[material, ubicacion] += cantidad
+        return por_material, por_ubicacion
+
+    def save(self, *args, **kwargs):
+        if self.costo_unitario is None and self.material_id:
+            self.costo_unitario = Material.objects.filter(pk=self.material_id).values_list('costo_por_unidad', flat=True).first()
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [models.Index(fields=['material', 'fecha']), models.Index(fields=['fecha'])]
     
     def __str__(self):
         return f"Entrada de {self.cantidad} {self.material.unidad} de {self.material.nombre}"
         
 
-class SalidaInventario(models.Model):
+class SalidaInventario(MovimientoInventario):
+    signo = -1
     material = models.ForeignKey(Material, on_delete=models.CASCADE, related_name="salidas")
     fecha = models.DateField(auto_now_add=True)
     cantidad = models.DecimalField(max_digits=10, decimal_places=2)
     descripcion = models.TextField(blank=True, help_text="Descripción del uso")
+    ubicacion = models.ForeignKey(Ubicacion, on_delete=models.PROTECT, related_name="salidas", null=True, blank=True,
+                                  help_text="Obra o bodega de donde sale el material")
+    costo = models.DecimalField(max_digits=14, decimal_places=4, null=True, blank=True, editable=False,
+                                help_text="Costo del material consumido según la valoración del inventario")
+    reserva = models.ForeignKey('ReservaInventario', on_delete=models.SET_NULL, related_name="salidas", null=True, blank=True,
+                                help_text="Reserva de la obra que consume esta salida")
+
+    class Meta:
+        indexes = [models.Index(fields=['material', 'fecha']), models.Index(fields=['fecha'])]
+
+    def disponible_para(self, material_id):
+        # Una salida nueva con reserva descuenta de lo pendiente en la reserva, como en save()
+        if self.reserva_id and getattr(self, '_original', None) is None:
+            return self.reserva.cantidad
+        return super().disponible_para(material_id)
 
+    def clean(self):
+        if self.reserva_id and self.material_id and self.reserva.material_id != self.material_id:
+            raise ValidationError({'reserva': "La reserva es de otro material."})
+        if self.reserva_id and self.ubicacion_id is None:
+            self.ubicacion_id = self.reserva.ubicacion_id
+        super().clean()
+
+    def save(self, *args, **kwargs):
+        if self.reserva_id and self.ubicacion_id is None:
+            self.ubicacion_id = self.reserva.ubicacion_id
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Salida de {self.cantidad} {self.material.unidad} de {self.material.nombre}"
@@ -51,6 +206,77 @@ class SalidaInventario(models.Model):
 class Inventario(models.Model):
     material = models.OneToOneField(Material, on_delete=models.CASCADE, related_name="inventario")
     stock_actual = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    # Parte del stock apartada por reservas de obra; el resto es lo disponible
+    stock_reservado = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+
+    @classmethod
+    def disponible(cls, material_id):
+        inventario = cls.objects.filter(material_id=material_id).values_list('stock_actual', 'stock_reservado').first()
+        return inventario[0] - inventario[1] if inventario else Decimal('0')
+
+    @classmethod
+    def retirar(cls, material_id, cantidad, reserva_id=None):
+        """
+        Descuenta una salida con un UPDATE condicional: solo se aplica si
+        alcanza el stock disponible (o la reserva), asi dos retiros
+        simultaneos no pueden dejar el stock en negativo. En SQLite cumple
+        la funcion de select_for_update, que alli no bloquea nada.
+        """
+        if reserva_id is not None:
+            if not ReservaInventario.objects.filter(pk=reserva_id, material_id=material_id, cantidad__gte=cantidad).update(
+                cantidad=F('cantidad') - cantidad
+            ):
+                raise ValidationError(f"La reserva no tiene {cantidad} pendientes de ese material.")
+            cls.objects.filter(material_id=material_id).update(
+                stock_actual=F('stock_actual') - cantidad, stock_reservado=F('stock_reservado') - cantidad
+            )
+            return
+        if not cls.objects.filter(material_id=material_id, stock_actual__gte=F('stock_reservado') + cantidad).update(
+            stock_actual=F('stock_actual') - cantidad
+        ):
+            raise ValidationError(
+                f"Stock insuficiente: hay {cls.disponible(material_id)} disponible y se necesitan {cantidad}."
+            )
+
+    @classmethod
+    def reservar(cls, material_id, cantidad):
+        if cantidad > 0:
+            if not cls.objects.filter(material_id=material_id, stock_actual__gte=F('stock_reservado') + cantidad).update(
+                stock_reservado=F('stock_reservado') + cantidad
+            ):
+                raise ValidationError(
+                    f"Stock insuficiente para reservar: hay {cls.disponible(material_id)} disponible y se necesitan {cantidad}."
+                )
+        elif cantidad < 0:
+            cls.objects.filter(material_id=material_id).update(stock_reservado=F('stock_reservado') + cantidad)
+
+    @classmethod
+    def aplicar_delta(cls, material_id, delta):
+        # UPDATE ... SET stock_actual = stock_actual + delta: sin leer ni perder escrituras concurrentes
+        if not delta:
+            return
+        if cls.objects.filter(material_id=material_id).update(stock_actual=F('stock_actual') + delta):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(material_id=material_id, stock_actual=delta)
+        except IntegrityError:
+            # Otro proceso creo el inventario del material al mismo tiempo
+            cls.objects.filter(material_id=material_id).update(stock_actual=F('stock_actual') + delta)
+
+    @classmethod
+    def stock_segun_movimientos(cls):
+        # Stock calculado desde el libro de movimientos, como expresion por material
+        def total(modelo):
+            return Coalesce(
+                Subquery(
+                    modelo.objects.filter(material=OuterRef('material'))
+                    .order_by().values('material').annotate(total=Sum('cantidad')).values('total')
+                ),
+                Value(0),
+                output_field=models.DecimalField(),
+            )
+        return total(EntradaInventario) - total(SalidaInventario)
 
     def actualizar_stock(self):
         # Sumar todas las cantidades de entrada
@@ -66,22 +292,417 @@ class Inventario(models.Model):
         return f"Inventario de {self.material.nombre} - Stock Actual: {self.stock_actual} {unidad}"
 
 
-@receiver(post_save, sender=EntradaInventario)
-def crear_actualizar_inventario(sender, instance, created, **kwargs):
-    # Obtén o crea un inventario para el material relacionado
-    inventario, _ = Inventario.objects.get_or_create(material=instance.material)
-    # Actualiza el stock del inventario
-    inventario.actualizar_stock()
+# Stock de cierre de cada material a una fecha de corte (fin de mes): incluye
+# los movimientos con fecha <= fecha. Cada fecha de corte tiene una fila por
+# cada material con movimientos hasta esa fecha.
+class CorteInventario(models.Model):
+    material = models.ForeignKey(Material, on_delete=models.CASCADE, related_name="cortes_inventario")
+    fecha = models.DateField(db_index=True)
+    stock = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
-@receiver(post_delete, sender=EntradaInventario)
-def actualizar_inventario_despues_eliminar(sender, instance, **kwargs):
-    # Actualiza el stock después de eliminar una entrada
-    if hasattr(instance.material, 'inventario'):
-        instance.material.inventario.actualizar_stock()
+    class Meta:
+        verbose_name = "Corte de inventario"
+        verbose_name_plural = "Cortes de inventario"
+        constraints = [models.UniqueConstraint(fields=['material', 'fecha'], name='corte_inventario_por_fecha')]
+
+    @classmethod
+    def ajustar(cls, deltas):
+        """
+        Aplica a los cortes ya generados los movimientos con fecha pasada:
+        deltas es {(material_id, fecha del movimiento): cantidad con signo}.
+        """
+        deltas = {clave: delta for clave, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        fechas = list(cls.objects.filter(fecha__gte=min(fecha for _, fecha in deltas))
+                      .order_by().values_list('fecha', flat=True).distinct())
+        if not fechas:
+            return
+        # Un material sin fila en un corte no tenia movimientos hasta esa fecha: parte de cero
+        cls.objects.bulk_create([
+            cls(material_id=material, fecha=corte)
+            for material, fecha in deltas for corte in fechas if corte >= fecha
+        ], ignore_conflicts=True)
+        for (material, fecha), delta in deltas.items():
+            cls.objects.filter(material_id=material, fecha__gte=fecha).update(stock=F('stock') + delta)
+
+    def __str__(self):
+        return f"Corte de {self.material} al {self.fecha}: {self.stock}"
+
+
+# Compras de cada material por mes: las entradas de inventario a su costo
+# unitario, mantenidas con cada entrada; los reportes leen solo esta tabla.
+# reconstruir_gastos_materiales la rehace.
+class GastoMaterialMes(models.Model):
+    material = models.ForeignKey(Material, on_delete=models.CASCADE, related_name="gastos_mensuales", db_index=False)
+    mes = models.DateField(help_text="Primer día del mes")
+    entradas = models.IntegerField(default=0)
+    cantidad = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    valor = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+
+    CAMPOS_SUMA = ('entradas', 'cantidad', 'valor')
+
+    class Meta:
+        verbose_name = "Gasto mensual por material"
+        verbose_name_plural = "Gastos mensuales por material"
+        # El indice unico sirve tambien para las consultas por material
+        constraints = [models.UniqueConstraint(fields=['material', 'mes'], name='gasto_material_por_mes')]
+        indexes = [models.Index(fields=['mes'])]
+
+    @staticmethod
+    def delta(cantidad, costo_unitario, signo=1, anterior=None):
+        """(entradas, cantidad, valor) de una entrada, sumado a anterior si se da."""
+        entradas, acumulada, valor = anterior or (0, Decimal('0'), Decimal('0'))
+        return (
+            entradas + signo,
+            acumulada + signo * cantidad,
+            valor + signo * (cantidad * (costo_unitario or 0)).quantize(Decimal('0.0001')),
+        )
+
+    @classmethod
+    def ajustar(cls, deltas):
+        """Suma los deltas {(material_id, fecha): (entradas, cantidad, valor)} al mes de cada fecha."""
+        por_mes = defaultdict(lambda: (0, Decimal('0'), Decimal('0')))
+        for (material, fecha), delta in deltas.items():
+            actual = por_mes[material, inicio_de_mes(fecha)]
+            por_mes[material, inicio_de_mes(fecha)] = tuple(a + b for a, b in zip(actual, delta))
+        por_mes = {clave: delta for clave, delta in por_mes.items() if any(delta)}
+        if not por_mes:
+            return
+        cls.objects.bulk_create([cls(material_id=material, mes=mes) for material, mes in por_mes], ignore_conflicts=True)
+        for (material, mes), (entradas, cantidad, valor) in por_mes.items():
+            cls.objects.filter(material_id=material, mes=mes).update(
+                entradas=F('entradas') + entradas, cantidad=F('cantidad') + cantidad, valor=F('valor') + valor,
+            )
+        cls.objects.filter(mes__in={mes for _, mes in por_mes}, entradas__lte=0).delete()
+
+    @classmethod
+    def calcular(cls):
+        """
+        Compras por (material, mes) desde las entradas: {(material_id, mes):
+        fila}. El valor se suma en Python, entrada por entrada y redondeado
+        como en delta(), para que coincida con lo mantenido.
+        """
+        sumas = {}
+        entradas = EntradaInventario.objects.order_by().values_list('material_id', 'fecha', 'cantidad', 'costo_unitario')
+        for material, fecha, cantidad, costo in entradas.iterator(chunk_size=5000):
+            clave = (material, inicio_de_mes(fecha))
+            sumas[clave] = cls.delta(cantidad, costo, anterior=sumas.get(clave))
+        return {clave: dict(zip(('material_id', 'mes', *cls.CAMPOS_SUMA), (*clave, *suma))) for clave, suma in sumas.items()}
 
-@receiver(post_save, sender=SalidaInventario)
+    @classmethod
+    def reconstruir(cls):
+        """Rehace la tabla completa desde las entradas y devuelve cuantas filas quedaron."""
+        filas = cls.calcular()
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create([cls(**fila) for fila in filas.values()], batch_size=1000)
+        return len(filas)
+
+    def __str__(self):
+        return f"{self.material} {self.mes:%m/%Y}: {self.cantidad} por {self.valor}"
+
+
+# Material apartado para una obra: no se puede retirar para otra cosa. La
+# cantidad es lo pendiente; las salidas con esta reserva la van descontando.
+class ReservaInventario(models.Model):
+    material = models.ForeignKey(Material, on_delete=models.CASCADE, related_name="reservas")
+    ubicacion = models.ForeignKey(Ubicacion, on_delete=models.PROTECT, related_name="reservas", verbose_name="Obra")
+    cantidad = models.DecimalField(max_digits=10, decimal_places=2)
+    fecha = models.DateField(default=date.today)
+    descripcion = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "Reserva de inventario"
+        verbose_name_plural = "Reservas de inventario"
+        constraints = [models.CheckConstraint(condition=Q(cantidad__gte=0), name='reserva_cantidad_no_negativa')]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._original = (instancia.__dict__.get('material_id'), instancia.__dict__.get('cantidad'))
+        return instancia
+
+    def clean(self):
+        if self.cantidad is not None and self.cantidad < 0:
+            raise ValidationError({'cantidad': "La cantidad no puede ser negativa."})
+        if self.material_id and self.cantidad:
+            disponible = Inventario.disponible(self.material_id)
+            material_anterior, cantidad_anterior = getattr(self, '_original', (None, None))
+            if material_anterior == self.material_id:
+                disponible += cantidad_anterior
+            if disponible < self.cantidad:
+                raise ValidationError({'cantidad': f"Stock insuficiente para reservar: hay {disponible} disponible."})
+
+    def save(self, *args, **kwargs):
+        material_anterior, cantidad_anterior = getattr(self, '_original', (None, None))
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if material_anterior is not None and material_anterior != self.material_id:
+                Inventario.reservar(material_anterior, -cantidad_anterior)
+                cantidad_anterior = 0
+            Inventario.reservar(self.material_id, self.cantidad - (cantidad_anterior or 0))
+        self._original = (self.material_id, self.cantidad)
+
+    def __str__(self):
+        return f"Reserva de {self.cantidad} de {self.material} para {self.ubicacion}"
+
+
+@receiver(pre_delete, sender=ReservaInventario)
+def liberar_reserva_eliminada(sender, instance, origin=None, **kwargs):
+    modelo_origen = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    if modelo_origen is Material:
+        return
+    # Lo pendiente vuelve a estar disponible; se lee de la base porque las salidas lo descuentan con UPDATE
+    cantidad = ReservaInventario.objects.filter(pk=instance.pk).values_list('cantidad', flat=True).first()
+    if cantidad:
+        Inventario.reservar(instance.material_id, -cantidad)
+
+
+# Estado de la valoracion de un material (promedio ponderado o FIFO, segun
+# settings.VALORACION_INVENTARIO) despues de su ultimo movimiento procesado.
+# El ultimo movimiento se guarda como (fecha, orden, id), orden 0 entradas y 1 salidas.
+class ValoracionInventario(models.Model):
+    material = models.OneToOneField(Material, on_delete=models.CASCADE, related_name="valoracion")
+    cantidad = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    valor = models.DecimalField(max_digits=16, decimal_places=4, default=0)
+    ultima_fecha = models.DateField(null=True, blank=True)
+    ultimo_orden = models.PositiveSmallIntegerField(default=0)
+    ultimo_id = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Valoración de inventario"
+        verbose_name_plural = "Valoración de inventario"
+
+    @property
+    def costo_promedio(self):
+        if self.cantidad <= 0:
+            return Decimal('0')
+        return (self.valor / self.cantidad).quantize(Decimal('0.0001'))
+
+    @property
+    def ultima_clave(self):
+        if self.ultima_fecha is None:
+            return None
+        return (self.ultima_fecha, self.ultimo_orden, self.ultimo_id)
+
+    def __str__(self):
+        return f"Valoración de {self.material}: {self.cantidad} por {self.valor}"
+
+
+# Capa FIFO: lo que queda sin consumir de cada entrada
+class CapaCosto(models.Model):
+    material = models.ForeignKey(Material, on_delete=models.CASCADE, related_name="capas_costo", db_index=False)
+    entrada = models.OneToOneField(EntradaInventario, on_delete=models.CASCADE, related_name="capa_costo")
+    fecha = models.DateField()
+    costo_unitario = models.DecimalField(max_digits=12, decimal_places=4)
+    cantidad_restante = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        verbose_name = "Capa de costo"
+        verbose_name_plural = "Capas de costo"
+        # Las capas abiertas de un material en orden de consumo
+        indexes = [models.Index(fields=['material', 'fecha', 'entrada'])]
+
+    def __str__(self):
+        return f"{self.cantidad_restante} de {self.material} a {self.costo_unitario}"
+
+
+# Stock de cada material en cada ubicacion. Las entradas y salidas con
+# ubicacion y las transferencias lo ajustan con UPDATE ... SET cantidad = cantidad + delta.
+class StockUbicacion(models.Model):
+    # Sin indices propios: los cubren el indice unico (material, ubicacion) y (ubicacion, material)
+    material = models.ForeignKey(Material, on_delete=models.CASCADE, related_name="stock_por_ubicacion", db_index=False)
+    ubicacion = models.ForeignKey(Ubicacion, on_delete=models.CASCADE, related_name="stocks", db_index=False)
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+
+    class Meta:
+        verbose_name = "Stock por ubicación"
+        verbose_name_plural = "Stock por ubicación"
+        constraints = [models.UniqueConstraint(fields=['material', 'ubicacion'], name='stock_por_material_y_ubicacion')]
+        # "todo lo que hay en la obra X" recorre este indice; "donde esta el material Y", el unico
+        indexes = [models.Index(fields=['ubicacion', 'material'])]
+
+    @classmethod
+    def ajustar(cls, deltas):
+        """Suma los deltas {(material_id, ubicacion_id): cantidad con signo}; ignora los sin ubicacion."""
+        deltas = {clave: delta for clave, delta in deltas.items() if delta and clave[1] is not None}
+        if not deltas:
+            return
+        cls.objects.bulk_create([cls(material_id=material, ubicacion_id=ubicacion) for material, ubicacion in deltas],
+                                ignore_conflicts=True)
+        for (material, ubicacion), delta in deltas.items():
+            cls.objects.filter(material_id=material, ubicacion_id=ubicacion).update(cantidad=F('cantidad') + delta)
+
+    @classmethod
+    def aplicar(cls, deltas):
+        """
+        Como ajustar(), pero lo que baja en una ubicacion se descuenta con
+        retirar(): si no alcanza lanza ValidationError (llamar dentro de un atomic).
+        """
+        cls.ajustar({clave: delta for clave, delta in deltas.items() if delta > 0})
+        for (material, ubicacion), delta in deltas.items():
+            if delta < 0 and ubicacion is not None:
+                cls.retirar(material, ubicacion, -delta)
+
+    @classmethod
+    def cantidad_en(cls, material_id, ubicacion_id):
+        return cls.objects.filter(material_id=material_id, ubicacion_id=ubicacion_id).values_list('cantidad', flat=True).first() or Decimal('0')
+
+    @classmethod
+    def retirar(cls, material_id, ubicacion_id, cantidad):
+        # Descuenta solo si alcanza, en el mismo UPDATE: dos retiros simultaneos no pueden dejarlo negativo
+        if not cls.objects.filter(material_id=material_id, ubicacion_id=ubicacion_id, cantidad__gte=cantidad).update(
+            cantidad=F('cantidad') - cantidad
+        ):
+            raise ValidationError(
+                f"Stock insuficiente en la ubicación: hay {cls.cantidad_en(material_id, ubicacion_id)} y se necesitan {cantidad}."
+            )
+
+    def __str__(self):
+        return f"{self.material} en {self.ubicacion}: {self.cantidad}"
+
+
+# Traslado de material entre dos ubicaciones; no cambia el stock total del material
+class TransferenciaInventario(models.Model):
+    material = models.ForeignKey(Material, on_delete=models.CASCADE, related_name="transferencias")
+    origen = models.ForeignKey(Ubicacion, on_delete=models.PROTECT, related_name="transferencias_salientes")
+    destino = models.ForeignKey(Ubicacion, on_delete=models.PROTECT, related_name="transferencias_entrantes")
+    cantidad = models.DecimalField(max_digits=10, decimal_places=2)
+    fecha = models.DateField(default=date.today)
+    descripcion = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "Transferencia de inventario"
+        verbose_name_plural = "Transferencias de inventario"
+        constraints = [
+            models.CheckConstraint(condition=~Q(origen=F('destino')), name='transferencia_entre_ubicaciones_distintas'),
+            models.CheckConstraint(condition=Q(cantidad__gt=0), name='transferencia_cantidad_positiva'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._original = tuple(instancia.__dict__.get(campo) for campo in ('material_id', 'origen_id', 'destino_id', 'cantidad'))
+        return instancia
+
+    def deltas_de_stock(self):
+        """Lo que guardar la transferencia cambia en {(material_id, ubicacion_id): delta}, neto de sus valores guardados."""
+        deltas = defaultdict(Decimal)
+        deltas[self.material_id, self.origen_id] -= self.cantidad
+        deltas[self.material_id, self.destino_id] += self.cantidad
+        anterior = getattr(self, '_original', None)
+        if anterior is not None:
+            material, origen, destino, cantidad = anterior
+            deltas[material, origen] += cantidad
+            deltas[material, destino] -= cantidad
+        return deltas
+
+    @staticmethod
+    def retiros_al_eliminar(transferencias):
+        """Lo que eliminar estas transferencias retira de cada ubicacion, para faltantes_al_eliminar()."""
+        por_ubicacion = defaultdict(Decimal)
+        for material, origen, destino, cantidad in transferencias.values_list('material_id', 'origen_id', 'destino_id', 'cantidad'):
+            por_ubicacion[material, destino] += cantidad
+            por_ubicacion[material, origen] -= cantidad
+        return {}, por_ubicacion
+
+    def clean(self):
+        if self.origen_id and self.origen_id == self.destino_id:
+            raise ValidationError("El origen y el destino deben ser distintos.")
+        if self.cantidad is not None and self.cantidad <= 0:
+            raise ValidationError("La cantidad debe ser mayor que cero.")
+        if self.material_id and self.origen_id and self.destino_id and self.cantidad:
+            # Aviso en el formulario, tambien al editar; save() vuelve a verificarlo al descontar
+            for (material, ubicacion), delta in self.deltas_de_stock().items():
+                disponible = StockUbicacion.cantidad_en(material, ubicacion)
+                if delta < 0 and disponible < -delta:
+                    nombre = Ubicacion.objects.get(pk=ubicacion)
+                    raise ValidationError({'cantidad': f"Stock insuficiente en {nombre}: hay {disponible} y se retiran {-delta}."})
+
+    def save(self, *args, **kwargs):
+        actual = (self.material_id, self.origen_id, self.destino_id, self.cantidad)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if getattr(self, '_original', None) != actual:
+                StockUbicacion.aplicar(self.deltas_de_stock())
+        self._original = actual
+
+    def __str__(self):
+        return f"{self.cantidad} de {self.material} de {self.origen} a {self.destino}"
+
+
+def faltantes_al_eliminar(por_material, por_ubicacion):
+    """
+    Por que no se puede eliminar lo que retira del stock {material_id:
+    cantidad} y {(material_id, ubicacion_id): cantidad}: una lista de textos,
+    vacia si todo sigue disponible. Los admin la muestran antes de borrar;
+    los pre_delete lo vuelven a verificar al descontar.
+    """
+    faltantes = []
+    nombres = dict(Material.objects.filter(pk__in={material for material, _ in por_ubicacion} | set(por_material))
+                   .values_list('pk', 'nombre'))
+    for material, cantidad in por_material.items():
+        disponible = Inventario.disponible(material)
+        if cantidad > 0 and disponible < cantidad:
+            faltantes.append(f"{nombres[material]}: el stock ya se usó, hay {disponible} disponible y se retiran {cantidad}.")
+    ubicaciones = dict(Ubicacion.objects.filter(pk__in={ubicacion for _, ubicacion in por_ubicacion}).values_list('pk', 'nombre'))
+    for (material, ubicacion), cantidad in por_ubicacion.items():
+        if ubicacion is not None and cantidad > 0:
+            disponible = StockUbicacion.cantidad_en(material, ubicacion)
+            if disponible < cantidad:
+                faltantes.append(f"{nombres[material]} en {ubicaciones[ubicacion]}: hay {disponible} y se retiran {cantidad}.")
+    return faltantes
+
+
+def _eliminado_con_material(origin):
+    # Al eliminar un material su inventario se elimina con el; no hay nada que ajustar
+    modelo_origen = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    return modelo_origen is Material
+
+
+@receiver(pre_delete, sender=TransferenciaInventario)
+def revertir_transferencia_eliminada(sender, instance, origin=None, **kwargs):
+    # Antes de borrar: si el destino ya uso lo transferido, retirar() lanza ValidationError y no se borra nada
+    if _eliminado_con_material(origin):
+        return
+    material, origen, destino, cantidad = getattr(
+        instance, '_original', (instance.material_id, instance.origen_id, instance.destino_id, instance.cantidad)
+    )
+    StockUbicacion.aplicar({(material, destino): -cantidad, (material, origen): cantidad})
+
+
+@receiver(pre_delete, sender=EntradaInventario)
+@receiver(pre_delete, sender=SalidaInventario)
+def revertir_stock_eliminado(sender, instance, origin=None, **kwargs):
+    # Antes de borrar, para que una entrada cuyo stock ya se uso lance
+    # ValidationError sin haber borrado nada; dentro del atomic del borrado
+    if _eliminado_con_material(origin):
+        return
+    material_id, cantidad, _, ubicacion_id = getattr(
+        instance, '_original', (instance.material_id, instance.cantidad, instance.fecha, instance.ubicacion_id)
+    )
+    if sender.signo > 0:
+        # Sin la entrada el stock baja: solo si lo que aporto sigue disponible
+        Inventario.retirar(material_id, cantidad)
+    else:
+        Inventario.aplicar_delta(material_id, cantidad)
+    StockUbicacion.aplicar({(material_id, ubicacion_id): -sender.signo * cantidad})
+
+
+@receiver(post_delete, sender=EntradaInventario)
 @receiver(post_delete, sender=SalidaInventario)
-def actualizar_inventario_salida(sender, instance, **kwargs):
-    if hasattr(instance.material, 'inventario'):
-        instance.material.inventario.actualizar_stock()
+def descontar_movimiento_eliminado(sender, instance, origin=None, **kwargs):
+    if _eliminado_con_material(origin):
+        return
+    # Se revierte lo que el movimiento aporto segun sus valores guardados; el stock ya lo desconto el pre_delete
+    material_id, cantidad, fecha, _ = getattr(
+        instance, '_original', (instance.material_id, instance.cantidad, instance.fecha, instance.ubicacion_id)
+    )
+    CorteInventario.ajustar({(material_id, fecha): -sender.signo * cantidad})
+    if sender is EntradaInventario:
+        costo = getattr(instance, '_costo_original', instance.costo_unitario)
+        GastoMaterialMes.ajustar({(material_id, fecha): GastoMaterialMes.delta(cantidad, costo, -1)})
+    from .valoracion import revalorar
+    revalorar([material_id])
 
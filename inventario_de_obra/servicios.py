@@ -0,0 +1,259 @@
+"""
+Registro masivo de movimientos de inventario.
+
+registrar_movimientos() valida el lote completo con una consulta por
+tabla relacionada, inserta entradas y salidas con bulk_create y ajusta el
+stock de cada material afectado una sola vez por lote.
+
+stock_al() responde el stock a una fecha desde el corte mensual mas
+cercano y los movimientos posteriores a el; stock_en_ubicacion() y
+ubicaciones_de_material() leen el stock por obra o bodega.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Max, Q, Sum, Value, When
+from django.utils.dateparse import parse_date
+
+from contabilidad.models import SRIFactura
+from rubros.models import Material
+
+from . import valoracion
+from .models import (
+    CorteInventario, EntradaInventario, GastoMaterialMes, Inventario, SalidaInventario, StockUbicacion, Ubicacion,
+)
+
+TIPOS = ('entrada', 'salida')
+TAMANO_LOTE = 500
+CANTIDAD_MAXIMA = Decimal('100000000')  # max_digits=10, decimal_places=2
+
+
+@dataclass
+class ResultadoMovimientos:
+    entradas: int = 0
+    salidas: int = 0
+    materiales: int = 0
+    registros: list = field(default_factory=list)  # movimientos creados, en el orden recibido
+
+
+def _cantidad(valor):
+    cantidad = Decimal(str(valor).strip().replace(',', '.')).quantize(Decimal('0.01'))
+    if not cantidad.is_finite() or cantidad <= 0 or cantidad >= CANTIDAD_MAXIMA:
+        raise InvalidOperation
+    return cantidad
+
+
+def _entero(valor):
+    if isinstance(valor, bool):
+        raise ValueError
+    return int(valor)
+
+
+def aplicar_deltas(deltas):
+    """
+    Suma a cada inventario su delta (material -> cantidad) con un UPDATE por
+    cada TAMANO_LOTE materiales; crea antes los inventarios que falten. Los
+    materiales que bajan solo se descuentan si alcanza su stock disponible;
+    si alguno no alcanza lanza ValidationError (llamar dentro de un atomic).
+    """
+    deltas = {material: delta for material, delta in deltas.items() if delta}
+    materiales = list(deltas)
+    for inicio in range(0, len(materiales), TAMANO_LOTE):
+        parte = materiales[inicio:inicio + TAMANO_LOTE]
+        Inventario.objects.bulk_create([Inventario(material_id=material) for material in parte], ignore_conflicts=True)
+        retiros = [material for material in parte if deltas[material] < 0]
+        condicion = Q(material_id__in=[material for material in parte if deltas[material] > 0])
+        for material in retiros:
+            condicion |= Q(material_id=material, stock_actual__gte=F('stock_reservado') - deltas[material])
+        disponibles = dict(
+            Inventario.objects.filter(material_id__in=retiros)
+            .values_list('material_id', F('stock_actual') - F('stock_reservado'))
+        ) if retiros else {}
+        actualizados = Inventario.objects.filter(condicion).update(stock_actual=F('stock_actual') + Case(
+            *[When(material_id=material, then=Value(deltas[material])) for material in parte],
+            output_field=DecimalField(),
+        ))
+        if actualizados != len(parte):
+            errores = [
+                f"Material {material}: stock insuficiente, hay {disponibles.get(material, 0)} disponible y se necesitan {-deltas[material]}."
+                for material in retiros if disponibles.get(material, 0) < -deltas[material]
+            ]
+            raise ValidationError(errores or ["Stock insuficiente; otro retiro se registro al mismo tiempo, intente de nuevo."])
+
+
+def registrar_movimientos(movimientos):
+    """
+    Registra una lista de movimientos, cada uno un diccionario con tipo
+    (entrada o salida), material (id), cantidad y opcionalmente
+    descripcion, ubicacion (id), y solo para entradas fecha, factura (id) y
+    costo_unitario (por defecto el costo unitario del material).
+    Si algun movimiento no es valido no se registra ninguno.
+    """
+    movimientos = list(movimientos)
+    errores = []
+
+    materiales = set()
+    facturas = set()
+    ubicaciones = set()
+    for movimiento in movimientos:
+        if not isinstance(movimiento, dict):
+            continue
+        try:
+            materiales.add(_entero(movimiento.get('material')))
+        except (TypeError, ValueError):
+            pass
+        for campo, ids in (('factura', facturas), ('ubicacion', ubicaciones)):
+            if movimiento.get(campo) not in (None, ''):
+                try:
+                    ids.add(_entero(movimiento[campo]))
+                except (TypeError, ValueError):
+                    pass
+    materiales = dict(Material.objects.filter(pk__in=materiales).values_list('pk', 'costo_por_unidad'))
+    facturas = set(SRIFactura.objects.filter(pk__in=facturas).values_list('pk', flat=True))
+    ubicaciones = set(Ubicacion.objects.filter(pk__in=ubicaciones).values_list('pk', flat=True))
+
+    entradas, salidas, registros = [], [], []
+    deltas = defaultdict(Decimal)
+    deltas_por_fecha = defaultdict(Decimal)
+    deltas_por_ubicacion = defaultdict(Decimal)
+    deltas_gasto = {}
+    for numero, movimiento in enumerate(movimientos, start=1):
+        if not isinstance(movimiento, dict):
+            errores.append(f"Movimiento {numero}: formato no valido.")
+            continue
+        tipo = str(movimiento.get('tipo') or '').strip().lower()
+        if tipo not in TIPOS:
+            errores.append(f"Movimiento {numero}: tipo '{movimiento.get('tipo')}' no valido (entrada o salida).")
+            continue
+        try:
+            material = _entero(movimiento.get('material'))
+        except (TypeError, ValueError):
+            material = None
+        if material not in materiales:
+            errores.append(f"Movimiento {numero}: no existe el material '{movimiento.get('material')}'.")
+            continue
+        try:
+            cantidad = _cantidad(movimiento.get('cantidad'))
+        except (InvalidOperation, ValueError, TypeError):
+            errores.append(f"Movimiento {numero}: cantidad '{movimiento.get('cantidad')}' no valida.")
+            continue
+        descripcion = str(movimiento.get('descripcion') or '')
+        ubicacion = None
+        if movimiento.get('ubicacion') not in (None, ''):
+            try:
+                ubicacion = _entero(movimiento['ubicacion'])
+            except (TypeError, ValueError):
+                pass
+            if ubicacion not in ubicaciones:
+                errores.append(f"Movimiento {numero}: no existe la ubicación '{movimiento.get('ubicacion')}'.")
+                continue
+
+        if tipo == 'salida':
+            salidas.append(SalidaInventario(material_id=material, cantidad=cantidad, descripcion=descripcion, ubicacion_id=ubicacion))
+            registros.append(salidas[-1])
+            deltas[material] -= cantidad
+            deltas_por_fecha[material, date.today()] -= cantidad
+            deltas_por_ubicacion[material, ubicacion] -= cantidad
+            continue
+
+        fecha = movimiento.get('fecha') or date.today()
+        if isinstance(fecha, str):
+            try:
+                fecha = parse_date(fecha)
+            except ValueError:
+                fecha = None
+        if not isinstance(fecha, date):
+            errores.append(f"Movimiento {numero}: fecha '{movimiento.get('fecha')}' no valida.")
+            continue
+        factura = None
+        if movimiento.get('factura') not in (None, ''):
+            try:
+                factura = _entero(movimiento['factura'])
+            except (TypeError, ValueError):
+                pass
+            if factura not in facturas:
+                errores.append(f"Movimiento {numero}: no existe la factura '{movimiento.get('factura')}'.")
+                continue
+        costo_unitario = materiales[material]
+        if movimiento.get('costo_unitario') not in (None, ''):
+            try:
+                costo_unitario = Decimal(str(movimiento['costo_unitario']).strip().replace(',', '.')).quantize(Decimal('0.0001'))
+                if not costo_unitario.is_finite() or costo_unitario < 0 or costo_unitario >= CANTIDAD_MAXIMA:
+                    raise InvalidOperation
+            except (InvalidOperation, ValueError):
+                errores.append(f"Movimiento {numero}: costo unitario '{movimiento.get('costo_unitario')}' no valido.")
+                continue
+        entradas.append(EntradaInventario(
+            material_id=material, factura_id=factura, cantidad=cantidad, descripcion=descripcion, fecha=fecha,
+            ubicacion_id=ubicacion, costo_unitario=costo_unitario,
+        ))
+        registros.append(entradas[-1])
+        deltas_gasto[material, fecha] = GastoMaterialMes.delta(cantidad, costo_unitario, anterior=deltas_gasto.get((material, fecha)))
+        deltas[material] += cantidad
+        deltas_por_fecha[material, fecha] += cantidad
+        deltas_por_ubicacion[material, ubicacion] += cantidad
+
+    if errores:
+        raise ValidationError(errores)
+
+    with transaction.atomic():
+        EntradaInventario.objects.bulk_create(entradas, batch_size=TAMANO_LOTE)
+        SalidaInventario.objects.bulk_create(salidas, batch_size=TAMANO_LOTE)
+        aplicar_deltas(deltas)
+        CorteInventario.ajustar(deltas_por_fecha)
+        StockUbicacion.aplicar(deltas_por_ubicacion)
+        GastoMaterialMes.ajustar(deltas_gasto)
+        valoracion.registrar(entradas + salidas)
+
+    return ResultadoMovimientos(entradas=len(entradas), salidas=len(salidas), materiales=len(deltas), registros=registros)
+
+
+def _sumas_por_material(modelo, desde, hasta, material=None):
+    movimientos = modelo.objects.filter(fecha__lte=hasta)
+    if desde is not None:
+        movimientos = movimientos.filter(fecha__gt=desde)
+    if material is not None:
+        movimientos = movimientos.filter(material_id=material)
+    return dict(movimientos.order_by().values('material').annotate(total=Sum('cantidad')).values_list('material', 'total'))
+
+
+def stock_al(fecha, material=None):
+    """
+    Stock al cierre de la fecha dada: el del ultimo corte hasta esa fecha
+    mas las entradas y menos las salidas posteriores al corte (rango
+    acotado por los indices de fecha). Con material (id o instancia)
+    devuelve un Decimal; sin el, un diccionario material_id -> stock.
+    """
+    material = getattr(material, 'pk', material)
+    corte = CorteInventario.objects.filter(fecha__lte=fecha).aggregate(ultimo=Max('fecha'))['ultimo']
+
+    stock = defaultdict(Decimal)
+    if corte is not None:
+        cortes = CorteInventario.objects.filter(fecha=corte)
+        if material is not None:
+            cortes = cortes.filter(material_id=material)
+        stock.update(cortes.values_list('material_id', 'stock'))
+    for material_id, total in _sumas_por_material(EntradaInventario, corte, fecha, material).items():
+        stock[material_id] += total
+    for material_id, total in _sumas_por_material(SalidaInventario, corte, fecha, material).items():
+        stock[material_id] -= total
+
+    if material is not None:
+        return stock.get(material, Decimal('0.00'))
+    return dict(stock)
+
+
+def stock_en_ubicacion(ubicacion):
+    """Materiales con stock en una obra o bodega, en una sola consulta por el indice (ubicacion, material)."""
+    return (StockUbicacion.objects.filter(ubicacion=ubicacion, cantidad__gt=0)
+            .select_related('material__unidad').order_by('material__nombre'))
+
+
+def ubicaciones_de_material(material):
+    """Obras y bodegas donde hay stock de un material, en una sola consulta por el indice unico."""
+    return (StockUbicacion.objects.filter(material=material, cantidad__gt=0)
+            .select_related('ubicacion').order_by('ubicacion__nombre'))
@@ -1,3 +1,590 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import Permission, User
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+
+from contabilidad.models import SRIFactura
+from rubros.models import Material, Unidad
+
+from .models import (
+    CapaCosto, CorteInventario, EntradaInventario, Inventario, SalidaInventario, StockUbicacion, TransferenciaInventario,
+    Ubicacion, ValoracionInventario,
+)
+from .servicios import registrar_movimientos, stock_al
+from .valoracion import revalorar, valor_inventario
+
+
+def stock(material):
+    return Inventario.objects.get(material=material).stock_actual
+
+
+def stock_en(material, ubicacion):
+    return StockUbicacion.cantidad_en(material.pk, ubicacion.pk)
+
+
+class InventarioTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.unidad = Unidad.objects.create(nombre='saco', abreviatura='sc')
+        cls.material = Material.objects.create(nombre='Cemento', unidad=cls.unidad, costo_por_unidad=Decimal('8.00'))
+        cls.bodega = Ubicacion.objects.create(nombre='Bodega central', tipo='bodega')
+        cls.obra = Ubicacion.objects.create(nombre='Obra norte')
+
+
+class EliminacionYEdicionEnAdminTests(InventarioTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.usuario = User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def editar_salida(self, salida, **datos):
+        datos = {'material': self.material.pk, 'reserva': '', 'ubicacion': '', 'cantidad': salida.cantidad, 'descripcion': '', **datos}
+        return self.client.post(f'/admin/inventario_de_obra/salidainventario/{salida.pk}/change/', datos)
+
+    def test_editar_salida_por_encima_del_stock_muestra_el_error(self):
+        EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'))
+        salida = SalidaInventario.objects.create(material=self.material, cantidad=Decimal('4'))
+
+        respuesta = self.editar_salida(salida, cantidad='20')
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('cantidad', respuesta.context['adminform'].form.errors)
+        self.assertEqual(stock(self.material), Decimal('6'))
+
+    def test_editar_salida_dentro_del_stock_cuenta_su_propia_cantidad(self):
+        EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'))
+        salida = SalidaInventario.objects.create(material=self.material, cantidad=Decimal('4'))
+
+        respuesta = self.editar_salida(salida, cantidad='10')
+
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(stock(self.material), Decimal('0'))
+
+    def test_editar_salida_por_encima_del_stock_de_la_ubicacion(self):
+        EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'), ubicacion=self.bodega)
+        EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'), ubicacion=self.obra)
+        salida = SalidaInventario.objects.create(material=self.material, cantidad=Decimal('4'), ubicacion=self.bodega)
+
+        respuesta = self.editar_salida(salida, cantidad='12', ubicacion=self.bodega.pk)
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('ubicacion', respuesta.context['adminform'].form.errors)
+        self.assertEqual(stock_en(self.material, self.bodega), Decimal('6'))
+
+    def test_mover_entrada_de_ubicacion_con_stock_usado_muestra_el_error(self):
+        entrada = EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'), ubicacion=self.bodega)
+        SalidaInventario.objects.create(material=self.material, cantidad=Decimal('7'), ubicacion=self.bodega)
+        entrada.ubicacion = self.obra
+
+        with self.assertRaises(ValidationError):
+            entrada.full_clean()
+
+    def test_eliminar_entrada_con_stock_usado_la_muestra_protegida(self):
+        entrada = EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'))
+        SalidaInventario.objects.create(material=self.material, cantidad=Decimal('8'))
+
+        respuesta = self.client.post(f'/admin/inventario_de_obra/entradainventario/{entrada.pk}/delete/', {'post': 'yes'})
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.context['protected'])
+        self.assertTrue(EntradaInventario.objects.filter(pk=entrada.pk).exists())
+        self.assertEqual(stock(self.material), Decimal('2'))
+
+    def test_eliminar_entradas_seleccionadas_con_stock_usado(self):
+        entrada = EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'))
+        SalidaInventario.objects.create(material=self.material, cantidad=Decimal('8'))
+
+        respuesta = self.client.post('/admin/inventario_de_obra/entradainventario/', {
+            'action': 'delete_selected', '_selected_action': [entrada.pk], 'post': 'yes',
+        })
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.context['protected'])
+        self.assertTrue(EntradaInventario.objects.filter(pk=entrada.pk).exists())
+
+    def test_eliminar_factura_con_entradas_usadas_la_muestra_protegida(self):
+        factura = SRIFactura.objects.create(
+            ruc='1790012345001', numero_factura='001-001-000000001', numero_autorizacion='123', nombre='Proveedor', nombre_comercial='Proveedor',
+        )
+        EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'), factura=factura)
+        SalidaInventario.objects.create(material=self.material, cantidad=Decimal('8'))
+
+        respuesta = self.client.post(f'/admin/contabilidad/srifactura/{factura.pk}/delete/', {'post': 'yes'})
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.context['protected'])
+        self.assertTrue(SRIFactura.objects.filter(pk=factura.pk).exists())
+        self.assertEqual(stock(self.material), Decimal('2'))
+
+    def test_eliminar_entrada_con_stock_disponible(self):
+        entrada = EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'), ubicacion=self.bodega)
+
+        respuesta = self.client.post(f'/admin/inventario_de_obra/entradainventario/{entrada.pk}/delete/', {'post': 'yes'})
+
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(stock(self.material), Decimal('0'))
+        self.assertEqual(stock_en(self.material, self.bodega), Decimal('0'))
+
+    def test_eliminar_entrada_usada_fuera_del_admin_no_borra_nada(self):
+        entrada = EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'), ubicacion=self.bodega)
+        SalidaInventario.objects.create(material=self.material, cantidad=Decimal('8'), ubicacion=self.bodega)
+
+        with self.assertRaises(ValidationError), transaction.atomic():
+            entrada.delete()
+
+        self.assertTrue(EntradaInventario.objects.filter(pk=entrada.pk).exists())
+        self.assertEqual(stock(self.material), Decimal('2'))
+        self.assertEqual(stock_en(self.material, self.bodega), Decimal('2'))
+
+
+class LibroDeStockTests(InventarioTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.arena = Material.objects.create(nombre='Arena', unidad=cls.unidad, costo_por_unidad=Decimal('12.00'))
+
+    def assertStockSegunMovimientos(self):
+        for inventario in Inventario.objects.annotate(calculado=Inventario.stock_segun_movimientos()):
+            self.assertEqual(inventario.stock_actual, inventario.calculado, inventario.material)
+
+    def test_entradas_y_salidas_ajustan_el_stock(self):
+        EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'))
+        EntradaInventario.objects.create(material=self.material, cantidad=Decimal('5.50'))
+        SalidaInventario.objects.create(material=self.material, cantidad=Decimal('3.25'))
+
+        self.assertEqual(stock(self.material), Decimal('12.25'))
+        self.assertStockSegunMovimientos()
+
+    def test_editar_entrada_aplica_solo_la_diferencia(self):
+        entrada = EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'))
+        entrada = EntradaInventario.objects.get(pk=entrada.pk)
+
+        entrada.cantidad = Decimal('15')
+        entrada.save()
+        self.assertEqual(stock(self.material), Decimal('15'))
+
+        entrada.material = self.arena
+        entrada.save()
+        self.assertEqual(stock(self.material), Decimal('0'))
+        self.assertEqual(stock(self.arena), Decimal('15'))
+        self.assertStockSegunMovimientos()
+
+    def test_editar_salida_aplica_solo_la_diferencia(self):
+        EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'))
+        salida = SalidaInventario.objects.create(material=self.material, cantidad=Decimal('3'))
+        salida = SalidaInventario.objects.get(pk=salida.pk)
+
+        salida.cantidad = Decimal('8')
+        salida.save()
+        self.assertEqual(stock(self.material), Decimal('2'))
+
+        salida.cantidad = Decimal('1')
+        salida.save()
+        self.assertEqual(stock(self.material), Decimal('9'))
+        self.assertStockSegunMovimientos()
+
+    def test_eliminar_movimientos_revierte_su_aporte(self):
+        entrada = EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'))
+        salida = SalidaInventario.objects.create(material=self.material, cantidad=Decimal('4'))
+
+        salida.delete()
+        self.assertEqual(stock(self.material), Decimal('10'))
+
+        entrada.delete()
+        self.assertEqual(stock(self.material), Decimal('0'))
+        self.assertStockSegunMovimientos()
+
+    def test_salida_mayor_al_stock_no_se_registra(self):
+        EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'))
+
+        with self.assertRaises(ValidationError):
+            SalidaInventario.objects.create(material=self.material, cantidad=Decimal('10.01'))
+
+        self.assertFalse(SalidaInventario.objects.exists())
+        self.assertEqual(stock(self.material), Decimal('10'))
+
+    def test_editar_salida_por_encima_del_stock_no_se_guarda(self):
+        EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'))
+        salida = SalidaInventario.objects.create(material=self.material, cantidad=Decimal('4'))
+        salida = SalidaInventario.objects.get(pk=salida.pk)
+
+        salida.cantidad = Decimal('15')
+        with self.assertRaises(ValidationError):
+            salida.save()
+
+        self.assertEqual(SalidaInventario.objects.get(pk=salida.pk).cantidad, Decimal('4'))
+        self.assertEqual(stock(self.material), Decimal('6'))
+
+    def test_retirar_no_descuenta_mas_que_lo_disponible(self):
+        EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'))
+
+        with self.assertRaises(ValidationError):
+            Inventario.retirar(self.material.pk, Decimal('10.01'))
+        self.assertEqual(stock(self.material), Decimal('10'))
+
+        Inventario.retirar(self.material.pk, Decimal('10'))
+        self.assertEqual(stock(self.material), Decimal('0'))
+
+    def test_retirar_respeta_el_stock_reservado(self):
+        EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'))
+        Inventario.reservar(self.material.pk, Decimal('4'))
+
+        with self.assertRaises(ValidationError):
+            Inventario.retirar(self.material.pk, Decimal('7'))
+
+        self.assertEqual(Inventario.disponible(self.material.pk), Decimal('6'))
+
+    def test_retirar_material_sin_inventario(self):
+        with self.assertRaises(ValidationError):
+            Inventario.retirar(self.arena.pk, Decimal('1'))
+        self.assertFalse(Inventario.objects.filter(material=self.arena).exists())
+
+
+class MovimientosApiTests(InventarioTestCase):
+    URL = '/api/inventario/movimientos/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.arena = Material.objects.create(nombre='Arena', unidad=cls.unidad, costo_por_unidad=Decimal('12.00'))
+        cls.usuario = User.objects.create_user('bodeguero', password='clave')
+        cls.usuario.user_permissions.set(Permission.objects.filter(
+            content_type__app_label='inventario_de_obra', codename__in=['add_entradainventario', 'add_salidainventario'],
+        ))
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def enviar(self, movimientos):
+        return self.client.post(self.URL, {'movimientos': movimientos}, content_type='application/json')
+
+    def test_lote_mixto_se_registra_completo(self):
+        respuesta = self.enviar([
+            {'tipo': 'entrada', 'material': self.material.pk, 'cantidad': '10', 'ubicacion': self.bodega.pk},
+            {'tipo': 'entrada', 'material': self.arena.pk, 'cantidad': '5,50', 'costo_unitario': '11.50'},
+            {'tipo': 'salida', 'material': self.material.pk, 'cantidad': '4', 'ubicacion': self.bodega.pk},
+        ])
+
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.json(), {'entradas': 2, 'salidas': 1, 'materiales': 2})
+        self.assertEqual(stock(self.material), Decimal('6'))
+        self.assertEqual(stock(self.arena), Decimal('5.50'))
+        self.assertEqual(stock_en(self.material, self.bodega), Decimal('6'))
+        self.assertEqual(EntradaInventario.objects.get(material=self.arena).costo_unitario, Decimal('11.50'))
+
+    def test_un_movimiento_invalido_rechaza_todo_el_lote(self):
+        respuesta = self.enviar([
+            {'tipo': 'entrada', 'material': self.material.pk, 'cantidad': '10'},
+            {'tipo': 'entrada', 'material': 999999, 'cantidad': '1'},
+            {'tipo': 'salida', 'material': self.material.pk, 'cantidad': '-2'},
+        ])
+
+        self.assertEqual(respuesta.status_code, 400)
+        errores = respuesta.json()['errores']
+        self.assertEqual(len(errores), 2)
+        self.assertTrue(errores[0].startswith('Movimiento 2:'))
+        self.assertTrue(errores[1].startswith('Movimiento 3:'))
+        self.assertFalse(EntradaInventario.objects.exists())
+        self.assertFalse(Inventario.objects.exists())
+
+    def test_salida_sin_stock_rechaza_todo_el_lote(self):
+        EntradaInventario.objects.create(material=self.material, cantidad=Decimal('3'), ubicacion=self.bodega)
+
+        respuesta = self.enviar([
+            {'tipo': 'entrada', 'material': self.arena.pk, 'cantidad': '5', 'ubicacion': self.bodega.pk},
+            {'tipo': 'salida', 'material': self.material.pk, 'cantidad': '4', 'ubicacion': self.bodega.pk},
+        ])
+
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(EntradaInventario.objects.filter(material=self.arena).exists())
+        self.assertFalse(SalidaInventario.objects.exists())
+        self.assertEqual(stock(self.material), Decimal('3'))
+        self.assertEqual(stock_en(self.material, self.bodega), Decimal('3'))
+
+    def test_salida_sin_stock_en_la_ubicacion_rechaza_todo_el_lote(self):
+        EntradaInventario.objects.create(material=self.material, cantidad=Decimal('10'), ubicacion=self.obra)
+
+        respuesta = self.enviar([
+            {'tipo': 'salida', 'material': self.material.pk, 'cantidad': '4', 'ubicacion': self.bodega.pk},
+        ])
+
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(stock(self.material), Decimal('10'))
+
+    def test_lista_vacia(self):
+        respuesta = self.enviar([])
+
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_sin_permiso_de_registrar_movimientos(self):
+        self.client.force_login(User.objects.create_user('visitante', password='clave'))
+
+        respuesta = self.enviar([{'tipo': 'entrada', 'material': self.material.pk, 'cantidad': '1'}])
+
+        self.assertEqual(respuesta.status_code, 403)
+        self.assertFalse(EntradaInventario.objects.exists())
+
+
+class StockAlTests(InventarioTestCase):
+    # Cortes al 31/01, 29/02 y 31/03; se consulta antes, en y entre los cortes, y despues del ultimo
+    FECHAS = [
+        date(2024, 1, 5), date(2024, 1, 15), date(2024, 1, 31), date(2024, 2, 10), date(2024, 2, 29),
+        date(2024, 3, 1), date(2024, 3, 20), date(2024, 3, 31), date(2024, 4, 15),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.arena = Material.objects.create(nombre='Arena', unidad=cls.unidad, costo_por_unidad=Decimal('12.00'))
+
+    def setUp(self):
+        self.entrada(self.material, date(2024, 1, 10), '100')
+        self.salida(self.material, date(2024, 1, 20), '30')
+        self.entrada(self.arena, date(2024, 2, 5), '50')
+        self.entrada(self.material, date(2024, 2, 29), '20')
+        self.salida(self.arena, date(2024, 3, 15), '40')
+        self.salida(self.material, date(2024, 4, 1), '10')
+        call_command('generar_cortes_inventario', hasta='2024-03-31', stdout=StringIO())
+
+    def entrada(self, material, fecha, cantidad):
+        return EntradaInventario.objects.create(material=material, fecha=fecha, cantidad=Decimal(cantidad))
+
+    def salida(self, material, fecha, cantidad):
+        salida = SalidaInventario.objects.create(material=material, cantidad=Decimal(cantidad))
+        # La fecha de las salidas es auto_now_add: se lleva a la fecha del caso
+        SalidaInventario.objects.filter(pk=salida.pk).update(fecha=fecha)
+        return SalidaInventario.objects.get(pk=salida.pk)
+
+    def reproducir(self, fecha):
+        """Stock a la fecha sumando todos los movimientos, sin cortes."""
+        stock = {}
+        for modelo, signo in ((EntradaInventario, 1), (SalidaInventario, -1)):
+            for material, cantidad in modelo.objects.filter(fecha__lte=fecha).values_list('material_id', 'cantidad'):
+                stock[material] = stock.get(material, Decimal('0')) + signo * cantidad
+        return stock
+
+    def assertCoincideConLosMovimientos(self):
+        for fecha in self.FECHAS:
+            esperado = self.reproducir(fecha)
+            self.assertEqual({m: s for m, s in stock_al(fecha).items() if s}, {m: s for m, s in esperado.items() if s}, fecha)
+            for material in (self.material, self.arena):
+                self.assertEqual(stock_al(fecha, material), esperado.get(material.pk, Decimal('0')), (fecha, material))
+
+    def test_cortes_generados(self):
+        self.assertEqual(
+            sorted(CorteInventario.objects.filter(material=self.material).values_list('fecha', 'stock')),
+            [(date(2024, 1, 31), Decimal('70')), (date(2024, 2, 29), Decimal('90')), (date(2024, 3, 31), Decimal('90'))],
+        )
+
+    def test_stock_al_coincide_con_todos_los_movimientos(self):
+        self.assertCoincideConLosMovimientos()
+
+    def test_movimientos_con_fecha_pasada_ajustan_los_cortes(self):
+        self.entrada(self.arena, date(2024, 1, 25), '7')
+        entrada = EntradaInventario.objects.get(material=self.material, fecha=date(2024, 2, 29))
+        entrada.fecha = date(2024, 3, 2)
+        entrada.cantidad = Decimal('25')
+        entrada.save()
+        SalidaInventario.objects.get(material=self.material, fecha=date(2024, 1, 20)).delete()
+
+        self.assertCoincideConLosMovimientos()
+        mantenidos = sorted(CorteInventario.objects.values_list('material_id', 'fecha', 'stock'))
+        call_command('generar_cortes_inventario', hasta='2024-03-31', reconstruir=True, stdout=StringIO())
+        self.assertEqual(mantenidos, sorted(CorteInventario.objects.values_list('material_id', 'fecha', 'stock')))
+
+
+class TransferenciaTests(InventarioTestCase):
+    def setUp(self):
+        EntradaInventario.objects.create(material=self.material, cantidad=Decimal('20'), ubicacion=self.bodega)
+
+    def transferir(self, cantidad, origen=None, destino=None):
+        transferencia = TransferenciaInventario.objects.create(
+            material=self.material, origen=origen or self.bodega, destino=destino or self.obra, cantidad=Decimal(cantidad),
+        )
+        return TransferenciaInventario.objects.get(pk=transferencia.pk)
+
+    def assertStock(self, bodega, obra):
+        self.assertEqual((stock_en(self.material, self.bodega), stock_en(self.material, self.obra)), (Decimal(bodega), Decimal(obra)))
+        # Una transferencia no cambia el stock total
+        salidas = SalidaInventario.objects.aggregate(total=Sum('cantidad'))['total'] or 0
+        self.assertEqual(stock(self.material), Decimal('20') - salidas)
+
+    def test_transferencia_mueve_el_stock_entre_ubicaciones(self):
+        self.transferir('8')
+
+        self.assertStock('12', '8')
+
+    def test_transferencia_mayor_al_stock_del_origen_se_rechaza(self):
+        transferencia = TransferenciaInventario(material=self.material, origen=self.bodega, destino=self.obra, cantidad=Decimal('25'))
+
+        with self.assertRaises(ValidationError):
+            transferencia.full_clean()
+        with self.assertRaises(ValidationError):
+            transferencia.save()
+
+        self.assertFalse(TransferenciaInventario.objects.exists())
+        self.assertStock('20', '0')
+
+    def test_editar_transferencia_aplica_la_diferencia(self):
+        transferencia = self.transferir('8')
+
+        transferencia.cantidad = Decimal('15')
+        transferencia.save()
+        self.assertStock('5', '15')
+
+        transferencia.cantidad = Decimal('3')
+        transferencia.save()
+        self.assertStock('17', '3')
+
+    def test_editar_transferencia_cuenta_lo_ya_usado_en_el_destino(self):
+        transferencia = self.transferir('10')
+        SalidaInventario.objects.create(material=self.material, cantidad=Decimal('6'), ubicacion=self.obra)
+
+        # Subirla solo agrega al destino, aunque parte de lo transferido ya se uso
+        transferencia.cantidad = Decimal('12')
+        transferencia.full_clean()
+        transferencia.save()
+        self.assertStock('8', '6')
+
+        # Bajarla por debajo de lo usado dejaria el destino en negativo
+        transferencia.cantidad = Decimal('2')
+        with self.assertRaises(ValidationError):
+            transferencia.full_clean()
+        with self.assertRaises(ValidationError):
+            transferencia.save()
+        self.assertStock('8', '6')
+
+    def test_cambiar_el_destino_de_una_transferencia(self):
+        otra_obra = Ubicacion.objects.create(nombre='Obra sur')
+        transferencia = self.transferir('8')
+
+        transferencia.destino = otra_obra
+        transferencia.save()
+
+        self.assertStock('12', '0')
+        self.assertEqual(stock_en(self.material, otra_obra), Decimal('8'))
+
+    def test_eliminar_transferencia_devuelve_el_stock_al_origen(self):
+        self.transferir('8').delete()
+
+        self.assertStock('20', '0')
+
+    def test_eliminar_transferencia_ya_usada_en_el_destino_se_rechaza(self):
+        transferencia = self.transferir('8')
+        SalidaInventario.objects.create(material=self.material, cantidad=Decimal('5'), ubicacion=self.obra)
+
+        with self.assertRaises(ValidationError), transaction.atomic():
+            transferencia.delete()
+
+        self.assertTrue(TransferenciaInventario.objects.filter(pk=transferencia.pk).exists())
+        self.assertStock('12', '3')
+
+    def test_eliminar_transferencia_usada_desde_el_admin_la_muestra_protegida(self):
+        transferencia = self.transferir('8')
+        SalidaInventario.objects.create(material=self.material, cantidad=Decimal('5'), ubicacion=self.obra)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'clave'))
+
+        respuesta = self.client.post(f'/admin/inventario_de_obra/transferenciainventario/{transferencia.pk}/delete/', {'post': 'yes'})
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.context['protected'])
+        self.assertTrue(TransferenciaInventario.objects.filter(pk=transferencia.pk).exists())
+
+
+@override_settings(VALORACION_INVENTARIO='promedio')
+class ValoracionPromedioTests(InventarioTestCase):
+    # Costo de las dos salidas de test_costo_de_las_salidas y valor final
+    COSTOS_ESPERADOS = [Decimal('15.0000'), Decimal('30.0000')]
+    VALOR_ESPERADO = Decimal('15.0000')
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.arena = Material.objects.create(nombre='Arena', unidad=cls.unidad, costo_por_unidad=Decimal('12.00'))
+
+    def entrada(self, dias_atras, cantidad, costo, material=None):
+        return EntradaInventario.objects.create(
+            material=material or self.material, fecha=date.today() - timedelta(days=dias_atras),
+            cantidad=Decimal(cantidad), costo_unitario=Decimal(costo),
+        )
+
+    def salida(self, cantidad, material=None):
+        return SalidaInventario.objects.create(material=material or self.material, cantidad=Decimal(cantidad))
+
+    def foto(self):
+        return (
+            sorted(ValoracionInventario.objects.values_list('material_id', 'cantidad', 'valor')),
+            sorted(SalidaInventario.objects.values_list('pk', 'costo')),
+            sorted(CapaCosto.objects.values_list('entrada_id', 'costo_unitario', 'cantidad_restante')),
+        )
+
+    def assertCoincideConRevalorar(self):
+        incremental = self.foto()
+        revalorar()
+        self.assertEqual(self.foto(), incremental)
+
+    def test_costo_de_las_salidas(self):
+        self.entrada(10, '10', '2')
+        self.entrada(5, '10', '4')
+        salidas = [self.salida('5'), self.salida('10')]
+
+        self.assertEqual([SalidaInventario.objects.get(pk=s.pk).costo for s in salidas], self.COSTOS_ESPERADOS)
+        self.assertEqual(valor_inventario(), self.VALOR_ESPERADO)
+        self.assertCoincideConRevalorar()
+
+    def test_movimientos_fuera_de_orden_coinciden_con_revalorar(self):
+        self.entrada(10, '10', '2')
+        self.salida('4')
+        # Entrada con fecha anterior a la ultima salida procesada: revalora el material
+        self.entrada(20, '6', '3.50')
+        self.salida('7')
+        registrar_movimientos([
+            {'tipo': 'entrada', 'material': self.arena.pk, 'cantidad': '8', 'costo_unitario': '1.25',
+             'fecha': (date.today() - timedelta(days=3)).isoformat()},
+            {'tipo': 'entrada', 'material': self.material.pk, 'cantidad': '2', 'costo_unitario': '5',
+             'fecha': (date.today() - timedelta(days=30)).isoformat()},
+            {'tipo': 'salida', 'material': self.arena.pk, 'cantidad': '3'},
+        ])
+
+        self.assertCoincideConRevalorar()
+
+    def test_movimientos_editados_y_eliminados_coinciden_con_revalorar(self):
+        primera = self.entrada(10, '10', '2')
+        segunda = self.entrada(5, '10', '4')
+        salida = self.salida('6')
+
+        segunda = EntradaInventario.objects.get(pk=segunda.pk)
+        segunda.costo_unitario = Decimal('6')
+        segunda.save()
+        self.assertCoincideConRevalorar()
+
+        primera = EntradaInventario.objects.get(pk=primera.pk)
+        primera.fecha = date.today() - timedelta(days=1)
+        primera.save()
+        self.assertCoincideConRevalorar()
+
+        salida = SalidaInventario.objects.get(pk=salida.pk)
+        salida.cantidad = Decimal('12')
+        salida.save()
+        self.assertCoincideConRevalorar()
+
+        salida.delete()
+        EntradaInventario.objects.get(pk=segunda.pk).delete()
+        self.assertCoincideConRevalorar()
+        self.assertEqual(valor_inventario(), Decimal('20.0000'))
+
+
+@override_settings(VALORACION_INVENTARIO='fifo')
+class ValoracionFifoTests(ValoracionPromedioTests):
+    # La primera salida consume la capa a 2; la segunda, lo que queda de ella y la mitad de la capa a 4
+    COSTOS_ESPERADOS = [Decimal('10.0000'), Decimal('30.0000')]
+    VALOR_ESPERADO = Decimal('20.0000')
@@ -0,0 +1,17 @@
+"""Tareas en segundo plano del inventario."""
+from tareas.registro import Trabajo, registrar
+
+from .valoracion import TAMANO_LOTE, materiales_con_movimientos, revalorar
+
+
+@registrar
+class RevalorarInventario(Trabajo):
+    nombre = 'revalorar_inventario'
+    descripcion = "Revalorar el inventario (despues de cambiar VALORACION_INVENTARIO)"
+
+    def partes(self, tarea):
+        materiales = sorted(materiales_con_movimientos())
+        return [materiales[inicio:inicio + TAMANO_LOTE] for inicio in range(0, len(materiales), TAMANO_LOTE)]
+
+    def ejecutar(self, tarea, datos):
+        return {'materiales': revalorar(datos)}
@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .views import MovimientosInventarioView
+
+urlpatterns = [
+    path('movimientos/', MovimientosInventarioView.as_view(), name='inventario_movimientos'),
+]
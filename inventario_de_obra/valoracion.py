@@ -0,0 +1,202 @@
+"""
+Valoracion del inventario por promedio ponderado o FIFO.
+
+Los movimientos de cada material se procesan en orden canonico: fecha,
+entradas antes que salidas y luego id. ValoracionInventario guarda la
+cantidad, el valor y el ultimo movimiento procesado, y en FIFO las capas
+abiertas quedan en CapaCosto. Un movimiento posterior al ultimo se aplica
+sobre ese estado; uno con fecha anterior, una edicion o una baja vuelven a
+procesar solo la historia de ese material (revalorar). Cada salida guarda
+en costo lo que consumio, y el valor del inventario es una sola lectura de
+ValoracionInventario.
+
+El metodo se elige con settings.VALORACION_INVENTARIO ('promedio' o
+'fifo'); despues de cambiarlo hay que ejecutar revalorar_inventario.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from heapq import merge
+
+from django.conf import settings
+from django.db.models import Sum
+
+from .models import CapaCosto, EntradaInventario, SalidaInventario, ValoracionInventario
+
+METODOS = ('promedio', 'fifo')
+TAMANO_LOTE = 500
+CUATRO_DECIMALES = Decimal('0.0001')
+
+
+def metodo():
+    valor = getattr(settings, 'VALORACION_INVENTARIO', 'promedio')
+    if valor not in METODOS:
+        raise ValueError(f"VALORACION_INVENTARIO debe ser uno de {METODOS}, no '{valor}'.")
+    return valor
+
+
+def clave(movimiento):
+    return (movimiento.fecha, 0 if isinstance(movimiento, EntradaInventario) else 1, movimiento.pk)
+
+
+class _Valorador:
+    """Aplica movimientos, en orden, al estado en memoria de un material."""
+
+    def __init__(self, estado, capas, fifo):
+        self.estado = estado
+        self.capas = capas  # capas abiertas en orden de consumo (solo FIFO)
+        self.fifo = fifo
+        self.capas_nuevas = []
+        self.capas_modificadas = {}
+        self.salidas = []
+
+    def aplicar(self, movimiento):
+        if isinstance(movimiento, EntradaInventario):
+            self.entrada(movimiento)
+        else:
+            self.salida(movimiento)
+        self.estado.ultima_fecha, self.estado.ultimo_orden, self.estado.ultimo_id = clave(movimiento)
+
+    def entrada(self, entrada):
+        estado = self.estado
+        costo = entrada.costo_unitario or Decimal('0')
+        # Con stock negativo la entrada primero cubre lo que falto (sin valor)
+        valorada = entrada.cantidad if estado.cantidad >= 0 else max(estado.cantidad + entrada.cantidad, Decimal('0'))
+        estado.cantidad += entrada.cantidad
+        estado.valor += (valorada * costo).quantize(CUATRO_DECIMALES)
+        if self.fifo:
+            capa = CapaCosto(material_id=entrada.material_id, entrada_id=entrada.pk, fecha=entrada.fecha,
+                             costo_unitario=costo, cantidad_restante=valorada)
+            self.capas_nuevas.append(capa)
+            if valorada:
+                self.capas.append(capa)
+
+    def salida(self, salida):
+        estado = self.estado
+        if self.fifo:
+            costo = Decimal('0')
+            pendiente = salida.cantidad
+            while pendiente > 0 and self.capas:
+                capa = self.capas[0]
+                tomado = min(capa.cantidad_restante, pendiente)
+                capa.cantidad_restante -= tomado
+                pendiente -= tomado
+                costo += (tomado * capa.costo_unitario).quantize(CUATRO_DECIMALES)
+                if capa.pk:
+                    self.capas_modificadas[capa.pk] = capa
+                if not capa.cantidad_restante:
+                    self.capas.pop(0)
+        elif estado.cantidad <= 0:
+            costo = Decimal('0')
+        elif salida.cantidad >= estado.cantidad:
+            costo = estado.valor
+        else:
+            costo = (estado.valor * salida.cantidad / estado.cantidad).quantize(CUATRO_DECIMALES)
+        estado.cantidad -= salida.cantidad
+        estado.valor -= costo
+        salida.costo = costo
+        self.salidas.append(salida)
+
+
+def _guardar(valoradores):
+    ValoracionInventario.objects.bulk_create(
+        [valorador.estado for valorador in valoradores],
+        update_conflicts=True,
+        unique_fields=['material'],
+        update_fields=['cantidad', 'valor', 'ultima_fecha', 'ultimo_orden', 'ultimo_id'],
+        batch_size=TAMANO_LOTE,
+    )
+    CapaCosto.objects.bulk_create([capa for v in valoradores for capa in v.capas_nuevas], batch_size=TAMANO_LOTE)
+    CapaCosto.objects.bulk_update(
+        [capa for v in valoradores for capa in v.capas_modificadas.values()], ['cantidad_restante'], batch_size=TAMANO_LOTE
+    )
+    SalidaInventario.objects.bulk_update([salida for v in valoradores for salida in v.salidas], ['costo'], batch_size=TAMANO_LOTE)
+
+
+def registrar(movimientos):
+    """
+    Valora movimientos recien creados (entradas y salidas con pk). Los
+    materiales cuyo lote empieza despues de su ultimo movimiento procesado
+    se actualizan sobre su estado; los demas se revaloran completos.
+    """
+    por_material = defaultdict(list)
+    for movimiento in movimientos:
+        por_material[movimiento.material_id].append(movimiento)
+    if not por_material:
+        return
+    fifo = metodo() == 'fifo'
+
+    estados = {estado.material_id: estado for estado in ValoracionInventario.objects.filter(material_id__in=por_material)}
+    revalorar_materiales = []
+    incrementales = {}
+    for material, lista in por_material.items():
+        lista.sort(key=clave)
+        estado = estados.get(material)
+        if estado is not None and estado.ultima_clave is not None and clave(lista[0]) <= estado.ultima_clave:
+            revalorar_materiales.append(material)
+        else:
+            incrementales[material] = estado or ValoracionInventario(material_id=material)
+
+    capas = defaultdict(list)
+    if fifo and incrementales:
+        for capa in (CapaCosto.objects.filter(material_id__in=list(incrementales), cantidad_restante__gt=0)
+                     .order_by('material', 'fecha', 'entrada')):
+            capas[capa.material_id].append(capa)
+
+    valoradores = []
+    for material, estado in incrementales.items():
+        valorador = _Valorador(estado, capas[material], fifo)
+        for movimiento in por_material[material]:
+            valorador.aplicar(movimiento)
+        valoradores.append(valorador)
+    _guardar(valoradores)
+    revalorar(revalorar_materiales)
+
+
+def movimiento_guardado(movimiento, material_anterior, anteriores):
+    """Llamado por MovimientoInventario.save con el material y (cantidad, fecha, costo) que tenia."""
+    if material_anterior is None:
+        registrar([movimiento])
+        return
+    actuales = (movimiento.cantidad, movimiento.fecha, getattr(movimiento, 'costo_unitario', None))
+    if (material_anterior, anteriores) != (movimiento.material_id, actuales):
+        revalorar({material_anterior, movimiento.material_id})
+
+
+def materiales_con_movimientos():
+    materiales = set(EntradaInventario.objects.values_list('material_id', flat=True).distinct())
+    return materiales | set(SalidaInventario.objects.values_list('material_id', flat=True).distinct())
+
+
+def revalorar(materiales=None):
+    """
+    Vuelve a procesar toda la historia de los materiales dados (o de todos
+    los que tienen movimientos) y devuelve cuantos se revaloraron.
+    """
+    if materiales is None:
+        materiales = materiales_con_movimientos()
+    materiales = sorted(set(materiales))
+    fifo = metodo() == 'fifo'
+
+    for inicio in range(0, len(materiales), TAMANO_LOTE):
+        parte = materiales[inicio:inicio + TAMANO_LOTE]
+        CapaCosto.objects.filter(material_id__in=parte).delete()
+        por_material = defaultdict(list)
+        entradas = EntradaInventario.objects.filter(material_id__in=parte).only('material_id', 'cantidad', 'fecha', 'costo_unitario')
+        salidas = SalidaInventario.objects.filter(material_id__in=parte).only('material_id', 'cantidad', 'fecha')
+        for movimiento in merge(entradas.order_by('fecha', 'pk'), salidas.order_by('fecha', 'pk'), key=clave):
+            por_material[movimiento.material_id].append(movimiento)
+
+        valoradores = []
+        for material in parte:
+            valorador = _Valorador(ValoracionInventario(material_id=material), [], fifo)
+            for movimiento in por_material[material]:
+                valorador.aplicar(movimiento)
+            valoradores.append(valorador)
+        _guardar(valoradores)
+    return len(materiales)
+
+
+def valor_inventario():
+    """Valor total del inventario: una sola consulta sobre ValoracionInventario."""
+    total = ValoracionInventario.objects.aggregate(total=Sum('valor'))['total'] or Decimal('0')
+    return total.quantize(CUATRO_DECIMALES)
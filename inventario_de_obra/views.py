@@ -1,3 +1,35 @@
-from django.shortcuts import render
+from django.core.exceptions import ValidationError
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from .servicios import registrar_movimientos
+
+
+class MovimientosInventarioView(APIView):
+    """
+    POST de un lote de movimientos: una lista, o {"movimientos": [...]}, de
+    {"tipo": "entrada"|"salida", "material": id, "cantidad": "10.50",
+    "ubicacion": id opcional, ...}.
+    Se registran todos o ninguno.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if not request.user.has_perms(['inventario_de_obra.add_entradainventario', 'inventario_de_obra.add_salidainventario']):
+            return Response({'detail': "No tiene permiso para registrar movimientos."}, status=status.HTTP_403_FORBIDDEN)
+
+        movimientos = request.data.get('movimientos') if isinstance(request.data, dict) else request.data
+        if not isinstance(movimientos, list) or not movimientos:
+            return Response({'errores': ["Envie una lista de movimientos."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            resultado = registrar_movimientos(movimientos)
+        except ValidationError as error:
+            return Response({'errores': error.messages}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'entradas': resultado.entradas,
+            'salidas': resultado.salidas,
+            'materiales': resultado.materiales,
+        }, status=status.HTTP_201_CREATED)
@@ -8,10 +8,52 @@ from .models import (
     ManoObra,
     RubroMaterial,
     RubroHerramienta,
-    RubroManoObra
+    RubroManoObra,
+    Presupuesto,
+    RubroPresupuesto,
+    PrecioMaterial,
+    PrecioHerramienta,
+    PrecioSalario,
+    calcular_costos_apu,
 )
+from .precios import RECURSOS, importar_precios, leer_lista_precios
+from .busqueda import BusquedaIndexadaMixin
+from .autocompletar import AutocompletarRecursosMixin
+from tareas.models import Tarea
 # from inventario_de_obra.admin import EntradaInventarioInline, SalidaInventarioInline  # Import the inlines
 from django import forms
+from django.core.exceptions import ValidationError
+from django.http import Http404, JsonResponse
+from decimal import Decimal, InvalidOperation
+import json
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.dateparse import parse_date
+from django.utils.html import format_html, format_html_join
+
+
+# Inline de solo lectura para el historial de precios de un recurso
+class HistorialPrecioInline(admin.TabularInline):
+    extra = 0
+    fields = ('fecha_vigencia', 'precio')
+    readonly_fields = ('fecha_vigencia', 'precio')
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class PrecioMaterialInline(HistorialPrecioInline):
+    model = PrecioMaterial
+
+
+class PrecioHerramientaInline(HistorialPrecioInline):
+    model = PrecioHerramienta
+
+
+class PrecioSalarioInline(HistorialPrecioInline):
+    model = PrecioSalario
 
 
 # Registrar el modelo SalarioMinimo
@@ -19,29 +61,15 @@ from django import forms
 class SalarioMinimoAdmin(admin.ModelAdmin):
     list_display = ('cargo', 'salario_horario_minimo')
     search_fields = ('cargo',)
+    inlines = [PrecioSalarioInline]
 
 class UnidadForm(forms.ModelForm):
     class Meta:
         model = Unidad
         fields = '__all__'
 
-    def clean(self):
-        cleaned_data = super().clean()
-        nombre = cleaned_data.get('nombre')
-        abreviatura = cleaned_data.get('abreviatura')
+    # La unicidad de nombre y abreviatura la valida Unidad.clean() sobre las claves indexadas
 
-        if nombre:
-            # Comparar ignorando mayúsculas y minúsculas
-            if Unidad.objects.exclude(id=self.instance.id).filter(nombre__iexact=nombre).exists():
-                self.add_error('nombre', 'Ya existe una unidad con este nombre (ignora mayúsculas/minúsculas).')
-
-        if abreviatura:
-            # Comparar ignorando mayúsculas y minúsculas
-            if Unidad.objects.exclude(id=self.instance.id).filter(abreviatura__iexact=abreviatura).exists():
-                self.add_error('abreviatura', 'Ya existe una unidad con esta abreviatura (ignora mayúsculas/minúsculas).')
-
-        return cleaned_data
-    
 # Registrar el modelo Unidad
 @admin.register(Unidad)
 class UnidadAdmin(admin.ModelAdmin):
@@ -49,12 +77,63 @@ class UnidadAdmin(admin.ModelAdmin):
     list_display = ('nombre', 'abreviatura')
     search_fields = ('nombre', 'abreviatura')
 
+class ListaPreciosForm(forms.Form):
+    archivo = forms.FileField(help_text="CSV con columnas nombre, precio y opcionalmente tipo (material, herramienta o salario).")
+    tipo = forms.ChoiceField(choices=[('', 'Según la columna tipo')] + [(tipo, tipo.title()) for tipo in RECURSOS], required=False)
+    simular = forms.BooleanField(required=False, help_text="Solo validar y mostrar los cambios, sin aplicarlos.")
+    segundo_plano = forms.BooleanField(required=False, help_text="Encolar la importación como tarea; el resultado queda en Tareas.")
+
+
 # Registrar el modelo Material
 @admin.register(Material)
-class MaterialAdmin(admin.ModelAdmin):
+class MaterialAdmin(BusquedaIndexadaMixin, admin.ModelAdmin):
     list_display = ('nombre', 'unidad', 'costo_por_unidad')
     search_fields = ('nombre',)
+    indice_busqueda = 'material'
     list_filter = ('unidad', 'nombre')
+    inlines = [PrecioMaterialInline]
+    change_list_template = 'admin/rubros/material/change_list.html'
+
+    def get_urls(self):
+        urls = [
+            path('importar-precios/', self.admin_site.admin_view(self.importar_precios_view), name='rubros_importar_precios'),
+        ]
+        return urls + super().get_urls()
+
+    # Carga masiva de la lista de precios de materiales, herramientas y salarios
+    def importar_precios_view(self, request):
+        if not self.has_change_permission(request):
+            return redirect('admin:rubros_material_changelist')
+
+        resultado = None
+        form = ListaPreciosForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid() and form.cleaned_data['segundo_plano']:
+            archivo = form.cleaned_data['archivo']
+            tarea = Tarea.encolar(
+                'importar_precios', {'tipo': form.cleaned_data['tipo'], 'simular': form.cleaned_data['simular']},
+                archivos=[(archivo.name, archivo.read())], usuario=request.user,
+            )
+            self.message_user(request, f"Importación encolada como tarea #{tarea.pk}.")
+            return redirect('admin:tareas_tarea_change', tarea.pk)
+        if request.method == 'POST' and form.is_valid():
+            filas = leer_lista_precios(form.cleaned_data['archivo'].read(), tipo=form.cleaned_data['tipo'])
+            try:
+                resultado = importar_precios(filas, aplicar=not form.cleaned_data['simular'])
+            except ValidationError as error:
+                for mensaje in error.messages:
+                    form.add_error(None, mensaje)
+            else:
+                if not form.cleaned_data['simular']:
+                    self.message_user(request, f"Precios actualizados: {len(resultado.cambiados)}. Rubros recalculados: {resultado.rubros_afectados}.")
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Importar lista de precios',
+            'form': form,
+            'resultado': resultado,
+        }
+        return TemplateResponse(request, 'admin/rubros/importar_precios.html', context)
 #     inlines = [EntradaInventarioInline, SalidaInventarioInline] 
 
 # # Re-register Material with the updated MaterialAdmin configuration
@@ -63,21 +142,23 @@ class MaterialAdmin(admin.ModelAdmin):
 
 # Registrar el modelo Herramienta
 @admin.register(Herramienta)
-class HerramientaAdmin(admin.ModelAdmin):
+class HerramientaAdmin(BusquedaIndexadaMixin, admin.ModelAdmin):
     list_display = ('nombre', 'unidad', 'costo_por_unidad',)
     search_fields = ('nombre', )
+    indice_busqueda = 'herramienta'
     list_filter = ('nombre',)
+    inlines = [PrecioHerramientaInline]
 
 # Registrar el modelo ManoObra
 @admin.register(ManoObra)
 class ManoObraAdmin(admin.ModelAdmin):
     list_display = ( 'cargo','salario_minimo', 'numero_de_contacto')
-    search_fields = ('nombre', 'cargo')
+    search_fields = ('cargo', 'salario_minimo__cargo')
     list_filter = ('salario_minimo', 'cargo')
 
 
 # Inline para RubroMaterial
-class RubroMaterialInline(admin.TabularInline):
+class RubroMaterialInline(AutocompletarRecursosMixin, admin.TabularInline):
     model = RubroMaterial
     extra = 1
     readonly_fields = ('unidad', 'costo_unitario', 'costo_total')  # Hacer 'unidad' de solo lectura
@@ -108,7 +189,7 @@ class RubroMaterialInline(admin.TabularInline):
 
 
 # Inline para RubroHerramienta
-class RubroHerramientaInline(admin.TabularInline):
+class RubroHerramientaInline(AutocompletarRecursosMixin, admin.TabularInline):
     model = RubroHerramienta
     extra = 1
     fields = ('herramienta','costo_horario','rendimiento', 'cantidad_requerida',  'subtotal',)
@@ -124,7 +205,7 @@ class RubroHerramientaInline(admin.TabularInline):
     costo_horario.short_description = 'Costo horario'
 
 # Inline para RubroManoObra
-class RubroManoObraInline(admin.TabularInline):
+class RubroManoObraInline(AutocompletarRecursosMixin, admin.TabularInline):
     model = RubroManoObra
     extra = 1
     fields = ('mano_obra', 'cantidad', 'rendimiento', 'subtotal')
@@ -138,40 +219,158 @@ class RubroManoObraInline(admin.TabularInline):
 
 # Registrar el modelo Rubro con los inlines correspondientes
 @admin.register(Rubro)
-class RubroAdmin(admin.ModelAdmin):
+class RubroAdmin(BusquedaIndexadaMixin, admin.ModelAdmin):
     list_display = ('nombre', 'codigo', 'codigo_personalizado', 'descripcion', 'unidad', 'get_costo_total_materiales', 
-    'get_costo_total_herramientas', 'get_costo_total_mano_de_obra', 'indirectos',)
-    search_fields = ('nombre', 'codigo', 'codigo_personalizado', 'get_costo_total_mano_de_obra',)
+    'get_costo_total_herramientas', 'get_costo_total_mano_de_obra', 'indirectos', 'get_costo_total',)
+    search_fields = ('nombre', 'codigo', 'codigo_personalizado', 'descripcion')
+    indice_busqueda = 'rubro'
     list_filter = ('codigo',)
     readonly_fields = ('get_costo_total_materiales', 'get_costo_total_herramientas','get_costo_total_mano_de_obra',)
     inlines = [RubroMaterialInline, RubroHerramientaInline,  RubroManoObraInline]
 
+    def get_queryset(self, request):
+        # Los costos almacenados llegan en la misma consulta de la pagina
+        return super().get_queryset(request).select_related('unidad', 'costo')
+
     # Método para mostrar el costo total de materiales en el admin
     def get_costo_total_materiales(self, obj):
         return obj.calcular_costo_total_materiales()
 
     get_costo_total_materiales.short_description = 'Costo Total Materiales'
+    get_costo_total_materiales.admin_order_field = 'costo__costo_materiales'
 
     # Método para mostrar el costo total de las herramientas en el admin
     def get_costo_total_herramientas(self, obj):
         return obj.calcular_costo_total_herramientas()
 
     get_costo_total_herramientas.short_description = 'Costo Total Herramientas'
+    get_costo_total_herramientas.admin_order_field = 'costo__costo_herramientas'
 
         # Método para mostrar el costo total de las herramientas en el admin
     def get_costo_total_mano_de_obra(self, obj):
         return obj.calcular_costo_total_mano_de_obra()
 
     get_costo_total_mano_de_obra.short_description = 'Costo Total Mano de obra'
+    get_costo_total_mano_de_obra.admin_order_field = 'costo__costo_mano_obra'
+
+    # Método para mostrar el total del APU (subtotal + indirectos)
+    def get_costo_total(self, obj):
+        return obj.calcular_costo_total()
+
+    get_costo_total.short_description = 'Total APU'
+    get_costo_total.admin_order_field = 'costo__costo_total'
+
+    def get_urls(self):
+        urls = [
+            path('costos/', self.admin_site.admin_view(self.costos_view), name='rubros_rubro_costos'),
+            path('<path:object_id>/costos/', self.admin_site.admin_view(self.costos_view), name='rubros_rubro_costos_rubro'),
+        ]
+        return urls + super().get_urls()
+
+    # Costos exactos del APU en JSON. GET devuelve los costos almacenados del rubro
+    # (o los vigentes a ?fecha=AAAA-MM-DD); POST calcula los de las lineas enviadas
+    # (aun sin guardar) para actualizar la pagina en vivo
+    def costos_view(self, request, object_id=None):
+        if not self.has_view_or_change_permission(request):
+            raise Http404
 
-    def change_view(self, request, object_id, form_url='', extra_context=None):
-        obj = self.get_object(request, object_id)
-        extra_context = extra_context or {}
+        if request.method == 'GET':
+            obj = self.get_object(request, object_id) if object_id else None
+            if obj is None:
+                raise Http404
+            if request.GET.get('fecha'):
+                fecha = parse_date(request.GET['fecha'])
+                if fecha is None:
+                    return JsonResponse({'error': 'Fecha no valida.'}, status=400)
+                costos = Rubro.objects.with_costos(fecha).filter(pk=obj.pk).values(*Rubro.CAMPOS_COSTO).get()
+            else:
+                costos = obj.obtener_costos()
+            return JsonResponse({campo: str(valor) for campo, valor in costos.items()})
+
+        try:
+            datos = json.loads(request.body)
+            indirectos = Decimal(str(datos.get('indirectos') or 0))
+            lineas = {
+                tipo: [
+                    (int(linea[campo]), Decimal(str(linea.get('cantidad') or 0)), Decimal(str(linea.get('rendimiento') or 1)))
+                    for linea in datos.get(tipo, [])
+                ]
+                for tipo, campo in (('materiales', 'material'), ('herramientas', 'herramienta'), ('mano_obra', 'mano_obra'))
+            }
+            if any(rendimiento == 0 for filas in lineas.values() for _, _, rendimiento in filas):
+                return JsonResponse({'error': 'El rendimiento no puede ser cero.'}, status=400)
+        except (ValueError, TypeError, KeyError, InvalidOperation, AttributeError):
+            return JsonResponse({'error': 'Datos no validos.'}, status=400)
+
+        # Un solo query por tipo de recurso para los precios vigentes
+        precios = {
+            'materiales': dict(Material.objects.filter(pk__in=[pk for pk, _, _ in lineas['materiales']])
+                               .values_list('pk', 'costo_por_unidad')),
+            'herramientas': dict(Herramienta.objects.filter(pk__in=[pk for pk, _, _ in lineas['herramientas']])
+                                 .values_list('pk', 'costo_por_unidad')),
+            'mano_obra': dict(ManoObra.objects.filter(pk__in=[pk for pk, _, _ in lineas['mano_obra']])
+                              .values_list('pk', 'salario_minimo__salario_horario_minimo')),
+        }
+        costos, costos_lineas = calcular_costos_apu(indirectos, *(
+            [(precios[tipo].get(pk) or Decimal('0'), cantidad, rendimiento) for pk, cantidad, rendimiento in lineas[tipo]]
+            for tipo in ('materiales', 'herramientas', 'mano_obra')
+        ))
+        respuesta = {campo: str(valor) for campo, valor in costos.items()}
+        respuesta['lineas'] = {tipo: [str(costo) for costo in valores] for tipo, valores in costos_lineas.items()}
+        return JsonResponse(respuesta)
+
+    def render_change_form(self, request, context, add=False, change=False, form_url='', obj=None):
         if obj:
-            extra_context['total_costo_materiales'] = obj.calcular_costo_total_materiales()
-            extra_context['total_costo_herramientas'] = obj.calcular_costo_total_herramientas()
-            extra_context['total_costo_mano_obra'] = obj.calcular_costo_total_mano_de_obra()
-        return super().change_view(request, object_id, form_url, extra_context=extra_context)
+            # Se reutiliza el objeto que ya cargo change_view (con sus costos almacenados)
+            context['total_costo_materiales'] = obj.calcular_costo_total_materiales()
+            context['total_costo_herramientas'] = obj.calcular_costo_total_herramientas()
+            context['total_costo_mano_obra'] = obj.calcular_costo_total_mano_de_obra()
+        return super().render_change_form(request, context, add, change, form_url, obj)
 
     class Media:
-        js = ('js/rubromateriales.js', 'js/rubroherramientas.js', 'js/rubromanodeobra.js', 'js/costo_total_rubro.js')
\ No newline at end of file
+        js = ('js/rubromateriales.js', 'js/rubroherramientas.js', 'js/rubromanodeobra.js', 'js/costo_total_rubro.js')
+
+
+# Inline para las lineas del presupuesto
+class RubroPresupuestoInline(admin.TabularInline):
+    model = RubroPresupuesto
+    extra = 1
+    fields = ('capitulo', 'rubro', 'cantidad', 'precio_unitario', 'total')
+    readonly_fields = ('precio_unitario', 'total')
+    raw_id_fields = ('rubro',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('rubro').order_by('capitulo', 'pk')
+
+
+@admin.action(description='Actualizar precios unitarios desde los rubros')
+def actualizar_precios_presupuesto(modeladmin, request, queryset):
+    for presupuesto in queryset:
+        presupuesto.actualizar_precios()
+    modeladmin.message_user(request, f"Precios actualizados en {queryset.count()} presupuesto(s).")
+
+
+# Registrar el modelo Presupuesto con sus lineas
+@admin.register(Presupuesto)
+class PresupuestoAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'cliente', 'fecha', 'total')
+    search_fields = ('nombre', 'cliente')
+    list_filter = ('fecha',)
+    readonly_fields = ('total', 'get_totales_por_capitulo')
+    inlines = [RubroPresupuestoInline]
+    actions = [actualizar_precios_presupuesto]
+
+    # Subtotales por capitulo calculados con una sola consulta agrupada
+    def get_totales_por_capitulo(self, obj):
+        if not obj.pk:
+            return ""
+        return format_html(
+            '<table><thead><tr><th>Capítulo</th><th>Rubros</th><th>Subtotal</th></tr></thead><tbody>{}</tbody></table>',
+            format_html_join(
+                '', '<tr><td>{}</td><td>{}</td><td>{}</td></tr>',
+                ((capitulo['capitulo'] or 'Sin capítulo', capitulo['lineas'], capitulo['total'])
+                 for capitulo in obj.totales_por_capitulo()),
+            ),
+        )
+
+    get_totales_por_capitulo.short_description = 'Totales por capítulo'
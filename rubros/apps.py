@@ -1,6 +1,25 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def crear_indices_busqueda(sender, using, **kwargs):
+    # Las tablas FTS5 no son modelos: se crean (y se llenan) despues de migrar
+    from .busqueda import crear_indices, reconstruir
+    for indice in crear_indices(using):
+        reconstruir(indice, using)
+
+
+def registrar_precios_iniciales(sender, using, **kwargs):
+    # Los precios del catalogo sin historial quedan como vigentes desde siempre
+    from .models import PrecioHerramienta, PrecioMaterial, PrecioSalario
+    for historial in (PrecioMaterial, PrecioHerramienta, PrecioSalario):
+        historial.registrar_iniciales(using=using)
 
 
 class RubrosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rubros'
+
+    def ready(self):
+        post_migrate.connect(crear_indices_busqueda, sender=self)
+        post_migrate.connect(registrar_precios_iniciales, sender=self)
@@ -0,0 +1,148 @@
+"""
+Autocompletado paginado para elegir materiales, herramientas y mano de obra.
+
+Los formularios del admin muestran un select2 que consulta
+AutocompletarRecursoView en lugar de cargar todo el catalogo como
+opciones. La busqueda usa get_search_results del admin del recurso (el
+indice FTS5 de busqueda.py para materiales y herramientas) y la etiqueta
+"nombre (unidad)" sale de una sola consulta con select_related.
+"""
+from django.contrib.admin.views.autocomplete import AutocompleteJsonView
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.forms.models import BaseInlineFormSet
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.urls import reverse
+
+from .models import Herramienta, ManoObra, Material, normalizar_clave
+
+# modelo -> relaciones que necesita la etiqueta
+RECURSOS = {
+    Material: ('unidad',),
+    Herramienta: ('unidad',),
+    ManoObra: ('salario_minimo',),
+}
+
+TIEMPO_CACHE = 30  # segundos
+
+
+def etiqueta_recurso(objeto):
+    if isinstance(objeto, ManoObra):
+        if objeto.salario_minimo is None:
+            return str(objeto)
+        return f"{objeto.salario_minimo.cargo} ({objeto.salario_minimo.salario_horario_minimo}/h)"
+    return f"{objeto.nombre} ({objeto.unidad.abreviatura if objeto.unidad else 'N/A'})"
+
+
+class AutocompletarRecursoView(AutocompleteJsonView):
+    """
+    AutocompleteJsonView con etiquetas "nombre (unidad)" y respuestas en
+    cache por unos segundos: al escribir, select2 repite las mismas
+    busquedas. El permiso se verifica antes de usar la cache.
+    """
+    paginate_by = 20
+
+    def get(self, request, *args, **kwargs):
+        self.term, self.model_admin, self.source_field, to_field_name = self.process_request(request)
+        if not self.has_perm(request):
+            raise PermissionDenied
+
+        clave = 'autocompletar:{}:{}:{}:{}'.format(
+            self.model_admin.model._meta.label_lower,
+            to_field_name,
+            normalizar_clave(self.term),
+            request.GET.get(self.page_kwarg, 1),
+        )
+        contenido = cache.get(clave)
+        if contenido is None:
+            contenido = super().get(request, *args, **kwargs).content
+            cache.set(clave, contenido, TIEMPO_CACHE)
+        return HttpResponse(contenido, content_type='application/json')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        relaciones = RECURSOS.get(self.model_admin.model)
+        if relaciones:
+            queryset = queryset.select_related(*relaciones)
+        # La paginacion necesita un orden estable (ManoObra no define ordering)
+        return queryset if queryset.ordered else queryset.order_by('pk')
+
+    def serialize_result(self, obj, to_field_name):
+        if type(obj) in RECURSOS:
+            return {'id': str(getattr(obj, to_field_name)), 'text': etiqueta_recurso(obj)}
+        return super().serialize_result(obj, to_field_name)
+
+
+class RecursoAutocompleteSelect(AutocompleteSelect):
+    # pk -> etiqueta de los recursos ya elegidos, precargadas por el formset
+    etiquetas = None
+
+    def get_url(self):
+        return reverse('autocompletar_recurso')
+
+    def optgroups(self, name, value, attr=None):
+        # AutocompleteSelect consulta la base por cada fila para mostrar la opcion
+        # elegida; con las etiquetas precargadas no hace falta
+        etiquetas = self.etiquetas or {}
+        elegidos = [str(valor) for valor in value if str(valor) not in self.choices.field.empty_values]
+        if not elegidos or any(valor not in etiquetas for valor in elegidos):
+            return super().optgroups(name, value, attr)
+        opciones = []
+        if not self.is_required:
+            opciones.append(self.create_option(name, '', '', False, 0))
+        for valor in elegidos:
+            opciones.append(self.create_option(name, valor, etiquetas[valor], True, len(opciones)))
+        return [(None, opciones, 0)]
+
+
+class EtiquetasRecursoFormSet(BaseInlineFormSet):
+    """
+    Toma las etiquetas de los recursos de las lineas existentes de su propio
+    queryset (con select_related) y las comparte con los widgets de todas
+    las filas, para que el numero de consultas no crezca con las lineas.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        widgets = {}
+        for nombre, campo in self.form.base_fields.items():
+            widget = getattr(campo.widget, 'widget', campo.widget)  # RelatedFieldWidgetWrapper
+            if isinstance(widget, RecursoAutocompleteSelect):
+                widgets[nombre] = widget
+        for widget in widgets.values():
+            widget.etiquetas = {}
+        for linea in self.get_queryset():
+            for nombre, widget in widgets.items():
+                recurso = getattr(linea, nombre)
+                if recurso is not None:  # llaves foraneas opcionales
+                    widget.etiquetas[str(recurso.pk)] = etiqueta_recurso(recurso)
+
+
+class AutocompletarRecursosMixin:
+    """
+    Para ModelAdmin e inlines: las llaves foraneas a materiales,
+    herramientas y mano de obra usan el autocompletado paginado, y el
+    queryset trae esos recursos con select_related.
+    """
+    formset = EtiquetasRecursoFormSet  # solo lo usan los inlines
+
+    def get_queryset(self, request):
+        relaciones = [
+            f'{campo.name}__{relacion}'
+            for campo in self.model._meta.get_fields()
+            if campo.many_to_one and campo.related_model in RECURSOS
+            for relacion in RECURSOS[campo.related_model]
+        ]
+        return super().get_queryset(request).select_related(*relaciones)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        modelo = db_field.related_model
+        if modelo in RECURSOS and 'widget' not in kwargs:
+            kwargs['widget'] = RecursoAutocompleteSelect(db_field, self.admin_site, using=kwargs.get('using'))
+            kwargs.setdefault('queryset', modelo._default_manager.select_related(*RECURSOS[modelo]))
+            campo = super().formfield_for_foreignkey(db_field, request, **kwargs)
+            if campo is not None:
+                campo.label_from_instance = etiqueta_recurso
+            return campo
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
@@ -0,0 +1,178 @@
+"""
+Indice de busqueda de texto completo del catalogo (SQLite FTS5).
+
+Cada indice es una tabla virtual FTS5 cuyo rowid es la clave primaria del
+registro y cuya unica columna es el texto normalizado (sin tildes y en
+minusculas, como normalizar_clave) de los campos buscables. Las tablas se
+crean despues de migrar y se mantienen al dia con las señales de models.py.
+
+En otras bases de datos, o si la tabla aun no existe, buscar() devuelve
+None y el admin vuelve a la busqueda con icontains.
+"""
+from functools import reduce
+from operator import or_
+
+from django.apps import apps
+from django.db import connection, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# indice -> (modelo, campos indexados)
+INDICES = {
+    'material': ('rubros.Material', ('nombre',)),
+    'herramienta': ('rubros.Herramienta', ('nombre',)),
+    'rubro': ('rubros.Rubro', ('codigo', 'codigo_personalizado', 'nombre', 'descripcion')),
+}
+
+TAMANO_LOTE = 2000
+
+_disponibles = {}  # alias de la base de datos -> nombres de las tablas creadas
+
+
+def _tabla(indice):
+    return f'rubros_busqueda_{indice}'
+
+
+def _texto(valores):
+    from .models import normalizar_clave
+    return ' '.join(normalizar_clave(str(valor)) for valor in valores if valor)
+
+
+def _existentes(conexion):
+    if conexion.vendor != 'sqlite':
+        return set()
+    existentes = _disponibles.setdefault(conexion.alias, set())
+    if len(existentes) < len(INDICES):
+        # Solo se recuerdan las tablas encontradas: las que faltan se buscan de
+        # nuevo, pueden haberse creado despues (al migrar o con reconstruir_busqueda)
+        tablas = set(conexion.introspection.table_names())
+        existentes.update(indice for indice in INDICES if _tabla(indice) in tablas)
+    return existentes
+
+
+def disponible(indice, conexion=connection):
+    return indice in _existentes(conexion)
+
+
+def crear_indices(using='default'):
+    """Crea las tablas FTS5 que falten y devuelve los indices creados."""
+    conexion = connections[using]
+    if conexion.vendor != 'sqlite':
+        return []
+    _disponibles.pop(using, None)
+    creados = [indice for indice in INDICES if not disponible(indice, conexion)]
+    with conexion.cursor() as cursor:
+        for indice in creados:
+            # remove_diacritics 2 tambien quita tildes de caracteres compuestos;
+            # el indice de prefijos acelera las busquedas mientras se escribe
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {_tabla(indice)} '
+                f'USING fts5(texto, tokenize="unicode61 remove_diacritics 2", prefix=\'2 3\')'
+            )
+    _existentes(conexion).update(creados)
+    return creados
+
+
+def eliminar(indice, pks):
+    if not disponible(indice) or not pks:
+        return
+    pks = list(pks)
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(pks), TAMANO_LOTE):
+            lote = pks[inicio:inicio + TAMANO_LOTE]
+            cursor.execute(
+                f'DELETE FROM {_tabla(indice)} WHERE rowid IN ({", ".join(["%s"] * len(lote))})', lote
+            )
+
+
+def indexar(indice, objetos):
+    """Agrega o reemplaza en el indice los registros dados."""
+    if not disponible(indice):
+        return
+    campos = INDICES[indice][1]
+    filas = [(objeto.pk, _texto(getattr(objeto, campo) for campo in campos)) for objeto in objetos]
+    eliminar(indice, [pk for pk, _ in filas])
+    with connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {_tabla(indice)} (rowid, texto) VALUES (%s, %s)', filas)
+
+
+def reconstruir(indice, using='default'):
+    """Vuelve a crear el indice completo a partir de la tabla del modelo."""
+    conexion = connections[using]
+    if conexion.vendor != 'sqlite':
+        return 0
+    with conexion.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {_tabla(indice)}')
+    _existentes(conexion).discard(indice)
+    crear_indices(using)
+
+    etiqueta, campos = INDICES[indice]
+    modelo = apps.get_model(etiqueta)
+    total = 0
+    filas = []
+    with conexion.cursor() as cursor:
+        for pk, *valores in modelo.objects.using(using).order_by().values_list('pk', *campos).iterator(chunk_size=TAMANO_LOTE):
+            filas.append((pk, _texto(valores)))
+            if len(filas) == TAMANO_LOTE:
+                cursor.executemany(f'INSERT INTO {_tabla(indice)} (rowid, texto) VALUES (%s, %s)', filas)
+                total += len(filas)
+                filas = []
+        cursor.executemany(f'INSERT INTO {_tabla(indice)} (rowid, texto) VALUES (%s, %s)', filas)
+    return total + len(filas)
+
+
+def consulta_fts(texto):
+    """
+    Convierte lo escrito por el usuario en una consulta FTS5: cada palabra
+    normalizada como prefijo y todas obligatorias ("cem port" -> cemento portland).
+    """
+    from .models import normalizar_clave
+    palabras = normalizar_clave(texto).split()
+    return ' '.join('"{}"*'.format(palabra.replace('"', '""')) for palabra in palabras)
+
+
+def filtro(indice, texto):
+    """
+    Subconsulta con las claves primarias que coinciden, para usar como
+    filter(pk__in=...). None si el indice no esta disponible.
+    """
+    consulta = consulta_fts(texto)
+    if not disponible(indice) or not consulta:
+        return None
+    tabla = _tabla(indice)
+    return RawSQL(f'SELECT rowid FROM {tabla} WHERE {tabla} MATCH %s', [consulta])
+
+
+def buscar(indice, texto, limite=50):
+    """Claves primarias que coinciden, ordenadas por relevancia (bm25)."""
+    consulta = consulta_fts(texto)
+    if not disponible(indice) or not consulta:
+        return None
+    tabla = _tabla(indice)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT rowid FROM {tabla} WHERE {tabla} MATCH %s ORDER BY rank LIMIT %s', [consulta, limite])
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+class BusquedaIndexadaMixin:
+    """
+    Busqueda del admin sobre el indice FTS5. indice_busqueda es el indice a
+    consultar y ruta_busqueda el campo que lleva a su clave primaria (por
+    ejemplo 'material' desde una entrada de inventario). Los campos de
+    campos_busqueda_adicionales se buscan ademas con icontains.
+    """
+    indice_busqueda = None
+    ruta_busqueda = 'pk'
+    campos_busqueda_adicionales = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        coincidencias = filtro(self.indice_busqueda, search_term) if search_term else None
+        if coincidencias is None:
+            return super().get_search_results(request, queryset, search_term)
+
+        condicion = Q(**{f'{self.ruta_busqueda}__in': coincidencias})
+        if self.campos_busqueda_adicionales:
+            condicion |= reduce(or_, (
+                Q(**{f'{campo}__icontains': search_term.strip()}) for campo in self.campos_busqueda_adicionales
+            ))
+        return queryset.filter(condicion), False
@@ -0,0 +1,242 @@
+"""
+Importacion masiva de librerias de APU desde CSV o XLSX.
+
+Cada fila del archivo es una linea de un APU:
+
+    codigo, rubro, unidad, indirectos, descripcion, tipo, recurso, cantidad, rendimiento
+
+Las columnas del rubro (rubro, unidad, indirectos, descripcion) se toman de
+la primera fila de cada codigo. tipo es material, herramienta o mano_obra;
+una fila sin tipo solo crea el rubro.
+"""
+import csv
+import io
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from . import busqueda
+from .models import (
+    CostoRubro,
+    Herramienta,
+    ManoObra,
+    Material,
+    Rubro,
+    RubroHerramienta,
+    RubroManoObra,
+    RubroMaterial,
+    Unidad,
+    normalizar_clave,
+)
+
+TIPOS = ('material', 'herramienta', 'mano_obra')
+# Las hojas de calculo exportan CSV en UTF-8 o, en Windows, en cp1252;
+# latin-1 acepta cualquier byte
+CODIFICACIONES = ('utf-8-sig', 'cp1252', 'latin-1')
+
+
+def decodificar(contenido):
+    """Texto de un CSV subido, probando las codificaciones usuales."""
+    for codificacion in CODIFICACIONES:
+        try:
+            return contenido.decode(codificacion)
+        except UnicodeDecodeError:
+            continue
+
+
+@dataclass
+class ResultadoImportacion:
+    rubros_creados: int = 0
+    rubros_reemplazados: int = 0
+    lineas_creadas: int = 0
+    omitidos: list = field(default_factory=list)  # codigos existentes que no se reemplazan
+    errores: list = field(default_factory=list)   # (fila, mensaje)
+
+
+def leer_filas(archivo, nombre, hoja=None):
+    """
+    Devuelve las filas del archivo como diccionarios con los encabezados
+    normalizados. Los XLSX requieren openpyxl.
+    """
+    if nombre.lower().endswith('.xlsx'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportError("Para importar archivos XLSX instale openpyxl.")
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+        filas = (libro[hoja] if hoja else libro.active).iter_rows(values_only=True)
+        encabezados = [normalizar_clave(str(valor or '')).replace(' ', '_') for valor in next(filas, [])]
+        for fila in filas:
+            yield {encabezado: ('' if valor is None else str(valor)) for encabezado, valor in zip(encabezados, fila)}
+        libro.close()
+        return
+
+    if isinstance(archivo, bytes):
+        archivo = io.StringIO(decodificar(archivo))
+    muestra = archivo.read(4096)
+    archivo.seek(0)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=',;')
+    except csv.Error:
+        dialecto = csv.excel
+    lector = csv.DictReader(archivo, dialect=dialecto)
+    lector.fieldnames = [normalizar_clave(nombre).replace(' ', '_') for nombre in lector.fieldnames or []]
+    yield from lector
+
+
+def _decimal(texto, defecto=None):
+    texto = (texto or '').strip()
+    if not texto:
+        if defecto is None:
+            raise InvalidOperation
+        return defecto
+    if ',' in texto and '.' not in texto:
+        texto = texto.replace(',', '.')
+    return Decimal(texto).quantize(Decimal('0.01'))
+
+
+class ImportadorAPU:
+    """
+    Resuelve unidades y recursos con mapas nombre -> id construidos una sola
+    vez por importacion y escribe con bulk_create en transacciones por lotes.
+    """
+
+    def __init__(self, tamano_lote=500, reemplazar=False):
+        self.tamano_lote = tamano_lote
+        self.reemplazar = reemplazar
+
+        self.unidades = {}
+        for pk, clave, clave_abreviatura in Unidad.objects.values_list('pk', 'clave', 'clave_abreviatura'):
+            if clave_abreviatura:
+                self.unidades[clave_abreviatura] = pk
+            if clave:
+                self.unidades[clave] = pk
+        self.recursos = {
+            'material': dict((clave, pk) for pk, clave in Material.objects.filter(clave__isnull=False).values_list('pk', 'clave')),
+            'herramienta': dict((clave, pk) for pk, clave in Herramienta.objects.filter(clave__isnull=False).values_list('pk', 'clave')),
+            'mano_obra': {},
+        }
+        # La mano de obra se reconoce por su cargo o por el cargo de su salario minimo
+        for pk, clave, clave_salario in ManoObra.objects.order_by('-pk').values_list('pk', 'clave', 'salario_minimo__clave'):
+            for valor in (clave_salario, clave):
+                if valor:
+                    self.recursos['mano_obra'][valor] = pk
+        self.existentes = dict(Rubro.objects.values_list('codigo', 'pk'))
+
+    def _agrupar(self, filas, resultado):
+        rubros = {}
+        for numero, fila in enumerate(filas, start=2):
+            codigo = (fila.get('codigo') or '').strip()
+            if not codigo:
+                resultado.errores.append((numero, "Falta el codigo del rubro."))
+                continue
+
+            rubro = rubros.get(codigo)
+            if rubro is None:
+                try:
+                    indirectos = _decimal(fila.get('indirectos'), Decimal('20.00'))
+                except InvalidOperation:
+                    resultado.errores.append((numero, f"Indirectos '{fila.get('indirectos')}' no validos."))
+                    indirectos = None
+                unidad = normalizar_clave(fila.get('unidad'))
+                if unidad and unidad not in self.unidades:
+                    resultado.errores.append((numero, f"No existe la unidad '{fila.get('unidad')}'."))
+                rubro = rubros[codigo] = {
+                    'codigo': codigo,
+                    'nombre': (fila.get('rubro') or fila.get('nombre') or '').strip() or codigo,
+                    'descripcion': (fila.get('descripcion') or '').strip() or None,
+                    'unidad_id': self.unidades.get(unidad),
+                    'indirectos': indirectos,
+                    'lineas': [],
+                    'valido': indirectos is not None and (not unidad or unidad in self.unidades),
+                }
+
+            tipo = normalizar_clave(fila.get('tipo')).replace(' ', '_')
+            if not tipo:
+                continue
+            if tipo not in TIPOS:
+                resultado.errores.append((numero, f"Tipo '{fila.get('tipo')}' no valido."))
+                rubro['valido'] = False
+                continue
+            recurso = self.recursos[tipo].get(normalizar_clave(fila.get('recurso')))
+            if recurso is None:
+                resultado.errores.append((numero, f"No existe {tipo.replace('_', ' ')} '{fila.get('recurso')}'."))
+                rubro['valido'] = False
+                continue
+            try:
+                cantidad = _decimal(fila.get('cantidad'))
+                rendimiento = _decimal(fila.get('rendimiento'), Decimal('1.00'))
+                if rendimiento == 0:
+                    raise InvalidOperation
+            except InvalidOperation:
+                resultado.errores.append((numero, "Cantidad o rendimiento no validos."))
+                rubro['valido'] = False
+                continue
+            rubro['lineas'].append((tipo, recurso, cantidad, rendimiento))
+        return rubros
+
+    def _escribir_lote(self, lote, resultado):
+        with transaction.atomic():
+            reemplazados = [
+                Rubro(pk=self.existentes[rubro['codigo']], **{campo: rubro[campo] for campo in ('codigo', 'nombre', 'descripcion', 'unidad_id', 'indirectos')})
+                for rubro in lote if rubro['codigo'] in self.existentes
+            ]
+            if reemplazados:
+                for modelo in (RubroMaterial, RubroHerramienta, RubroManoObra):
+                    modelo.objects.filter(rubro__in=reemplazados).delete()
+                Rubro.objects.bulk_update(reemplazados, ['nombre', 'descripcion', 'unidad_id', 'indirectos'])
+
+            nuevos = Rubro.objects.bulk_create([
+                Rubro(**{campo: rubro[campo] for campo in ('codigo', 'nombre', 'descripcion', 'unidad_id', 'indirectos')})
+                for rubro in lote if rubro['codigo'] not in self.existentes
+            ])
+            for rubro in nuevos:
+                self.existentes[rubro.codigo] = rubro.pk
+            # bulk_create y bulk_update no disparan las señales del indice de busqueda
+            busqueda.indexar('rubro', reemplazados + nuevos)
+
+            lineas = {RubroMaterial: [], RubroHerramienta: [], RubroManoObra: []}
+            for rubro in lote:
+                rubro_id = self.existentes[rubro['codigo']]
+                for tipo, recurso, cantidad, rendimiento in rubro['lineas']:
+                    if tipo == 'material':
+                        lineas[RubroMaterial].append(RubroMaterial(rubro_id=rubro_id, material_id=recurso, cantidad_requerida=cantidad))
+                    elif tipo == 'herramienta':
+                        lineas[RubroHerramienta].append(RubroHerramienta(
+                            rubro_id=rubro_id, herramienta_id=recurso, cantidad_requerida=cantidad, rendimiento=rendimiento))
+                    else:
+                        lineas[RubroManoObra].append(RubroManoObra(
+                            rubro_id=rubro_id, mano_obra_id=recurso, cantidad=cantidad, rendimiento=rendimiento))
+            for modelo, objetos in lineas.items():
+                modelo.objects.bulk_create(objetos, batch_size=1000)
+                resultado.lineas_creadas += len(objetos)
+
+            # Costos almacenados de todo el lote en un solo recalculo
+            CostoRubro.recalcular([self.existentes[rubro['codigo']] for rubro in lote])
+
+        resultado.rubros_creados += len(nuevos)
+        resultado.rubros_reemplazados += len(reemplazados)
+
+    def importar(self, filas, aplicar=True):
+        resultado = ResultadoImportacion()
+        rubros = self._agrupar(filas, resultado)
+
+        pendientes = []
+        for codigo, rubro in rubros.items():
+            if not rubro['valido']:
+                continue
+            if codigo in self.existentes and not self.reemplazar:
+                resultado.omitidos.append(codigo)
+                continue
+            pendientes.append(rubro)
+
+        if not aplicar:
+            resultado.rubros_creados = sum(1 for rubro in pendientes if rubro['codigo'] not in self.existentes)
+            resultado.rubros_reemplazados = len(pendientes) - resultado.rubros_creados
+            resultado.lineas_creadas = sum(len(rubro['lineas']) for rubro in pendientes)
+            return resultado
+
+        for inicio in range(0, len(pendientes), self.tamano_lote):
+            self._escribir_lote(pendientes[inicio:inicio + self.tamano_lote], resultado)
+        return resultado
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from rubros.models import Herramienta, ManoObra, Material, SalarioMinimo, Unidad, normalizar_clave
+
+# modelo -> [(campo de la clave, campo del nombre)]
+CLAVES = {
+    SalarioMinimo: [('clave', 'cargo')],
+    Unidad: [('clave', 'nombre'), ('clave_abreviatura', 'abreviatura')],
+    Material: [('clave', 'nombre')],
+    Herramienta: [('clave', 'nombre')],
+    ManoObra: [('clave', 'cargo')],
+}
+
+
+class Command(BaseCommand):
+    help = "Calcula las claves normalizadas del catalogo y reporta los nombres duplicados que impiden indexarlas."
+
+    def handle(self, *args, **options):
+        for modelo, campos in CLAVES.items():
+            for campo_clave, campo_nombre in campos:
+                registros = {}
+                for pk, nombre, clave in modelo.objects.values_list('pk', campo_nombre, campo_clave).iterator():
+                    registros.setdefault(normalizar_clave(nombre) or None, []).append((pk, nombre, clave))
+
+                cambios = []
+                for clave, grupo in registros.items():
+                    if clave is not None and len(grupo) > 1:
+                        # Duplicados: se dejan sin clave hasta que se unifiquen a mano
+                        nombres = ", ".join(f"{nombre} (id {pk})" for pk, nombre, _ in grupo)
+                        self.stdout.write(self.style.WARNING(
+                            f"{modelo._meta.verbose_name_plural}: nombres duplicados en '{campo_nombre}': {nombres}"
+                        ))
+                        clave = None
+                    cambios.extend(
+                        modelo(pk=pk, **{campo_clave: clave})
+                        for pk, _, actual in grupo if actual != clave
+                    )
+
+                with transaction.atomic():
+                    # Primero se liberan las claves que cambian para no chocar con el indice unico
+                    modelo.objects.filter(pk__in=[obj.pk for obj in cambios]).update(**{campo_clave: None})
+                    modelo.objects.bulk_update(cambios, [campo_clave], batch_size=500)
+                self.stdout.write(f"{modelo._meta.verbose_name_plural} ({campo_clave}): {len(cambios)} actualizadas.")
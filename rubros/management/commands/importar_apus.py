@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rubros.importacion import ImportadorAPU, leer_filas
+
+
+class Command(BaseCommand):
+    help = "Importa una libreria de APU (rubros con sus materiales, herramientas y mano de obra) desde CSV o XLSX."
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Archivo .csv o .xlsx con una fila por linea de APU.")
+        parser.add_argument('--hoja', help="Hoja del libro XLSX (por defecto la activa).")
+        parser.add_argument('--lote', type=int, default=500, help="Rubros por transaccion.")
+        parser.add_argument('--reemplazar', action='store_true',
+                            help="Reemplaza las lineas de los rubros cuyo codigo ya existe.")
+        parser.add_argument('--simular', action='store_true', help="Valida el archivo sin escribir nada.")
+
+    def handle(self, *args, **options):
+        nombre = options['archivo']
+        try:
+            archivo = open(nombre, 'rb')
+        except OSError as error:
+            raise CommandError(error)
+
+        with archivo:
+            # Los CSV se leen como bytes para reconocer su codificacion (UTF-8 o cp1252)
+            contenido = archivo if nombre.lower().endswith('.xlsx') else archivo.read()
+            importador = ImportadorAPU(tamano_lote=options['lote'], reemplazar=options['reemplazar'])
+            try:
+                resultado = importador.importar(leer_filas(contenido, nombre, hoja=options['hoja']), aplicar=not options['simular'])
+            except ImportError as error:
+                raise CommandError(error)
+
+        for fila, mensaje in resultado.errores:
+            self.stdout.write(self.style.WARNING(f"Fila {fila}: {mensaje}"))
+        if resultado.omitidos:
+            self.stdout.write(f"Rubros existentes omitidos (use --reemplazar): {len(resultado.omitidos)}.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Rubros creados: {resultado.rubros_creados}. Reemplazados: {resultado.rubros_reemplazados}. "
+            f"Lineas: {resultado.lineas_creadas}. Errores: {len(resultado.errores)}."
+            + (" (simulacion)" if options['simular'] else "")
+        ))
@@ -0,0 +1,41 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from rubros.precios import RECURSOS, importar_precios, leer_lista_precios
+
+
+class Command(BaseCommand):
+    help = "Actualiza en lote los precios de materiales, herramientas y salarios desde una lista en CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="CSV con columnas nombre, precio y opcionalmente tipo.")
+        parser.add_argument('--tipo', choices=list(RECURSOS),
+                            help="Tipo de recurso para todas las filas si el CSV no trae la columna tipo.")
+        parser.add_argument('--simular', action='store_true',
+                            help="Valida y reporta los cambios sin aplicarlos.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                filas = leer_lista_precios(archivo.read(), tipo=options['tipo'])
+        except OSError as error:
+            raise CommandError(error)
+
+        try:
+            resultado = importar_precios(filas, aplicar=not options['simular'])
+        except ValidationError as error:
+            raise CommandError("La lista de precios tiene errores:\n" + "\n".join(error.messages))
+
+        for tipo, nombre, anterior, nuevo in resultado.cambiados:
+            self.stdout.write(f"{tipo}: {nombre}: {anterior} -> {nuevo}")
+        for fila, tipo, nombre in resultado.no_encontrados:
+            self.stdout.write(self.style.WARNING(f"Fila {fila}: no se encontro {tipo} '{nombre}'."))
+
+        self.stdout.write(
+            f"Filas: {len(filas)}. Cambiados: {len(resultado.cambiados)}. "
+            f"Sin cambios: {resultado.sin_cambios}. No encontrados: {len(resultado.no_encontrados)}."
+        )
+        if options['simular']:
+            self.stdout.write("Simulacion: no se aplico ningun cambio.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Rubros recalculados: {resultado.rubros_afectados}."))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rubros.models import CostoRubro, Rubro
+
+
+class Command(BaseCommand):
+    help = "Verifica los costos almacenados de los rubros contra el calculo en SQL y reconstruye los que difieren."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verificar', action='store_true',
+                            help="Solo reporta las diferencias, sin corregirlas.")
+        parser.add_argument('--todos', action='store_true',
+                            help="Reconstruye todos los costos aunque coincidan.")
+
+    def handle(self, *args, **options):
+        ids = list(Rubro.objects.order_by('pk').values_list('pk', flat=True))
+        diferentes = []
+
+        for inicio in range(0, len(ids), CostoRubro.TAMANO_LOTE):
+            lote = ids[inicio:inicio + CostoRubro.TAMANO_LOTE]
+            almacenados = {
+                fila['rubro_id']: fila
+                for fila in CostoRubro.objects.filter(rubro_id__in=lote).values('rubro_id', 'desactualizado', *Rubro.CAMPOS_COSTO)
+            }
+            for fila in Rubro.objects.with_costos().filter(pk__in=lote).values('pk', *Rubro.CAMPOS_COSTO):
+                costo = almacenados.get(fila['pk'])
+                if (
+                    costo is None
+                    or costo['desactualizado']
+                    or any(costo[campo] != fila[campo] for campo in Rubro.CAMPOS_COSTO)
+                ):
+                    diferentes.append(fila['pk'])
+
+        self.stdout.write(f"Rubros revisados: {len(ids)}. Costos faltantes o diferentes: {len(diferentes)}.")
+
+        if options['verificar']:
+            if diferentes:
+                raise CommandError(f"Hay {len(diferentes)} costos de rubros desactualizados.")
+            return
+
+        reconstruidos = CostoRubro.recalcular(ids if options['todos'] else diferentes)
+        self.stdout.write(self.style.SUCCESS(f"Costos reconstruidos: {reconstruidos}."))
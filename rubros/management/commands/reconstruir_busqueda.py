@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from rubros.busqueda import INDICES, reconstruir
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el indice de busqueda de texto completo (FTS5) del catalogo."
+
+    def add_arguments(self, parser):
+        parser.add_argument('indices', nargs='*', help=f"Indices a reconstruir: {', '.join(INDICES)} (por defecto todos).")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("El indice de busqueda requiere SQLite con FTS5.")
+        desconocidos = set(options['indices']) - set(INDICES)
+        if desconocidos:
+            raise CommandError(f"Indices desconocidos: {', '.join(sorted(desconocidos))}.")
+        for indice in options['indices'] or INDICES:
+            with transaction.atomic():
+                total = reconstruir(indice)
+            self.stdout.write(self.style.SUCCESS(f"{indice}: {total} registros indexados."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from rubros.models import PrecioHerramienta, PrecioMaterial, PrecioSalario
+
+
+class Command(BaseCommand):
+    help = ("Registra en el historial el precio actual de los materiales, herramientas y salarios que aun no "
+            "tienen historial, vigente desde siempre (tambien se hace al migrar).")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for historial in (PrecioMaterial, PrecioHerramienta, PrecioSalario):
+                registrados = historial.registrar_iniciales()
+                self.stdout.write(f"{historial._meta.verbose_name_plural}: {registrados} precios iniciales.")
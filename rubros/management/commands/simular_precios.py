@@ -0,0 +1,87 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rubros.models import Presupuesto, Rubro
+from rubros.simulacion import SimuladorPrecios
+
+
+def _variacion(texto):
+    # "Acero=12" -> ('Acero', 12.0)
+    nombre, _, porcentaje = texto.rpartition('=')
+    if not nombre:
+        raise ValueError(texto)
+    return nombre, float(porcentaje)
+
+
+class Command(BaseCommand):
+    help = "Simula escenarios de variacion de precios sobre todos los rubros y presupuestos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escenarios', help="Archivo JSON con una lista de escenarios.")
+        parser.add_argument('--materiales', type=float, default=0, help="Variacion (%%) de todos los materiales.")
+        parser.add_argument('--herramientas', type=float, default=0, help="Variacion (%%) de todas las herramientas.")
+        parser.add_argument('--salarios', type=float, default=0, help="Variacion (%%) de todos los salarios.")
+        parser.add_argument('--material', action='append', default=[], metavar='NOMBRE=PORCENTAJE')
+        parser.add_argument('--herramienta', action='append', default=[], metavar='NOMBRE=PORCENTAJE')
+        parser.add_argument('--salario', action='append', default=[], metavar='CARGO=PORCENTAJE')
+        parser.add_argument('--top', type=int, default=10, help="Rubros con mayor variacion a mostrar por escenario.")
+        parser.add_argument('--csv', help="Archivo donde escribir el costo simulado de cada rubro.")
+
+    def handle(self, *args, **options):
+        if options['escenarios']:
+            with open(options['escenarios'], encoding='utf-8') as archivo:
+                escenarios = json.load(archivo)
+        else:
+            try:
+                escenarios = [{
+                    'materiales': options['materiales'],
+                    'herramientas': options['herramientas'],
+                    'salarios': options['salarios'],
+                    'material': dict(map(_variacion, options['material'])),
+                    'herramienta': dict(map(_variacion, options['herramienta'])),
+                    'salario': dict(map(_variacion, options['salario'])),
+                }]
+            except ValueError as error:
+                raise CommandError(f"Variacion no valida: {error}. Use NOMBRE=PORCENTAJE.")
+
+        simulador = SimuladorPrecios()
+        try:
+            resultado = simulador.simular(escenarios)
+        except KeyError as error:
+            raise CommandError(error.args[0])
+
+        nombres = dict(Rubro.objects.values_list('pk', 'nombre'))
+        presupuestos = dict(Presupuesto.objects.values_list('pk', 'nombre'))
+        deltas = resultado.deltas
+
+        for columna, escenario in enumerate(resultado.escenarios):
+            delta = deltas[:, columna]
+            self.stdout.write(self.style.MIGRATE_HEADING(escenario))
+            self.stdout.write(
+                f"  Rubros afectados: {int((delta != 0).sum())} de {len(delta)}. "
+                f"Variacion total del catalogo: {delta.sum():.2f}."
+            )
+            for fila in delta.argsort()[::-1][:options['top']]:
+                if delta[fila] == 0:
+                    break
+                self.stdout.write(
+                    f"  {nombres[int(resultado.rubros[fila])]}: {resultado.costo_base[fila]:.2f} -> "
+                    f"{resultado.costos[fila, columna]:.2f} ({delta[fila]:+.2f})"
+                )
+            for presupuesto, (base, totales) in resultado.presupuestos.items():
+                self.stdout.write(
+                    f"  Presupuesto {presupuestos[presupuesto]}: {base:.2f} -> {totales[columna]:.2f} "
+                    f"({totales[columna] - base:+.2f})"
+                )
+
+        if options['csv']:
+            with open(options['csv'], 'w', encoding='utf-8', newline='') as archivo:
+                escritor = csv.writer(archivo)
+                escritor.writerow(['rubro_id', 'rubro', 'costo_actual', *resultado.escenarios])
+                for fila, rubro in enumerate(resultado.rubros.tolist()):
+                    escritor.writerow([
+                        rubro, nombres[rubro], f"{resultado.costo_base[fila]:.2f}",
+                        *(f"{costo:.2f}" for costo in resultado.costos[fila]),
+                    ])
@@ -0,0 +1,256 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:25
+
+import datetime
+import django.db.models.deletion
+import rubros.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Herramienta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255)),
+                ('costo_por_unidad', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('clave', models.CharField(editable=False, max_length=255, null=True, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Herramienta',
+                'verbose_name_plural': 'Herramientas y Equipos',
+                'ordering': ['nombre'],
+            },
+            bases=(rubros.models.CostoRastreadoMixin, models.Model),
+        ),
+        migrations.CreateModel(
+            name='ManoObra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cargo', models.CharField(blank=True, max_length=15, null=True)),
+                ('numero_de_contacto', models.CharField(blank=True, max_length=15, null=True)),
+                ('clave', models.CharField(editable=False, max_length=255, null=True, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Mano de obra',
+                'verbose_name_plural': 'Mano de obra',
+            },
+            bases=(rubros.models.CostoRastreadoMixin, models.Model),
+        ),
+        migrations.CreateModel(
+            name='Material',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255)),
+                ('costo_por_unidad', models.DecimalField(decimal_places=2, default=0.0, max_digits=10, verbose_name='Costo unitario planificado')),
+                ('clave', models.CharField(editable=False, max_length=255, null=True, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Material',
+                'verbose_name_plural': 'Materiales',
+                'ordering': ['nombre'],
+            },
+            bases=(rubros.models.CostoRastreadoMixin, models.Model),
+        ),
+        migrations.CreateModel(
+            name='Presupuesto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255)),
+                ('cliente', models.CharField(blank=True, max_length=255, null=True)),
+                ('fecha', models.DateField(default=datetime.date.today)),
+                ('total', models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=16)),
+            ],
+            options={
+                'verbose_name': 'Presupuesto',
+                'verbose_name_plural': 'Presupuestos',
+                'ordering': ['-fecha', 'nombre'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Rubro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255)),
+                ('descripcion', models.TextField(blank=True, null=True)),
+                ('codigo', models.CharField(blank=True, max_length=50, unique=True)),
+                ('codigo_personalizado', models.CharField(blank=True, max_length=50, null=True)),
+                ('indirectos', models.DecimalField(decimal_places=2, default=20.0, max_digits=5, verbose_name='Indirectos (%)')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SalarioMinimo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cargo', models.CharField(max_length=255)),
+                ('salario_horario_minimo', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('clave', models.CharField(editable=False, max_length=255, null=True, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Salario minimo',
+                'verbose_name_plural': 'Salarios minimos',
+                'ordering': ['cargo'],
+            },
+            bases=(rubros.models.CostoRastreadoMixin, models.Model),
+        ),
+        migrations.CreateModel(
+            name='Unidad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('abreviatura', models.CharField(blank=True, max_length=10, null=True)),
+                ('clave', models.CharField(editable=False, max_length=255, null=True, unique=True)),
+                ('clave_abreviatura', models.CharField(editable=False, max_length=50, null=True, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Unidad',
+                'verbose_name_plural': 'Unidades',
+            },
+        ),
+        migrations.CreateModel(
+            name='CostoRubro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('costo_materiales', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('costo_herramientas', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('costo_mano_obra', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('costo_subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('costo_indirectos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('costo_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('desactualizado', models.BooleanField(db_index=True, default=True)),
+                ('fecha_calculo', models.DateTimeField(auto_now=True)),
+                ('rubro', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='costo', to='rubros.rubro')),
+            ],
+            options={
+                'verbose_name': 'Costo de rubro',
+                'verbose_name_plural': 'Costos de rubros',
+            },
+        ),
+        migrations.CreateModel(
+            name='RubroHerramienta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad_requerida', models.DecimalField(decimal_places=2, default=1, max_digits=10, verbose_name='Cantidad')),
+                ('rendimiento', models.DecimalField(decimal_places=2, default=1, max_digits=10, verbose_name='Rendiemiento unidad/hora')),
+                ('herramienta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='rubros.herramienta')),
+                ('rubro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='rubros.rubro')),
+            ],
+            options={
+                'verbose_name': 'Herramientas y Equipos',
+                'verbose_name_plural': 'Herramientas y Equipos',
+            },
+        ),
+        migrations.CreateModel(
+            name='RubroManoObra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('rendimiento', models.DecimalField(decimal_places=2, default=1, max_digits=10, verbose_name='Rendiemiento unidad/hora')),
+                ('mano_obra', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='rubros.manoobra')),
+                ('rubro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='rubros.rubro')),
+            ],
+            options={
+                'verbose_name': 'Mano de obra',
+                'verbose_name_plural': 'Mano de obra',
+            },
+        ),
+        migrations.CreateModel(
+            name='RubroMaterial',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad_requerida', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Cantidad')),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='rubros.material')),
+                ('rubro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='rubros.rubro')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RubroPresupuesto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('capitulo', models.CharField(blank=True, db_index=True, default='', max_length=255)),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('precio_unitario', models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14)),
+                ('total', models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=16)),
+                ('presupuesto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='rubros.presupuesto')),
+                ('rubro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas_presupuesto', to='rubros.rubro')),
+            ],
+            options={
+                'verbose_name': 'Rubro del presupuesto',
+                'verbose_name_plural': 'Rubros del presupuesto',
+            },
+        ),
+        migrations.AddField(
+            model_name='manoobra',
+            name='salario_minimo',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='rubros.salariominimo'),
+        ),
+        migrations.AddField(
+            model_name='rubro',
+            name='unidad',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='rubros.unidad'),
+        ),
+        migrations.AddField(
+            model_name='material',
+            name='unidad',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='rubros.unidad'),
+        ),
+        migrations.AddField(
+            model_name='herramienta',
+            name='unidad',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='rubros.unidad'),
+        ),
+        migrations.CreateModel(
+            name='PrecioHerramienta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('fecha_vigencia', models.DateField(default=datetime.date.today)),
+                ('herramienta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historial_precios', to='rubros.herramienta')),
+            ],
+            options={
+                'verbose_name': 'Precio de herramienta',
+                'verbose_name_plural': 'Historial de precios de herramientas',
+                'ordering': ['-fecha_vigencia'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('herramienta', 'fecha_vigencia'), name='precio_herramienta_por_fecha')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PrecioMaterial',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('fecha_vigencia', models.DateField(default=datetime.date.today)),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historial_precios', to='rubros.material')),
+            ],
+            options={
+                'verbose_name': 'Precio de material',
+                'verbose_name_plural': 'Historial de precios de materiales',
+                'ordering': ['-fecha_vigencia'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('material', 'fecha_vigencia'), name='precio_material_por_fecha')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PrecioSalario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('fecha_vigencia', models.DateField(default=datetime.date.today)),
+                ('salario_minimo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historial_precios', to='rubros.salariominimo')),
+            ],
+            options={
+                'verbose_name': 'Salario por hora',
+                'verbose_name_plural': 'Historial de salarios',
+                'ordering': ['-fecha_vigencia'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('salario_minimo', 'fecha_vigencia'), name='precio_salario_por_fecha')],
+            },
+        ),
+    ]
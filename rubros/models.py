@@ -1,29 +1,68 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
 from django.core.exceptions import ValidationError
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
 import re
 from unidecode import unidecode 
 import unicodedata
 
-class SalarioMinimo(models.Model):
+from . import busqueda
+
+
+def normalizar_clave(texto):
+    """
+    Clave de comparacion de nombres: sin tildes, sin espacios extra y sin
+    distinguir mayusculas, equivalente a comparar con iexact los nombres
+    ya normalizados por los modelos.
+    """
+    return unidecode(re.sub(r'\s+', ' ', (texto or '').strip())).casefold()
+
+
+class CostoRastreadoMixin:
+    """
+    Recuerda el valor con el que se cargo desde la base de datos el campo
+    que influye en el costo de los rubros, para saber si cambio al guardar.
+    """
+    campo_costo = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._costo_original = instancia.__dict__.get(cls.campo_costo)
+        return instancia
+
+    def costo_cambiado(self):
+        return getattr(self, '_costo_original', None) != getattr(self, self.campo_costo)
+
+
+class SalarioMinimo(CostoRastreadoMixin, models.Model):
     cargo = models.CharField(max_length=255)  # Nombre del cargo (ej. Albañil, Electricista)
     salario_horario_minimo = models.DecimalField(max_digits=10, decimal_places=2)  # Salario mínimo por hora
+    clave = models.CharField(max_length=255, unique=True, null=True, editable=False)  # Nombre normalizado e indexado
 
     class Meta:
         verbose_name = "Salario minimo"
         verbose_name_plural = "Salarios minimos"
         ordering = ['cargo']  # Ordenar por cargo
 
+    campo_costo = 'salario_horario_minimo'
+
     def clean(self):
         # Normalizar y limpiar el texto del cargo
         self.cargo = self._normalize_text(self.cargo)
 
-        # Validar unicidad del cargo normalizado
-        if SalarioMinimo.objects.exclude(id=self.id).filter(cargo__iexact=self.cargo).exists():
+        # Validar unicidad del cargo normalizado (indice unico sobre la clave)
+        self.clave = normalizar_clave(self.cargo)
+        if SalarioMinimo.objects.exclude(id=self.id).filter(clave=self.clave).exists():
             raise ValidationError({'cargo': 'Ya existe un salario mínimo para este cargo.'})
 
     def save(self, *args, **kwargs):
         # Llama a clean antes de guardar para aplicar validaciones
-        self.full_clean()
+        self.full_clean(exclude=['clave'])
         super().save(*args, **kwargs)
 
     def _normalize_text(self, text):
@@ -42,6 +81,8 @@ class SalarioMinimo(models.Model):
 class Unidad(models.Model):
     nombre = models.CharField(max_length=100)
     abreviatura = models.CharField(max_length=10, blank=True, null=True)
+    clave = models.CharField(max_length=255, unique=True, null=True, editable=False)  # Nombre normalizado e indexado
+    clave_abreviatura = models.CharField(max_length=50, unique=True, null=True, editable=False)
 
     class Meta:
         verbose_name = "Unidad"
@@ -55,40 +96,54 @@ class Unidad(models.Model):
         if self.abreviatura:
             self.abreviatura = unidecode(re.sub(r'\s+', ' ', self.abreviatura.strip().lower()))  # Normaliza, elimina espacios extra, y convierte a minúsculas
 
-        # Validar unicidad del nombre
-        if Unidad.objects.exclude(id=self.id).filter(nombre=self.nombre).exists():
-            raise ValidationError({'nombre': 'Ya existe una unidad con este nombre.'})
-
-        # Validar unicidad de la abreviatura (si está presente)
-        if self.abreviatura and Unidad.objects.exclude(id=self.id).filter(abreviatura=self.abreviatura).exists():
-            raise ValidationError({'abreviatura': 'Ya existe una unidad con esta abreviatura.'})
+        # Validar unicidad del nombre y de la abreviatura (si está presente) con una
+        # sola consulta sobre las claves indexadas
+        self.clave = normalizar_clave(self.nombre)
+        self.clave_abreviatura = normalizar_clave(self.abreviatura) or None
+        condicion = models.Q(clave=self.clave)
+        if self.clave_abreviatura:
+            condicion |= models.Q(clave_abreviatura=self.clave_abreviatura)
+        existentes = Unidad.objects.exclude(id=self.id).filter(condicion).values_list('clave', 'clave_abreviatura')
+        errores = {}
+        for clave, clave_abreviatura in existentes:
+            if clave == self.clave:
+                errores['nombre'] = 'Ya existe una unidad con este nombre.'
+            if self.clave_abreviatura and clave_abreviatura == self.clave_abreviatura:
+                errores['abreviatura'] = 'Ya existe una unidad con esta abreviatura.'
+        if errores:
+            raise ValidationError(errores)
 
     def save(self, *args, **kwargs):
         # Llama a clean para garantizar que se apliquen las validaciones antes de guardar
-        self.full_clean()
+        self.full_clean(exclude=['clave', 'clave_abreviatura'])
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.nombre}"
 
 # Modelo para Materiales
-class Material(models.Model):
+class Material(CostoRastreadoMixin, models.Model):
     nombre = models.CharField(max_length=255)
     unidad = models.ForeignKey(Unidad, on_delete=models.SET_NULL, null=True)
     costo_por_unidad = models.DecimalField(max_digits=10, decimal_places=2, editable=True, verbose_name="Costo unitario planificado", default=0.00)
+    clave = models.CharField(max_length=255, unique=True, null=True, editable=False)  # Nombre normalizado e indexado
 
     class Meta:
         verbose_name = "Material"
         verbose_name_plural = "Materiales"
         ordering = ['nombre']  # Ordena por el campo 'nombre'
-    
+
+    campo_costo = 'costo_por_unidad'
+
     def clean(self):
         # Limpieza de espacios, normalización y eliminación de tildes
         cleaned_name = re.sub(r'\s+', ' ', self.nombre.strip())  # Elimina espacios extra
         normalized_name = unidecode(cleaned_name).capitalize()  # Elimina tildes y normaliza como título
 
         # Verifica unicidad insensible a mayúsculas/minúsculas, tildes y espacios
-        if Material.objects.filter(nombre__iexact=normalized_name).exclude(pk=self.pk).exists():
+        # (indice unico sobre la clave)
+        self.clave = normalizar_clave(normalized_name)
+        if Material.objects.filter(clave=self.clave).exclude(pk=self.pk).exists():
             raise ValidationError(f"Ya existe un material con el nombre '{normalized_name}'.")
 
         # Asigna el nombre limpio y normalizado
@@ -96,7 +151,7 @@ class Material(models.Model):
 
     def save(self, *args, **kwargs):
         # Normalizar el texto del nombre
-        self.full_clean()  # Llama a clean() para aplicar validaciones antes de guardar
+        self.full_clean(exclude=['clave'])  # Llama a clean() para aplicar validaciones antes de guardar
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -104,27 +159,31 @@ class Material(models.Model):
 
 
 # Modelo para Herramientas
-class Herramienta(models.Model):
+class Herramienta(CostoRastreadoMixin, models.Model):
     nombre = models.CharField(max_length=255)
     unidad = models.ForeignKey(Unidad, on_delete=models.SET_NULL, null=True)
     costo_por_unidad = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    clave = models.CharField(max_length=255, unique=True, null=True, editable=False)  # Nombre normalizado e indexado
 
     class Meta:
         verbose_name = "Herramienta"
         verbose_name_plural = "Herramientas y Equipos"
         ordering = ['nombre']
 
+    campo_costo = 'costo_por_unidad'
+
     def clean(self):
         # Normaliza el nombre eliminando tildes y espacios extra
         self.nombre = self._normalize_text(self.nombre)
 
-        # Validar unicidad del nombre normalizado
-        if Herramienta.objects.exclude(id=self.id).filter(nombre__iexact=self.nombre).exists():
+        # Validar unicidad del nombre normalizado (indice unico sobre la clave)
+        self.clave = normalizar_clave(self.nombre)
+        if Herramienta.objects.exclude(id=self.id).filter(clave=self.clave).exists():
             raise ValidationError({'nombre': 'Ya existe una herramienta con este nombre.'})
 
     def save(self, *args, **kwargs):
         # Llama a clean para garantizar que se apliquen las validaciones antes de guardar
-        self.full_clean()
+        self.full_clean(exclude=['clave'])
         super().save(*args, **kwargs)
 
     def _normalize_text(self, text):
@@ -140,23 +199,26 @@ class Herramienta(models.Model):
         return f"{self.nombre}"
 
 # Modelo para Mano de Obra
-class ManoObra(models.Model):
+class ManoObra(CostoRastreadoMixin, models.Model):
     cargo = models.CharField(max_length=15, blank=True, null=True)
     salario_minimo = models.ForeignKey(SalarioMinimo, on_delete=models.SET_NULL, null=True)
     numero_de_contacto = models.CharField(max_length=15, blank=True, null=True)
+    clave = models.CharField(max_length=255, unique=True, null=True, editable=False)  # Cargo normalizado e indexado
 
     class Meta:
         verbose_name = "Mano de obra"
         verbose_name_plural = "Mano de obra"
 
+    campo_costo = 'salario_minimo_id'
 
     def clean(self):
         # Normaliza el texto del cargo eliminando tildes y espacios extra
         if self.cargo:
             self.cargo = self._normalize_text(self.cargo)
 
-        # Verifica unicidad del cargo normalizado
-        if self.cargo and ManoObra.objects.exclude(id=self.id).filter(cargo__iexact=self.cargo).exists():
+        # Verifica unicidad del cargo normalizado (indice unico sobre la clave)
+        self.clave = normalizar_clave(self.cargo) or None
+        if self.clave and ManoObra.objects.exclude(id=self.id).filter(clave=self.clave).exists():
             raise ValidationError({'cargo': 'Ya existe un registro de mano de obra con este cargo.'})
 
         # Valida el formato del número de contacto (solo dígitos y longitud entre 7 y 15 caracteres)
@@ -165,7 +227,7 @@ class ManoObra(models.Model):
 
     def save(self, *args, **kwargs):
         # Llama a clean para garantizar que las validaciones se apliquen antes de guardar
-        self.full_clean()
+        self.full_clean(exclude=['clave'])
         super().save(*args, **kwargs)
 
     def _normalize_text(self, text):
@@ -181,6 +243,129 @@ class ManoObra(models.Model):
         return f"{self.salario_minimo.cargo} " if self.salario_minimo else "Sin cargo asignado"
 
 
+def _dividir(dividendo, divisor):
+    # El divisor se convierte a real para evitar la division entera de SQLite
+    return models.ExpressionWrapper(
+        dividendo / Cast(divisor, models.FloatField()),
+        output_field=models.DecimalField(),
+    )
+
+
+# Expresiones de costo por linea, equivalentes a las propiedades costo_total
+# de RubroMaterial, RubroHerramienta y RubroManoObra
+COSTO_LINEA_MATERIAL = F('cantidad_requerida') * F('material__costo_por_unidad')
+COSTO_LINEA_HERRAMIENTA = _dividir(F('cantidad_requerida') * F('herramienta__costo_por_unidad'), 'rendimiento')
+COSTO_LINEA_MANO_OBRA = _dividir(F('cantidad') * F('mano_obra__salario_minimo__salario_horario_minimo'), 'rendimiento')
+
+
+def _precio_vigente(historial, recurso, fecha):
+    # Ultimo precio del historial vigente a la fecha (busqueda por el indice
+    # (recurso, fecha_vigencia)). Antes del primer registro no hay precio
+    # (NULL): el precio actual puede ser uno posterior a la fecha.
+    # recurso es el nombre del campo en el historial y la ruta desde la linea
+    campo, ruta = recurso
+    return Subquery(
+        historial.objects.filter(**{campo: OuterRef(ruta), 'fecha_vigencia__lte': fecha})
+        .order_by('-fecha_vigencia').values('precio')[:1],
+        output_field=models.DecimalField(),
+    )
+
+
+def _costos_linea_a_fecha(fecha):
+    # Las mismas expresiones de costo por linea, con los precios vigentes a la fecha
+    return (
+        F('cantidad_requerida') * _precio_vigente(PrecioMaterial, ('material', 'material'), fecha),
+        _dividir(F('cantidad_requerida') * _precio_vigente(PrecioHerramienta, ('herramienta', 'herramienta'), fecha), 'rendimiento'),
+        _dividir(F('cantidad') * _precio_vigente(
+            PrecioSalario, ('salario_minimo', 'mano_obra__salario_minimo'), fecha), 'rendimiento'),
+    )
+
+
+CENTAVO = Decimal('0.01')
+
+
+class Dinero(models.Func):
+    """
+    Redondea una expresion monetaria a dos decimales en la base de datos
+    y la devuelve como Decimal exacto (SQLite entrega flotantes).
+    """
+    function = 'ROUND'
+    template = '%(function)s(%(expressions)s, 2)'
+    output_field = models.DecimalField(max_digits=14, decimal_places=2)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # Sin el CAST(... AS NUMERIC) que Django agrega en SQLite: convert_value ya
+        # entrega Decimal y cada CAST anidado acerca la consulta al limite del parser
+        return self.as_sql(compiler, connection, **extra_context)
+
+    def convert_value(self, value, expression, connection):
+        return None if value is None else Decimal(value).quantize(CENTAVO)
+
+
+def _suma_lineas(modelo, expresion):
+    # Subconsulta correlacionada con la suma de costos de las lineas del rubro
+    lineas = (
+        modelo.objects.filter(rubro=OuterRef('pk'))
+        .order_by()
+        .values('rubro')
+        .annotate(total=Sum(expresion, output_field=models.DecimalField()))
+        .values('total')
+    )
+    return Dinero(Coalesce(Subquery(lineas), Value(Decimal('0')), output_field=models.DecimalField()))
+
+
+def calcular_costos_apu(indirectos, materiales=(), herramientas=(), mano_obra=()):
+    """
+    Calcula en Decimal exacto los costos de un APU a partir de sus lineas,
+    guardadas o no. Cada linea es (precio, cantidad, rendimiento); para
+    materiales el rendimiento se ignora. Redondea igual que with_costos().
+    Devuelve los costos del APU y el costo de cada linea en el mismo orden.
+    """
+    def redondear(valor):
+        return Decimal(valor).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+    lineas = {
+        'materiales': [cantidad * precio for precio, cantidad, _ in materiales],
+        'herramientas': [cantidad * precio / rendimiento for precio, cantidad, rendimiento in herramientas],
+        'mano_obra': [cantidad * precio / rendimiento for precio, cantidad, rendimiento in mano_obra],
+    }
+    costos = {
+        'costo_materiales': redondear(sum(lineas['materiales'], Decimal('0'))),
+        'costo_herramientas': redondear(sum(lineas['herramientas'], Decimal('0'))),
+        'costo_mano_obra': redondear(sum(lineas['mano_obra'], Decimal('0'))),
+    }
+    costos['costo_subtotal'] = costos['costo_materiales'] + costos['costo_herramientas'] + costos['costo_mano_obra']
+    costos['costo_indirectos'] = redondear(costos['costo_subtotal'] * Decimal(indirectos) / 100)
+    costos['costo_total'] = costos['costo_subtotal'] + costos['costo_indirectos']
+    return costos, {tipo: [redondear(costo) for costo in costos_linea] for tipo, costos_linea in lineas.items()}
+
+
+class RubroQuerySet(models.QuerySet):
+
+    def with_costos(self, fecha=None):
+        """
+        Anota los subtotales de materiales, herramientas y mano de obra,
+        el monto de indirectos y el total del APU, calculados en SQL.
+        Con fecha, usa los precios del historial vigentes a esa fecha; las
+        lineas de un recurso sin precio a esa fecha no suman.
+        """
+        if fecha is None:
+            material, herramienta, mano_obra = COSTO_LINEA_MATERIAL, COSTO_LINEA_HERRAMIENTA, COSTO_LINEA_MANO_OBRA
+        else:
+            material, herramienta, mano_obra = _costos_linea_a_fecha(fecha)
+        return self.annotate(
+            costo_materiales=_suma_lineas(RubroMaterial, material),
+            costo_herramientas=_suma_lineas(RubroHerramienta, herramienta),
+            costo_mano_obra=_suma_lineas(RubroManoObra, mano_obra),
+        ).annotate(
+            costo_subtotal=Dinero(F('costo_materiales') + F('costo_herramientas') + F('costo_mano_obra')),
+        ).annotate(
+            costo_indirectos=Dinero(F('costo_subtotal') * F('indirectos') / Value(Decimal('100'))),
+        ).annotate(
+            costo_total=Dinero(F('costo_subtotal') + F('costo_indirectos')),
+        )
+
+
 # Modelo para Rubros de Construcción
 class Rubro(models.Model):
     nombre = models.CharField(max_length=255)
@@ -191,18 +376,53 @@ class Rubro(models.Model):
     indirectos = models.DecimalField(max_digits=5, decimal_places=2, default=20.00,
                                       verbose_name="Indirectos (%)")
 
+    objects = RubroQuerySet.as_manager()
+
+    CAMPOS_COSTO = ('costo_materiales', 'costo_herramientas', 'costo_mano_obra',
+                    'costo_subtotal', 'costo_indirectos', 'costo_total')
+
+    def cargar_costos(self):
+        """
+        Calcula todos los costos del rubro en una sola consulta y los
+        asigna a la instancia, igual que lo hace with_costos().
+        """
+        costos = Rubro.objects.with_costos().filter(pk=self.pk).values(*self.CAMPOS_COSTO).first()
+        for campo in self.CAMPOS_COSTO:
+            setattr(self, campo, costos[campo] if costos else Decimal('0.00'))
+
+    def _costo(self, campo):
+        # 1. Anotacion de with_costos(); 2. costo almacenado si esta al dia;
+        # 3. calculo en una sola consulta
+        if not hasattr(self, campo):
+            costo = getattr(self, 'costo', None)
+            if costo is not None and not costo.desactualizado:
+                return getattr(costo, campo)
+            self.cargar_costos()
+        return getattr(self, campo)
+
+    # Método para obtener todos los costos del APU como diccionario
+    def obtener_costos(self):
+        return {campo: self._costo(campo) for campo in self.CAMPOS_COSTO}
 
     # Método para calcular el costo total de todos los materiales relacionados
     def calcular_costo_total_materiales(self):
-        return sum(material.costo_total for material in self.rubromaterial_set.all())
+        return self._costo('costo_materiales')
 
-        # Método para calcular el costo total de todos las herramientas relacionadas
+    # Método para calcular el costo total de todos las herramientas relacionadas
     def calcular_costo_total_herramientas(self):
-        return sum(herramienta.costo_total for herramienta in self.rubroherramienta_set.all())
+        return self._costo('costo_herramientas')
 
-            # Método para calcular el costo total de todos las herramientas relacionadas
+    # Método para calcular el costo total de toda la mano de obra relacionada
     def calcular_costo_total_mano_de_obra(self):
-        return sum(manoobra.costo_total for manoobra in self.rubromanoobra_set.all())
+        return self._costo('costo_mano_obra')
+
+    # Método para calcular el monto de indirectos sobre el subtotal
+    def calcular_costo_indirectos(self):
+        return self._costo('costo_indirectos')
+
+    # Método para calcular el total del APU (subtotal + indirectos)
+    def calcular_costo_total(self):
+        return self._costo('costo_total')
     
     def __str__(self):
         return self.nombre
@@ -259,3 +479,316 @@ class RubroManoObra(models.Model):
     @property
     def costo_total(self):
         return  self.cantidad * (self.mano_obra.salario_minimo.salario_horario_minimo / self.rendimiento )
+
+
+# Costos almacenados por rubro; se recalculan solo cuando cambian sus insumos
+class CostoRubro(models.Model):
+    rubro = models.OneToOneField(Rubro, on_delete=models.CASCADE, related_name='costo')
+    costo_materiales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    costo_herramientas = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    costo_mano_obra = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    costo_subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    costo_indirectos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    costo_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    desactualizado = models.BooleanField(default=True, db_index=True)
+    fecha_calculo = models.DateTimeField(auto_now=True)
+
+    TAMANO_LOTE = 500
+
+    class Meta:
+        verbose_name = "Costo de rubro"
+        verbose_name_plural = "Costos de rubros"
+
+    @classmethod
+    def recalcular(cls, rubros):
+        """
+        Recalcula y guarda los costos de los rubros indicados (queryset de
+        Rubro o lista de ids) por lotes, con un upsert por lote.
+        """
+        if isinstance(rubros, models.QuerySet):
+            rubros = rubros.values_list('pk', flat=True)
+        ids = list(rubros)
+        for inicio in range(0, len(ids), cls.TAMANO_LOTE):
+            lote = ids[inicio:inicio + cls.TAMANO_LOTE]
+            costos = [
+                cls(rubro_id=fila.pop('pk'), desactualizado=False, **fila)
+                for fila in Rubro.objects.with_costos().filter(pk__in=lote).values('pk', *Rubro.CAMPOS_COSTO)
+            ]
+            cls.objects.bulk_create(
+                costos,
+                update_conflicts=True,
+                unique_fields=['rubro'],
+                update_fields=[*Rubro.CAMPOS_COSTO, 'desactualizado', 'fecha_calculo'],
+            )
+        return len(ids)
+
+    @classmethod
+    def recalcular_desactualizados(cls):
+        return cls.recalcular(Rubro.objects.filter(costo__desactualizado=True))
+
+    @classmethod
+    def marcar_desactualizados(cls, rubros):
+        """
+        Marca como desactualizados los costos de los rubros indicados y
+        programa un unico recalculo al confirmar la transaccion en curso.
+        """
+        if cls.objects.filter(rubro__in=rubros).update(desactualizado=True):
+            transaction.on_commit(cls.recalcular_desactualizados)
+
+    def __str__(self):
+        return f"Costo de {self.rubro} - {self.costo_total}"
+
+
+# Modelo para Presupuestos de obra (oferta completa del proyecto)
+class Presupuesto(models.Model):
+    nombre = models.CharField(max_length=255)
+    cliente = models.CharField(max_length=255, blank=True, null=True)
+    fecha = models.DateField(default=date.today)
+    total = models.DecimalField(max_digits=16, decimal_places=2, default=0, editable=False)
+
+    class Meta:
+        verbose_name = "Presupuesto"
+        verbose_name_plural = "Presupuestos"
+        ordering = ['-fecha', 'nombre']
+
+    def totales_por_capitulo(self):
+        # Subtotales por capitulo en una sola consulta agrupada
+        return list(
+            self.lineas.order_by('capitulo').values('capitulo')
+            .annotate(total=Dinero(Sum('total')), lineas=models.Count('pk'))
+        )
+
+    def recalcular_total(self):
+        """
+        Recalcula el total desde las lineas con una sola agregacion; sirve
+        para corregir el total mantenido de forma incremental.
+        """
+        self.total = self.lineas.aggregate(total=Dinero(Coalesce(Sum('total'), Value(Decimal('0')))))['total']
+        Presupuesto.objects.filter(pk=self.pk).update(total=self.total)
+        return self.total
+
+    def actualizar_precios(self):
+        """
+        Toma el precio unitario vigente de cada rubro (costo total con
+        indirectos almacenado en CostoRubro) para todas las lineas con un
+        solo UPDATE, y luego recalcula el total. Los rubros del presupuesto
+        que aun no tienen fila de costos la reciben antes.
+        """
+        precio = Coalesce(
+            Subquery(CostoRubro.objects.filter(rubro=OuterRef('rubro')).values('costo_total')[:1]),
+            Subquery(Rubro.objects.with_costos().filter(pk=OuterRef('rubro')).values('costo_total')[:1]),
+            output_field=models.DecimalField(),
+        )
+        with transaction.atomic():
+            CostoRubro.recalcular(Rubro.objects.filter(lineas_presupuesto__presupuesto=self, costo=None).distinct())
+            CostoRubro.recalcular_desactualizados()
+            self.lineas.update(precio_unitario=precio)
+            self.lineas.update(total=Dinero(F('cantidad') * F('precio_unitario')))
+            return self.recalcular_total()
+
+    def __str__(self):
+        return self.nombre
+
+
+# Linea del presupuesto: cantidad de un rubro dentro de un capitulo
+class RubroPresupuesto(models.Model):
+    presupuesto = models.ForeignKey(Presupuesto, on_delete=models.CASCADE, related_name='lineas')
+    rubro = models.ForeignKey(Rubro, on_delete=models.CASCADE, related_name='lineas_presupuesto')
+    capitulo = models.CharField(max_length=255, blank=True, default='', db_index=True)
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2)
+    precio_unitario = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    total = models.DecimalField(max_digits=16, decimal_places=2, default=0, editable=False)
+
+    class Meta:
+        verbose_name = "Rubro del presupuesto"
+        verbose_name_plural = "Rubros del presupuesto"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._original = tuple(instancia.__dict__.get(campo) for campo in ('presupuesto_id', 'rubro_id', 'total'))
+        return instancia
+
+    def save(self, *args, **kwargs):
+        presupuesto_anterior, rubro_anterior, total_anterior = getattr(self, '_original', (None, None, None))
+        # El precio unitario se toma del costo almacenado del rubro al crear la
+        # linea o al cambiar de rubro; despues solo cambia con actualizar_precios()
+        if self.rubro_id != rubro_anterior:
+            self.precio_unitario = self.rubro.calcular_costo_total()
+        self.total = (self.cantidad * self.precio_unitario).quantize(CENTAVO)
+
+        # El total del presupuesto se ajusta solo por la diferencia de esta linea
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if presupuesto_anterior is not None:
+                Presupuesto.objects.filter(pk=presupuesto_anterior).update(total=F('total') - total_anterior)
+            Presupuesto.objects.filter(pk=self.presupuesto_id).update(total=F('total') + self.total)
+        self._original = (self.presupuesto_id, self.rubro_id, self.total)
+
+    def __str__(self):
+        return f"{self.rubro} x {self.cantidad}"
+
+
+# Historial de precios (solo se agregan registros): un precio por recurso y fecha de vigencia
+class HistorialPrecio(models.Model):
+    precio = models.DecimalField(max_digits=10, decimal_places=2)
+    fecha_vigencia = models.DateField(default=date.today)
+
+    campo_recurso = None
+    # Vigencia de los precios que ya tenia el catalogo antes de su primer
+    # cambio registrado: se desconoce desde cuando rigen
+    FECHA_INICIAL = date(1900, 1, 1)
+
+    class Meta:
+        abstract = True
+        ordering = ['-fecha_vigencia']
+
+    @classmethod
+    def registrar_iniciales(cls, precios=None, using=None):
+        """
+        Registra desde FECHA_INICIAL los precios {id del recurso: precio} de
+        los recursos que aun no tienen historial; sin precios, los de todos
+        con su precio actual. using elige la base de datos (la del router por
+        defecto). Devuelve cuantos se registraron.
+        """
+        modelo = cls._meta.get_field(cls.campo_recurso).related_model
+        historial = cls.objects.db_manager(using)
+        sin_historial = modelo.objects.db_manager(using).exclude(pk__in=historial.values(cls.campo_recurso))
+        if precios is None:
+            precios = dict(sin_historial.values_list('pk', modelo.campo_costo))
+        else:
+            ids = set(sin_historial.filter(pk__in=list(precios)).values_list('pk', flat=True))
+            precios = {pk: precio for pk, precio in precios.items() if pk in ids and precio is not None}
+        historial.bulk_create(
+            [cls(**{f'{cls.campo_recurso}_id': pk, 'precio': precio, 'fecha_vigencia': cls.FECHA_INICIAL}) for pk, precio in precios.items()],
+            ignore_conflicts=True,
+            batch_size=500,
+        )
+        return len(precios)
+
+    @classmethod
+    def registrar(cls, precios, fecha=None):
+        """
+        Registra los precios {id del recurso: precio} vigentes desde la fecha
+        (hoy por defecto). Varios cambios el mismo dia dejan el ultimo.
+        """
+        fecha = fecha or date.today()
+        cls.objects.bulk_create(
+            [cls(**{f'{cls.campo_recurso}_id': pk, 'precio': precio, 'fecha_vigencia': fecha}) for pk, precio in precios.items()],
+            update_conflicts=True,
+            unique_fields=[cls.campo_recurso, 'fecha_vigencia'],
+            update_fields=['precio'],
+            batch_size=500,
+        )
+
+    def __str__(self):
+        return f"{getattr(self, self.campo_recurso)} - {self.precio} desde {self.fecha_vigencia}"
+
+
+class PrecioMaterial(HistorialPrecio):
+    material = models.ForeignKey(Material, on_delete=models.CASCADE, related_name='historial_precios')
+
+    campo_recurso = 'material'
+
+    class Meta(HistorialPrecio.Meta):
+        verbose_name = "Precio de material"
+        verbose_name_plural = "Historial de precios de materiales"
+        constraints = [models.UniqueConstraint(fields=['material', 'fecha_vigencia'], name='precio_material_por_fecha')]
+
+
+class PrecioHerramienta(HistorialPrecio):
+    herramienta = models.ForeignKey(Herramienta, on_delete=models.CASCADE, related_name='historial_precios')
+
+    campo_recurso = 'herramienta'
+
+    class Meta(HistorialPrecio.Meta):
+        verbose_name = "Precio de herramienta"
+        verbose_name_plural = "Historial de precios de herramientas"
+        constraints = [models.UniqueConstraint(fields=['herramienta', 'fecha_vigencia'], name='precio_herramienta_por_fecha')]
+
+
+class PrecioSalario(HistorialPrecio):
+    salario_minimo = models.ForeignKey(SalarioMinimo, on_delete=models.CASCADE, related_name='historial_precios')
+
+    campo_recurso = 'salario_minimo'
+
+    class Meta(HistorialPrecio.Meta):
+        verbose_name = "Salario por hora"
+        verbose_name_plural = "Historial de salarios"
+        constraints = [models.UniqueConstraint(fields=['salario_minimo', 'fecha_vigencia'], name='precio_salario_por_fecha')]
+
+
+# Invalidacion de costos: solo se marcan los rubros que usan el insumo modificado
+@receiver(post_save, sender=Material)
+def invalidar_costos_material(sender, instance, created, **kwargs):
+    if instance.costo_cambiado():
+        if not created:
+            # El precio anterior sigue vigente para las fechas previas al cambio
+            PrecioMaterial.registrar_iniciales({instance.pk: instance._costo_original})
+            CostoRubro.marcar_desactualizados(Rubro.objects.filter(rubromaterial__material=instance))
+        PrecioMaterial.registrar({instance.pk: instance.costo_por_unidad})
+    instance._costo_original = instance.costo_por_unidad
+
+@receiver(post_save, sender=Herramienta)
+def invalidar_costos_herramienta(sender, instance, created, **kwargs):
+    if instance.costo_cambiado():
+        if not created:
+            # El precio anterior sigue vigente para las fechas previas al cambio
+            PrecioHerramienta.registrar_iniciales({instance.pk: instance._costo_original})
+            CostoRubro.marcar_desactualizados(Rubro.objects.filter(rubroherramienta__herramienta=instance))
+        PrecioHerramienta.registrar({instance.pk: instance.costo_por_unidad})
+    instance._costo_original = instance.costo_por_unidad
+
+@receiver(post_save, sender=SalarioMinimo)
+def invalidar_costos_salario(sender, instance, created, **kwargs):
+    if instance.costo_cambiado():
+        if not created:
+            # El precio anterior sigue vigente para las fechas previas al cambio
+            PrecioSalario.registrar_iniciales({instance.pk: instance._costo_original})
+            CostoRubro.marcar_desactualizados(Rubro.objects.filter(rubromanoobra__mano_obra__salario_minimo=instance))
+        PrecioSalario.registrar({instance.pk: instance.salario_horario_minimo})
+    instance._costo_original = instance.salario_horario_minimo
+
+@receiver(pre_delete, sender=SalarioMinimo)
+def invalidar_costos_salario_eliminado(sender, instance, **kwargs):
+    # Al eliminarse, la mano de obra queda sin salario (SET_NULL) sin disparar señales
+    CostoRubro.marcar_desactualizados(Rubro.objects.filter(rubromanoobra__mano_obra__salario_minimo=instance))
+
+@receiver(post_save, sender=ManoObra)
+def invalidar_costos_mano_obra(sender, instance, created, **kwargs):
+    if not created and instance.costo_cambiado():
+        CostoRubro.marcar_desactualizados(Rubro.objects.filter(rubromanoobra__mano_obra=instance))
+    instance._costo_original = instance.salario_minimo_id
+
+@receiver(post_save, sender=Rubro)
+def invalidar_costos_rubro(sender, instance, created, **kwargs):
+    # Cambios en indirectos; los rubros nuevos reciben su fila de costos
+    if created:
+        CostoRubro.objects.get_or_create(rubro=instance)
+    CostoRubro.marcar_desactualizados([instance.pk])
+
+@receiver(post_save, sender=RubroMaterial)
+@receiver(post_delete, sender=RubroMaterial)
+@receiver(post_save, sender=RubroHerramienta)
+@receiver(post_delete, sender=RubroHerramienta)
+@receiver(post_save, sender=RubroManoObra)
+@receiver(post_delete, sender=RubroManoObra)
+def invalidar_costos_linea(sender, instance, **kwargs):
+    CostoRubro.marcar_desactualizados([instance.rubro_id])
+
+# Indice de busqueda: cada alta, cambio o baja del catalogo se refleja en su tabla FTS5
+@receiver(post_save, sender=Material)
+@receiver(post_save, sender=Herramienta)
+@receiver(post_save, sender=Rubro)
+def indexar_busqueda(sender, instance, **kwargs):
+    busqueda.indexar(sender._meta.model_name, [instance])
+
+@receiver(post_delete, sender=Material)
+@receiver(post_delete, sender=Herramienta)
+@receiver(post_delete, sender=Rubro)
+def eliminar_busqueda(sender, instance, **kwargs):
+    busqueda.eliminar(sender._meta.model_name, [instance.pk])
+
+@receiver(post_delete, sender=RubroPresupuesto)
+def descontar_linea_presupuesto(sender, instance, **kwargs):
+    Presupuesto.objects.filter(pk=instance.presupuesto_id).update(total=F('total') - instance.total)
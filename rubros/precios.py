@@ -0,0 +1,163 @@
+import csv
+import io
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+
+from .importacion import decodificar
+from .models import (
+    CostoRubro,
+    Herramienta,
+    Material,
+    PrecioHerramienta,
+    PrecioMaterial,
+    PrecioSalario,
+    Rubro,
+    RubroHerramienta,
+    RubroManoObra,
+    RubroMaterial,
+    SalarioMinimo,
+    normalizar_clave,
+)
+
+# tipo de recurso -> (modelo, campo del nombre, campo del precio, historial de precios)
+RECURSOS = {
+    'material': (Material, 'nombre', 'costo_por_unidad', PrecioMaterial),
+    'herramienta': (Herramienta, 'nombre', 'costo_por_unidad', PrecioHerramienta),
+    'salario': (SalarioMinimo, 'cargo', 'salario_horario_minimo', PrecioSalario),
+}
+
+PRECIO_MAXIMO = Decimal('100000000')  # max_digits=10, decimal_places=2
+
+
+@dataclass
+class ResultadoPrecios:
+    cambiados: list = field(default_factory=list)  # (tipo, nombre, precio anterior, precio nuevo)
+    sin_cambios: int = 0
+    no_encontrados: list = field(default_factory=list)  # (fila, tipo, nombre)
+    rubros_afectados: int = 0
+
+
+def leer_lista_precios(archivo, tipo=None):
+    """
+    Lee una lista de precios en CSV (separada por coma o punto y coma) con
+    las columnas nombre y precio, y opcionalmente tipo. Si el archivo no
+    trae la columna tipo se usa el tipo indicado para todas las filas.
+    Los bytes se decodifican como UTF-8 o, si no lo son, cp1252.
+    """
+    if isinstance(archivo, bytes):
+        archivo = decodificar(archivo)
+    if isinstance(archivo, str):
+        archivo = io.StringIO(archivo)
+
+    muestra = archivo.read(4096)
+    archivo.seek(0)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=',;')
+    except csv.Error:
+        dialecto = csv.excel
+
+    filas = []
+    lector = csv.DictReader(archivo, dialect=dialecto)
+    lector.fieldnames = [normalizar_clave(nombre) for nombre in lector.fieldnames or []]
+    for numero, fila in enumerate(lector, start=2):
+        filas.append({
+            'fila': numero,
+            'tipo': normalizar_clave(fila.get('tipo') or tipo),
+            'nombre': fila.get('nombre') or '',
+            'precio': (fila.get('precio') or '').strip(),
+        })
+    return filas
+
+
+def _convertir_precio(texto):
+    # Acepta coma decimal ("12,50") ademas del punto
+    if ',' in texto and '.' not in texto:
+        texto = texto.replace(',', '.')
+    precio = Decimal(texto).quantize(Decimal('0.01'))
+    if not precio.is_finite() or precio < 0 or precio >= PRECIO_MAXIMO:
+        raise InvalidOperation
+    return precio
+
+
+def importar_precios(filas, aplicar=True):
+    """
+    Valida todo el lote de precios contra el catalogo cargado en memoria y,
+    si no hay errores, lo aplica con bulk_update en una sola transaccion.
+    Los costos de los rubros afectados se recalculan una sola vez al final.
+    """
+    errores = []
+    resultado = ResultadoPrecios()
+
+    # Catalogo en memoria: clave normalizada -> [(pk, precio actual)]
+    catalogo = {}
+    for tipo, (modelo, campo_nombre, campo_precio, _) in RECURSOS.items():
+        catalogo[tipo] = {}
+        for pk, nombre, precio in modelo.objects.values_list('pk', campo_nombre, campo_precio).iterator():
+            catalogo[tipo].setdefault(normalizar_clave(nombre), []).append((pk, nombre, precio))
+
+    nuevos = {tipo: {} for tipo in RECURSOS}  # pk -> precio nuevo
+    anteriores = {tipo: {} for tipo in RECURSOS}  # pk -> precio que se reemplaza
+    vistos = {}
+    for fila in filas:
+        numero, tipo = fila['fila'], fila['tipo']
+        if tipo not in RECURSOS:
+            errores.append(f"Fila {numero}: tipo '{fila['tipo']}' no valido (material, herramienta o salario).")
+            continue
+        clave = normalizar_clave(fila['nombre'])
+        if not clave:
+            errores.append(f"Fila {numero}: falta el nombre.")
+            continue
+        try:
+            precio = _convertir_precio(fila['precio'])
+        except (InvalidOperation, ValueError):
+            errores.append(f"Fila {numero}: precio '{fila['precio']}' no valido.")
+            continue
+
+        anterior = vistos.setdefault((tipo, clave), (numero, precio))
+        if anterior[0] != numero and anterior[1] != precio:
+            errores.append(f"Fila {numero}: '{fila['nombre']}' ya aparece en la fila {anterior[0]} con otro precio.")
+            continue
+
+        coincidencias = catalogo[tipo].get(clave)
+        if not coincidencias:
+            resultado.no_encontrados.append((numero, tipo, fila['nombre']))
+            continue
+        if len(coincidencias) > 1:
+            errores.append(f"Fila {numero}: '{fila['nombre']}' coincide con varios registros de {tipo}.")
+            continue
+
+        pk, nombre, precio_actual = coincidencias[0]
+        if precio_actual == precio or pk in nuevos[tipo]:
+            resultado.sin_cambios += 1
+            continue
+        nuevos[tipo][pk] = precio
+        anteriores[tipo][pk] = precio_actual
+        resultado.cambiados.append((tipo, nombre, precio_actual, precio))
+
+    if errores:
+        raise ValidationError(errores)
+
+    if aplicar and resultado.cambiados:
+        with transaction.atomic():
+            for tipo, (modelo, _, campo_precio, historial) in RECURSOS.items():
+                modelo.objects.bulk_update(
+                    [modelo(pk=pk, **{campo_precio: precio}) for pk, precio in nuevos[tipo].items()],
+                    [campo_precio],
+                    batch_size=500,
+                )
+                # El precio reemplazado queda vigente para las fechas anteriores
+                historial.registrar_iniciales(anteriores[tipo])
+                historial.registrar(nuevos[tipo])
+            afectados = Rubro.objects.filter(
+                Q(pk__in=RubroMaterial.objects.filter(material__in=list(nuevos['material'])).values('rubro'))
+                | Q(pk__in=RubroHerramienta.objects.filter(herramienta__in=list(nuevos['herramienta'])).values('rubro'))
+                | Q(pk__in=RubroManoObra.objects.filter(mano_obra__salario_minimo__in=list(nuevos['salario'])).values('rubro'))
+            )
+            resultado.rubros_afectados = afectados.count()
+            CostoRubro.marcar_desactualizados(afectados)
+
+    return resultado
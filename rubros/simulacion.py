@@ -0,0 +1,179 @@
+"""
+Simulacion de escenarios de precios sobre todo el catalogo de rubros.
+
+Los coeficientes rubro x recurso se cargan una sola vez desde RubroMaterial,
+RubroHerramienta y RubroManoObra (con las mismas formulas que sus
+propiedades costo_total) y cada lote de escenarios se evalua con NumPy,
+sin volver a consultar la base de datos.
+
+Un escenario es un diccionario con variaciones porcentuales, por ejemplo:
+
+    {
+        'nombre': 'Acero +12%, salarios +5%',
+        'materiales': 0,                  # variacion de todos los materiales
+        'herramientas': 0,                # variacion de todas las herramientas
+        'salarios': 5,                    # variacion de todos los salarios
+        'material': {'Acero': 12},        # variacion por material (nombre o id)
+        'herramienta': {},
+        'salario': {},                    # variacion por cargo (nombre o id)
+    }
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from .models import (
+    Herramienta,
+    Material,
+    Rubro,
+    RubroHerramienta,
+    RubroManoObra,
+    RubroMaterial,
+    RubroPresupuesto,
+    SalarioMinimo,
+    normalizar_clave,
+)
+
+# tipo de recurso -> (modelo, campo del nombre, campo del precio, clave global del escenario)
+RECURSOS = {
+    'material': (Material, 'nombre', 'costo_por_unidad', 'materiales'),
+    'herramienta': (Herramienta, 'nombre', 'costo_por_unidad', 'herramientas'),
+    'salario': (SalarioMinimo, 'cargo', 'salario_horario_minimo', 'salarios'),
+}
+
+
+@dataclass
+class ResultadoSimulacion:
+    escenarios: list          # nombres de los escenarios
+    rubros: np.ndarray        # ids de rubro, en el orden de las filas
+    costo_base: np.ndarray    # total APU actual por rubro
+    costos: np.ndarray        # total APU por rubro (filas) y escenario (columnas)
+    presupuestos: dict        # id de presupuesto -> (total base, totales por escenario)
+
+    @property
+    def deltas(self):
+        return self.costos - self.costo_base[:, None]
+
+
+class SimuladorPrecios:
+    """
+    Matriz dispersa de coeficientes (en formato de tripletas ordenadas por
+    rubro) y vectores de precios base, cargados con una consulta por tabla.
+    """
+
+    def __init__(self):
+        self.rubros = np.array(Rubro.objects.order_by('pk').values_list('pk', flat=True), dtype=np.int64)
+        posicion = {rubro: fila for fila, rubro in enumerate(self.rubros.tolist())}
+        indirectos = dict(Rubro.objects.values_list('pk', 'indirectos'))
+        self.indirectos = np.array([float(indirectos[rubro]) / 100 for rubro in self.rubros.tolist()])
+
+        self.ids = {}
+        self.nombres = {}
+        self.precios = {}
+        for tipo, (modelo, campo_nombre, campo_precio, _) in RECURSOS.items():
+            datos = list(modelo.objects.order_by('pk').values_list('pk', campo_nombre, campo_precio))
+            self.ids[tipo] = {pk: columna for columna, (pk, _, _) in enumerate(datos)}
+            self.nombres[tipo] = {normalizar_clave(nombre): pk for pk, nombre, _ in datos}
+            self.precios[tipo] = np.array([float(precio) for _, _, precio in datos])
+
+        # Coeficientes: costo de la linea = coeficiente * precio del recurso. Las
+        # lineas con rendimiento 0 no suman, igual que en SQL (_dividir da NULL)
+        lineas = {
+            'material': [
+                (rubro, recurso, float(cantidad))
+                for rubro, recurso, cantidad in RubroMaterial.objects.values_list('rubro_id', 'material_id', 'cantidad_requerida')
+            ],
+            'herramienta': [
+                (rubro, recurso, float(cantidad) / float(rendimiento))
+                for rubro, recurso, cantidad, rendimiento in RubroHerramienta.objects.exclude(rendimiento=0).values_list(
+                    'rubro_id', 'herramienta_id', 'cantidad_requerida', 'rendimiento')
+            ],
+            'salario': [
+                (rubro, recurso, float(cantidad) / float(rendimiento))
+                for rubro, recurso, cantidad, rendimiento in RubroManoObra.objects.filter(
+                    mano_obra__salario_minimo__isnull=False).exclude(rendimiento=0).values_list(
+                    'rubro_id', 'mano_obra__salario_minimo_id', 'cantidad', 'rendimiento')
+            ],
+        }
+        self.coeficientes = {}
+        for tipo, filas in lineas.items():
+            filas.sort()
+            self.coeficientes[tipo] = (
+                np.array([posicion[rubro] for rubro, _, _ in filas], dtype=np.int64),
+                np.array([self.ids[tipo][recurso] for _, recurso, _ in filas], dtype=np.int64),
+                np.array([coeficiente for _, _, coeficiente in filas]),
+            )
+
+        # Lineas de presupuestos para propagar los costos simulados
+        presupuestos = list(RubroPresupuesto.objects.values_list('presupuesto_id', 'rubro_id', 'cantidad'))
+        self.presupuestos = np.array(sorted({presupuesto for presupuesto, _, _ in presupuestos}), dtype=np.int64)
+        fila_presupuesto = {presupuesto: fila for fila, presupuesto in enumerate(self.presupuestos.tolist())}
+        self.lineas_presupuesto = (
+            np.array([fila_presupuesto[presupuesto] for presupuesto, _, _ in presupuestos], dtype=np.int64),
+            np.array([posicion[rubro] for _, rubro, _ in presupuestos], dtype=np.int64),
+            np.array([float(cantidad) for _, _, cantidad in presupuestos]),
+        )
+
+    def _resolver(self, tipo, recurso):
+        # Acepta el id del recurso o su nombre
+        if isinstance(recurso, int) or str(recurso).isdigit():
+            pk = int(recurso)
+        else:
+            pk = self.nombres[tipo].get(normalizar_clave(recurso))
+        if pk not in self.ids[tipo]:
+            raise KeyError(f"No existe {tipo} '{recurso}'.")
+        return self.ids[tipo][pk]
+
+    def matriz_precios(self, tipo, escenarios):
+        """
+        Precios del recurso por columna de escenario (recursos x escenarios).
+        """
+        clave_global = RECURSOS[tipo][3]
+        factores = np.ones((len(self.precios[tipo]), len(escenarios)))
+        for columna, escenario in enumerate(escenarios):
+            factores[:, columna] *= 1 + float(escenario.get(clave_global, 0)) / 100
+            for recurso, variacion in escenario.get(tipo, {}).items():
+                factores[self._resolver(tipo, recurso), columna] *= 1 + float(variacion) / 100
+        return self.precios[tipo][:, None] * factores
+
+    def _costos(self, precios):
+        """
+        Producto de la matriz dispersa de coeficientes por la matriz de
+        precios (recursos x escenarios). Redondea igual que with_costos().
+        """
+        subtotal = np.zeros((len(self.rubros), precios['material'].shape[1]))
+        for tipo, (filas, columnas, valores) in self.coeficientes.items():
+            if not len(filas):
+                continue
+            aportes = valores[:, None] * precios[tipo][columnas]
+            # Las lineas estan ordenadas por rubro: se suman por tramos contiguos
+            inicios = np.flatnonzero(np.r_[True, filas[1:] != filas[:-1]])
+            subtotal[filas[inicios]] += np.round(np.add.reduceat(aportes, inicios, axis=0), 2)
+        return subtotal + np.round(subtotal * self.indirectos[:, None], 2)
+
+    def _presupuestos(self, costos):
+        filas, rubros, cantidades = self.lineas_presupuesto
+        totales = np.zeros((len(self.presupuestos), costos.shape[1]))
+        np.add.at(totales, filas, cantidades[:, None] * costos[rubros])
+        return totales
+
+    def simular(self, escenarios):
+        escenarios = list(escenarios)
+        precios = {tipo: self.matriz_precios(tipo, escenarios) for tipo in RECURSOS}
+        base = {tipo: self.precios[tipo][:, None] for tipo in RECURSOS}
+
+        costos = self._costos(precios)
+        costo_base = self._costos(base)
+        totales = self._presupuestos(costos)
+        totales_base = self._presupuestos(costo_base)
+
+        return ResultadoSimulacion(
+            escenarios=[escenario.get('nombre', f"Escenario {numero}") for numero, escenario in enumerate(escenarios, start=1)],
+            rubros=self.rubros,
+            costo_base=costo_base[:, 0],
+            costos=costos,
+            presupuestos={
+                presupuesto: (totales_base[fila, 0], totales[fila])
+                for fila, presupuesto in enumerate(self.presupuestos.tolist())
+            },
+        )
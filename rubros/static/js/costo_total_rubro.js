@@ -1,69 +1,131 @@
 document.addEventListener("DOMContentLoaded", function() {
-    // Obtén los elementos para el costo total de materiales, herramientas y mano de obra por id
-    const costoTotalMaterialesElement = document.querySelector('.form-row.field-get_costo_total_materiales .readonly');
-    const costoTotalHerramientasElement = document.querySelector('.form-row.field-get_costo_total_herramientas .readonly');
-    const costoTotalManoObraElement = document.querySelector('.form-row.field-get_costo_total_mano_de_obra .readonly');
-    const indirectos = document.getElementById('id_indirectos').value;
-
-    // Verifica que los elementos de costo estén presentes y obtén sus valores de texto
-    const costoTotalMateriales = costoTotalMaterialesElement ? parseFloat(costoTotalMaterialesElement.textContent.trim()) : 0;
-    const costoTotalHerramientas = costoTotalHerramientasElement ? parseFloat(costoTotalHerramientasElement.textContent.trim()) : 0;
-    const costoTotalManoObra = costoTotalManoObraElement ? parseFloat(costoTotalManoObraElement.textContent.trim()) : 0;
+    // Los totales se calculan en el servidor (Decimal exacto) a partir de las lineas
+    // visibles en la pagina, incluso si aun no se han guardado
+    const indirectosInput = document.getElementById('id_indirectos');
+    const container = document.getElementById("rubromanoobra_set-group"); // Cambia este ID si el contenedor es diferente
+    if (!indirectosInput || !container) {
+        return;
+    }
+    const url = window.location.pathname.replace(/(add|[^/]+\/change)\/$/, 'costos/');
+    const csrfInput = document.querySelector('input[name="csrfmiddlewaretoken"]');
 
-    // Calcula la suma subtotal
-    const sumaSubTotal = costoTotalMateriales + costoTotalHerramientas + costoTotalManoObra;
+    // Grupos de inlines: prefijo del formset, campo del recurso, campo de cantidad y celda del costo de la linea
+    const grupos = {
+        materiales: {prefijo: 'rubromaterial_set', recurso: 'material', cantidad: 'cantidad_requerida', celda: '.field-costo_total p'},
+        herramientas: {prefijo: 'rubroherramienta_set', recurso: 'herramienta', cantidad: 'cantidad_requerida', celda: '.field-subtotal p'},
+        mano_obra: {prefijo: 'rubromanoobra_set', recurso: 'mano_obra', cantidad: 'cantidad', celda: '.field-subtotal p'},
+    };
 
-    //Calculo de indirectos
-    const indirectosTotal = sumaSubTotal * indirectos/100;
-    
-    //Calculo total
-    const totalRubro = indirectosTotal + sumaSubTotal;
+    function crearFila(fondo) {
+        const fila = document.createElement('div');
+        fila.style.textAlign = "right";
+        fila.style.marginRight = "10em";
+        fila.style.padding = "15px"; // Añade relleno dentro del box
+        fila.style.backgroundColor = fondo; // Fondo azul
+        fila.style.color = "white"; // Texto blanco para contraste
+        fila.style.width = "98%"; // Ocupa todo el ancho del contenedor
+        fila.style.fontSize = "1.1em"; // Tamaño de fuente más grande
+        return fila;
+    }
 
-    const indirectosrow = document.createElement('div');
-    indirectosrow.textContent = `Total del Indirectos: ${indirectosTotal.toFixed(2)}`; // Mostrar con dos decimales
+    const indirectosrow = crearFila("#121c4bad");
     indirectosrow.style.marginTop = "15px";
-    indirectosrow.style.textAlign = "right";
-    indirectosrow.style.marginRight = "10em";
-    indirectosrow.style.padding = "15px"; // Añade relleno dentro del box
-    indirectosrow.style.backgroundColor = "#121c4bad"; // Fondo azul
-    indirectosrow.style.color = "white"; // Texto blanco para contraste
-    indirectosrow.style.width = "98%"; // Ocupa todo el ancho del contenedor
-    indirectosrow.style.fontSize = "1.1em"; // Tamaño de fuente más grande
     indirectosrow.style.borderBottom = "2px solid #ffffff";
     indirectosrow.style.borderColor = '#121939d9';
 
-
     // Crea un elemento para mostrar la suma subtotal
-    const subtotalRow = document.createElement("div");
-    subtotalRow.textContent = `Subtotal APU: ${sumaSubTotal.toFixed(2)}`; // Mostrar con dos decimales
-    subtotalRow.style.textAlign = "right";
-    subtotalRow.style.marginRight = "10em";
-    subtotalRow.style.padding = "15px"; // Añade relleno dentro del box
-    subtotalRow.style.backgroundColor = "#121c4bad"; // Fondo azul
-    subtotalRow.style.color = "white"; // Texto blanco para contraste
-    subtotalRow.style.width = "98%"; // Ocupa todo el ancho del contenedor
-    subtotalRow.style.fontSize = "1.1em"; // Tamaño de fuente más grande
+    const subtotalRow = crearFila("#121c4bad");
     subtotalRow.style.borderBottom = "2px solid #ffffff";
     subtotalRow.style.borderColor = '#121939d9';
 
-    const totalRow = document.createElement("div");
-    totalRow.textContent = `Total APU: ${totalRubro.toFixed(2)}`; // Mostrar con dos decimales
+    const totalRow = crearFila("#121c4b");
     totalRow.style.fontWeight = "bold";
-    totalRow.style.textAlign = "right";
-    totalRow.style.marginRight = "10em";
-    totalRow.style.padding = "15px"; // Añade relleno dentro del box
-    totalRow.style.backgroundColor = "#121c4b"; // Fondo azul
-    totalRow.style.color = "white"; // Texto blanco para contraste
-    totalRow.style.width = "98%"; // Ocupa todo el ancho del contenedor
-    totalRow.style.fontSize = "1.1em"; // Tamaño de fuente más grande
 
+    // Agrega los totales al final del contenido
+    container.appendChild(indirectosrow);
+    container.appendChild(subtotalRow);
+    container.appendChild(totalRow);
 
-    // Agrega el total sumado al final del contenido
-    const container = document.getElementById("rubromanoobra_set-group"); // Cambia este ID si el contenedor es diferente
-    if (container) {
-        container.appendChild(indirectosrow);
-        container.appendChild(subtotalRow);
-        container.appendChild(totalRow);
+    // Lee las lineas de cada inline que tienen recurso seleccionado y no estan marcadas para borrar
+    function leerLineas(grupo) {
+        const filas = [];
+        const lineas = [];
+        document.querySelectorAll(`#${grupo.prefijo}-group tr.form-row:not(.empty-form)`).forEach(function(fila) {
+            const recurso = fila.querySelector(`[name$="-${grupo.recurso}"]`);
+            const borrar = fila.querySelector('[name$="-DELETE"]');
+            if (!recurso || !recurso.value || (borrar && borrar.checked)) {
+                return;
+            }
+            const cantidad = fila.querySelector(`[name$="-${grupo.cantidad}"]`);
+            const rendimiento = fila.querySelector('[name$="-rendimiento"]');
+            const linea = {cantidad: cantidad ? cantidad.value : 0, rendimiento: rendimiento ? rendimiento.value : 1};
+            linea[grupo.recurso] = recurso.value;
+            filas.push(fila);
+            lineas.push(linea);
+        });
+        return {filas: filas, lineas: lineas};
+    }
+
+    function mostrar(costos, filasPorGrupo) {
+        indirectosrow.textContent = `Total del Indirectos: ${costos.costo_indirectos}`;
+        subtotalRow.textContent = `Subtotal APU: ${costos.costo_subtotal}`;
+        totalRow.textContent = `Total APU: ${costos.costo_total}`;
+
+        const totales = {
+            materiales: [costos.costo_materiales, 'total-materiales', 'Costo Total de Materiales'],
+            herramientas: [costos.costo_herramientas, 'total-herramientas', 'Costo Total de Herramientas'],
+            mano_obra: [costos.costo_mano_obra, 'total-mano-obra', 'Costo Total de Mano de Obra'],
+        };
+        Object.keys(totales).forEach(function(tipo) {
+            const [valor, id, texto] = totales[tipo];
+            const elemento = document.getElementById(id);
+            if (elemento) {
+                elemento.textContent = `${texto}: ${valor}`;
+            }
+            // Costo de cada linea en su celda de solo lectura
+            filasPorGrupo[tipo].forEach(function(fila, indice) {
+                const celda = fila.querySelector(grupos[tipo].celda);
+                if (celda) {
+                    celda.textContent = costos.lineas[tipo][indice];
+                }
+            });
+        });
+    }
+
+    let pendiente = null;
+    function actualizar() {
+        clearTimeout(pendiente);
+        pendiente = setTimeout(function() {
+            const datos = {indirectos: indirectosInput.value || 0};
+            const filasPorGrupo = {};
+            Object.keys(grupos).forEach(function(tipo) {
+                const leidas = leerLineas(grupos[tipo]);
+                datos[tipo] = leidas.lineas;
+                filasPorGrupo[tipo] = leidas.filas;
+            });
+            fetch(url, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrfInput ? csrfInput.value : ''},
+                credentials: 'same-origin',
+                body: JSON.stringify(datos),
+            })
+                .then(function(respuesta) { return respuesta.ok ? respuesta.json() : null; })
+                .then(function(costos) {
+                    if (costos) {
+                        mostrar(costos, filasPorGrupo);
+                    }
+                });
+        }, 300);
+    }
 
+    // Recalcula cuando cambia cualquier campo del formulario (incluye filas agregadas despues)
+    const formulario = indirectosInput.form;
+    formulario.addEventListener('input', actualizar);
+    formulario.addEventListener('change', actualizar);
+    document.addEventListener('formset:removed', actualizar);
+    if (window.django && django.jQuery) {
+        // Los selectores con autocompletado disparan el evento change mediante jQuery
+        django.jQuery(formulario).on('change', 'select', actualizar);
     }
+    actualizar();
 });
@@ -8,6 +8,7 @@ document.addEventListener("DOMContentLoaded", function() {
 
     // Crea un elemento para mostrar el total de herramientas
     const totalRow = document.createElement("div");
+    totalRow.id = "total-herramientas"; // Se actualiza en vivo desde costo_total_rubro.js
     totalRow.textContent = `Costo Total de Herramientas: ${totalCosto}`;
     totalRow.style.fontWeight = "bold";
     totalRow.style.marginTop = "10px";
@@ -8,6 +8,7 @@ document.addEventListener("DOMContentLoaded", function() {
 
     // Crea un elemento para mostrar el total
     const totalRow = document.createElement("div");
+    totalRow.id = "total-materiales"; // Se actualiza en vivo desde costo_total_rubro.js
     totalRow.textContent = `Costo Total de Materiales: ${totalCosto}`;
     totalRow.style.fontWeight = "bold";
     totalRow.style.marginTop = "10px";
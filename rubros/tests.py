@@ -1,3 +1,160 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .models import (
+    CostoRubro,
+    Herramienta,
+    ManoObra,
+    Material,
+    Rubro,
+    RubroHerramienta,
+    RubroManoObra,
+    RubroMaterial,
+    SalarioMinimo,
+    Unidad,
+)
+
+
+class RubroChangeViewTests(TestCase):
+    # Consultas maximas de la pagina de edicion de un rubro, sin importar sus lineas
+    PRESUPUESTO_CONSULTAS = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+        cls.unidad = Unidad.objects.create(nombre='metro', abreviatura='m')
+        cls.salario = SalarioMinimo.objects.create(cargo='peon', salario_horario_minimo=Decimal('4.00'))
+
+    def crear_rubro(self, codigo, lineas):
+        with self.captureOnCommitCallbacks(execute=True):
+            rubro = Rubro.objects.create(nombre=f'Rubro {codigo}', codigo=codigo)
+            for i in range(lineas):
+                material = Material.objects.create(nombre=f'Material {codigo} {i}', unidad=self.unidad, costo_por_unidad=Decimal('1.50'))
+                herramienta = Herramienta.objects.create(nombre=f'Herramienta {codigo} {i}', unidad=self.unidad, costo_por_unidad=Decimal('2.00'))
+                mano_obra = ManoObra.objects.create(cargo=f'Cargo {codigo}{i}', salario_minimo=self.salario)
+                RubroMaterial.objects.create(rubro=rubro, material=material, cantidad_requerida=Decimal('2'))
+                RubroHerramienta.objects.create(rubro=rubro, herramienta=herramienta, rendimiento=Decimal('2'))
+                RubroManoObra.objects.create(rubro=rubro, mano_obra=mano_obra, cantidad=Decimal('1'), rendimiento=Decimal('3'))
+        return rubro
+
+    def consultas_change_view(self, rubro):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(f'/admin/rubros/rubro/{rubro.pk}/change/')
+        self.assertEqual(respuesta.status_code, 200)
+        return len(consultas)
+
+    def test_consultas_no_dependen_del_numero_de_lineas(self):
+        pequeno = self.crear_rubro('P', 1)
+        grande = self.crear_rubro('G', 60)
+        self.client.force_login(self.usuario)
+        self.consultas_change_view(pequeno)  # carga las caches de la primera peticion (tipos de contenido)
+
+        consultas_pequeno = self.consultas_change_view(pequeno)
+        consultas_grande = self.consultas_change_view(grande)
+
+        self.assertEqual(consultas_grande, consultas_pequeno)
+        self.assertLessEqual(consultas_grande, self.PRESUPUESTO_CONSULTAS)
+
+
+class CostoRubroTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        unidad = Unidad.objects.create(nombre='metro', abreviatura='m')
+        cls.peon = SalarioMinimo.objects.create(cargo='peon', salario_horario_minimo=Decimal('5.00'))
+        cls.albanil = SalarioMinimo.objects.create(cargo='albanil', salario_horario_minimo=Decimal('6.00'))
+        cls.cemento = Material.objects.create(nombre='Cemento', unidad=unidad, costo_por_unidad=Decimal('2.00'))
+        cls.arena = Material.objects.create(nombre='Arena', unidad=unidad, costo_por_unidad=Decimal('3.00'))
+        cls.mezcladora = Herramienta.objects.create(nombre='Mezcladora', unidad=unidad, costo_por_unidad=Decimal('4.00'))
+        cls.ayudante = ManoObra.objects.create(cargo='Ayudante', salario_minimo=cls.peon)
+        cls.maestro = ManoObra.objects.create(cargo='Maestro', salario_minimo=cls.albanil)
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.hormigon = Rubro.objects.create(nombre='Hormigon', codigo='H')
+            RubroMaterial.objects.create(rubro=cls.hormigon, material=cls.cemento, cantidad_requerida=Decimal('3'))
+            RubroHerramienta.objects.create(rubro=cls.hormigon, herramienta=cls.mezcladora, rendimiento=Decimal('2'))
+            RubroManoObra.objects.create(rubro=cls.hormigon, mano_obra=cls.ayudante, cantidad=Decimal('1'), rendimiento=Decimal('4'))
+            cls.enlucido = Rubro.objects.create(nombre='Enlucido', codigo='E')
+            RubroMaterial.objects.create(rubro=cls.enlucido, material=cls.arena, cantidad_requerida=Decimal('2'))
+            RubroManoObra.objects.create(rubro=cls.enlucido, mano_obra=cls.maestro, cantidad=Decimal('1'), rendimiento=Decimal('2'))
+            cls.mortero = Rubro.objects.create(nombre='Mortero', codigo='M')
+            RubroMaterial.objects.create(rubro=cls.mortero, material=cls.cemento, cantidad_requerida=Decimal('1'))
+
+    def cambiar(self, cambio):
+        """Aplica el cambio y devuelve los rubros que marco para recalcular; luego ejecuta el recalculo."""
+        with self.captureOnCommitCallbacks() as recalculos:
+            cambio()
+        marcados = set(CostoRubro.objects.filter(desactualizado=True).values_list('rubro_id', flat=True))
+        for recalculo in recalculos:
+            recalculo()
+        return marcados
+
+    def assertCostosAlDia(self):
+        self.assertFalse(CostoRubro.objects.filter(desactualizado=True).exists())
+        for rubro in Rubro.objects.with_costos().select_related('costo'):
+            for campo in Rubro.CAMPOS_COSTO:
+                self.assertEqual(getattr(rubro.costo, campo), getattr(rubro, campo), (rubro, campo))
+
+    def costo_total(self, rubro):
+        return CostoRubro.objects.get(rubro=rubro).costo_total
+
+    def test_costos_iniciales(self):
+        # 3 x 2.00 + 4.00 / 2 + 5.00 / 4 = 9.25, mas 20 % de indirectos
+        self.assertEqual(self.costo_total(self.hormigon), Decimal('11.10'))
+        self.assertCostosAlDia()
+
+    def test_precio_de_material_recalcula_solo_sus_rubros(self):
+        def cambio():
+            self.cemento.costo_por_unidad = Decimal('2.50')
+            self.cemento.save()
+
+        self.assertEqual(self.cambiar(cambio), {self.hormigon.pk, self.mortero.pk})
+        self.assertEqual(self.costo_total(self.hormigon), Decimal('12.90'))
+        self.assertEqual(self.costo_total(self.mortero), Decimal('3.00'))
+        self.assertCostosAlDia()
+
+    def test_precio_de_herramienta_recalcula_solo_sus_rubros(self):
+        def cambio():
+            self.mezcladora.costo_por_unidad = Decimal('6.00')
+            self.mezcladora.save()
+
+        self.assertEqual(self.cambiar(cambio), {self.hormigon.pk})
+        self.assertEqual(self.costo_total(self.hormigon), Decimal('12.30'))
+        self.assertCostosAlDia()
+
+    def test_salario_recalcula_solo_los_rubros_de_su_mano_de_obra(self):
+        def cambio():
+            self.albanil.salario_horario_minimo = Decimal('8.00')
+            self.albanil.save()
+
+        self.assertEqual(self.cambiar(cambio), {self.enlucido.pk})
+        self.assertEqual(self.costo_total(self.enlucido), Decimal('12.00'))
+        self.assertCostosAlDia()
+
+    def test_lineas_del_apu_recalculan_solo_su_rubro(self):
+        linea = RubroMaterial.objects.get(rubro=self.mortero)
+
+        def agregar():
+            RubroMaterial.objects.create(rubro=self.mortero, material=self.arena, cantidad_requerida=Decimal('1'))
+        self.assertEqual(self.cambiar(agregar), {self.mortero.pk})
+        self.assertEqual(self.costo_total(self.mortero), Decimal('6.00'))
+
+        def editar():
+            linea.cantidad_requerida = Decimal('2')
+            linea.save()
+        self.assertEqual(self.cambiar(editar), {self.mortero.pk})
+        self.assertEqual(self.costo_total(self.mortero), Decimal('8.40'))
+
+        self.assertEqual(self.cambiar(linea.delete), {self.mortero.pk})
+        self.assertEqual(self.costo_total(self.mortero), Decimal('3.60'))
+        self.assertCostosAlDia()
+
+    def test_cambio_que_no_afecta_costos_no_marca_rubros(self):
+        def cambio():
+            self.cemento.nombre = 'Cemento portland'
+            self.cemento.save()
 
-# Create your tests here.
+        self.assertEqual(self.cambiar(cambio), set())
+        self.assertCostosAlDia()
@@ -0,0 +1,53 @@
+"""Tareas en segundo plano del catalogo de rubros."""
+from django import forms
+from django.db.models import Q
+
+from tareas.registro import Trabajo, registrar
+
+from .admin import ListaPreciosForm
+from .models import CostoRubro, Rubro
+from .precios import importar_precios, leer_lista_precios
+
+
+class ListaPreciosTareaForm(ListaPreciosForm):
+    segundo_plano = None
+
+
+class RecalcularCostosForm(forms.Form):
+    todos = forms.BooleanField(required=False, help_text="Reconstruir todos los costos, no solo los desactualizados o faltantes.")
+
+
+@registrar
+class ImportarPrecios(Trabajo):
+    nombre = 'importar_precios'
+    descripcion = "Importar lista de precios (CSV)"
+    formulario = ListaPreciosTareaForm
+
+    def ejecutar(self, tarea, datos):
+        archivo = tarea.archivos.get()
+        filas = leer_lista_precios(bytes(archivo.contenido), tipo=tarea.parametros.get('tipo'))
+        resultado = importar_precios(filas, aplicar=not tarea.parametros.get('simular'))
+        return {
+            'filas': len(filas),
+            'cambiados': resultado.cambiados,
+            'sin_cambios': resultado.sin_cambios,
+            'no_encontrados': resultado.no_encontrados,
+            'rubros_afectados': resultado.rubros_afectados,
+        }
+
+
+@registrar
+class RecalcularCostos(Trabajo):
+    nombre = 'recalcular_costos'
+    descripcion = "Recalcular los costos almacenados de los rubros"
+    formulario = RecalcularCostosForm
+
+    def partes(self, tarea):
+        rubros = Rubro.objects.order_by('pk')
+        if not tarea.parametros.get('todos'):
+            rubros = rubros.filter(Q(costo__desactualizado=True) | Q(costo=None))
+        ids = list(rubros.values_list('pk', flat=True))
+        return [ids[inicio:inicio + CostoRubro.TAMANO_LOTE] for inicio in range(0, len(ids), CostoRubro.TAMANO_LOTE)]
+
+    def ejecutar(self, tarea, datos):
+        return {'rubros': CostoRubro.recalcular(datos)}
@@ -1,13 +1,14 @@
 from django.contrib import admin
 from .models import SeguimientoDiario, ManoObraSeguimiento, HerramientaSeguimiento
+from rubros.autocompletar import AutocompletarRecursosMixin
 
-class ManoObraSeguimientoInline(admin.TabularInline):
+class ManoObraSeguimientoInline(AutocompletarRecursosMixin, admin.TabularInline):
     model = ManoObraSeguimiento
     extra = 1
     fields = ('mano_obra', 'cantidad', 'rendimiento', 'costo_horario', 'costo_total')
     readonly_fields = ('costo_total',)
 
-class HerramientaSeguimientoInline(admin.TabularInline):
+class HerramientaSeguimientoInline(AutocompletarRecursosMixin, admin.TabularInline):
     model = HerramientaSeguimiento
     extra = 1
     fields = ('herramienta', 'cantidad', 'rendimiento', 'costo_horario', 'costo_total')
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('rubros', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeguimientoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha del seguimiento')),
+                ('observaciones', models.TextField(blank=True, help_text='Observaciones generales del día', null=True)),
+                ('rubro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seguimientos_diarios', to='rubros.rubro')),
+            ],
+            options={
+                'verbose_name': 'Seguimiento Diario',
+                'verbose_name_plural': 'Seguimiento Diario',
+            },
+        ),
+        migrations.CreateModel(
+            name='ManoObraSeguimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Cantidad trabajada')),
+                ('rendimiento', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Rendimiento diario')),
+                ('costo_horario', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Costo horario')),
+                ('mano_obra', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seguimientos', to='rubros.manoobra')),
+                ('seguimiento_diario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mano_obra_seguimiento', to='seguimiento_de_obra.seguimientodiario')),
+            ],
+            options={
+                'verbose_name': 'Seguimiento de Mano de Obra',
+                'verbose_name_plural': 'Seguimientos de Mano de Obra',
+            },
+        ),
+        migrations.CreateModel(
+            name='HerramientaSeguimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Cantidad utilizada')),
+                ('rendimiento', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Rendimiento diario')),
+                ('costo_horario', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Costo horario')),
+                ('herramienta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seguimientos', to='rubros.herramienta')),
+                ('seguimiento_diario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='herramientas_seguimiento', to='seguimiento_de_obra.seguimientodiario')),
+            ],
+            options={
+                'verbose_name': 'Seguimiento de Herramientas',
+                'verbose_name_plural': 'Seguimientos de Herramientas',
+            },
+        ),
+    ]
@@ -0,0 +1,127 @@
+import json
+
+from django import forms
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.utils.html import format_html
+
+from . import cola, registro
+from .models import ParteTarea, Tarea
+
+
+def _json(valor):
+    return format_html('<pre>{}</pre>', json.dumps(valor, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2))
+
+
+# Solo las partes que faltan: una tarea grande puede tener miles
+class ParteTareaInline(admin.TabularInline):
+    model = ParteTarea
+    verbose_name_plural = "Partes sin completar"
+    extra = 0
+    fields = ('numero', 'estado', 'intentos', 'disponible_desde', 'trabajador', 'error')
+    readonly_fields = fields
+    can_delete = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).exclude(estado=ParteTarea.COMPLETADA).defer('datos', 'resultado')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.action(description="Cancelar las tareas seleccionadas")
+def cancelar_tareas(modeladmin, request, queryset):
+    modeladmin.message_user(request, f"Tareas canceladas: {cola.cancelar(queryset)}.")
+
+
+@admin.action(description="Reintentar las tareas fallidas o canceladas")
+def reintentar_tareas(modeladmin, request, queryset):
+    modeladmin.message_user(request, f"Tareas encoladas de nuevo: {cola.reintentar(queryset)}.")
+
+
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'descripcion', 'estado', 'barra_progreso', 'usuario', 'creada', 'terminada')
+    list_filter = ('estado', 'tipo')
+    list_select_related = ('usuario',)
+    fields = (
+        'tipo', 'descripcion', 'estado', 'barra_progreso', 'usuario', 'creada', 'iniciada', 'terminada',
+        'intentos', 'trabajador', 'lista_archivos', 'parametros_legibles', 'resultado_legible', 'error_legible',
+    )
+    readonly_fields = fields
+    inlines = [ParteTareaInline]
+    actions = [cancelar_tareas, reintentar_tareas]
+    change_form_template = 'admin/tareas/tarea/change_form.html'
+
+    @admin.display(description="Descripción")
+    def descripcion(self, obj):
+        trabajo = registro.TRABAJOS.get(obj.tipo)
+        return trabajo.descripcion if trabajo else '-'
+
+    @admin.display(description="Progreso")
+    def barra_progreso(self, obj):
+        if obj.progreso is None:
+            return '-'
+        return format_html(
+            '<progress value="{}" max="100"></progress> {} de {} partes',
+            obj.progreso, obj.partes_completadas, obj.total_partes or 0,
+        )
+
+    @admin.display(description="Archivos")
+    def lista_archivos(self, obj):
+        return ', '.join(obj.archivos.order_by('pk').values_list('nombre', flat=True)) or '-'
+
+    @admin.display(description="Parámetros")
+    def parametros_legibles(self, obj):
+        return _json(obj.parametros)
+
+    @admin.display(description="Resultado")
+    def resultado_legible(self, obj):
+        return _json(obj.resultado) if obj.resultado else '-'
+
+    @admin.display(description="Error")
+    def error_legible(self, obj):
+        return format_html('<pre>{}</pre>', obj.error) if obj.error else '-'
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        # Todo es de solo lectura: la tarea la modifican el trabajador y las acciones
+        extra_context = {
+            **(extra_context or {}),
+            'show_save': False, 'show_save_and_continue': False, 'show_save_and_add_another': False,
+        }
+        return super().change_view(request, object_id, form_url, extra_context)
+
+    # Encolar una tarea: primero se elige el tipo y despues se completa su formulario
+    def add_view(self, request, form_url='', extra_context=None):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        tipo = request.GET.get('tipo')
+        trabajo = form = None
+        if tipo:
+            try:
+                trabajo = registro.obtener(tipo)
+            except LookupError:
+                raise Http404(f"No hay un trabajo registrado como '{tipo}'.")
+            formulario = trabajo.formulario or forms.Form
+            form = formulario(request.POST, request.FILES) if request.method == 'POST' else formulario()
+            if form.is_bound and form.is_valid():
+                tarea = Tarea.encolar(
+                    tipo, trabajo.parametros(form.cleaned_data), archivos=trabajo.archivos(form.cleaned_data), usuario=request.user,
+                )
+                self.message_user(request, f"Tarea #{tarea.pk} encolada.")
+                return redirect('admin:tareas_tarea_change', tarea.pk)
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': trabajo.descripcion if trabajo else 'Nueva tarea',
+            'tipos': registro.opciones(),
+            'form': form,
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, 'admin/tareas/tarea/nueva.html', context)
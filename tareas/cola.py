@@ -0,0 +1,226 @@
+"""
+Cola de tareas en la base de datos.
+
+Un trabajador (manage.py procesar_tareas) reclama una unidad a la vez con
+un UPDATE condicionado a su estado: primero las partes pendientes de las
+tareas en curso y, si no hay, una tarea pendiente para dividirla en partes.
+Con SQLite las transacciones IMMEDIATE (settings.DATABASES) serializan los
+reclamos de varios hilos o procesos.
+
+Un error devuelve la parte a la cola despues de una espera que se duplica
+en cada intento, hasta settings.TAREAS_INTENTOS; un ValidationError falla
+la tarea sin reintentar. Las partes en curso por mas de
+settings.TAREAS_TIEMPO_MAXIMO segundos se dan por abandonadas (el
+trabajador se detuvo) y vuelven a la cola.
+"""
+import traceback
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import DateTimeField, F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import registro
+from .models import ParteTarea, Tarea
+
+
+def intentos_maximos():
+    return getattr(settings, 'TAREAS_INTENTOS', 3)
+
+
+def espera_reintento(intentos):
+    return timedelta(seconds=getattr(settings, 'TAREAS_ESPERA_REINTENTO', 30) * 2 ** max(intentos - 1, 0))
+
+
+def tiempo_maximo():
+    return timedelta(seconds=getattr(settings, 'TAREAS_TIEMPO_MAXIMO', 3600))
+
+
+class ParteReclamada(Exception):
+    """La unidad dejo de pertenecer al trabajador: se cancelo, reintento o dio por abandonada."""
+
+
+def _reclamar(candidatas, modelo, trabajador, **campos):
+    ahora = timezone.now()
+    while True:
+        objeto = candidatas.filter(disponible_desde__lte=ahora).first()
+        if objeto is None:
+            return None
+        if modelo.objects.filter(pk=objeto.pk, estado=modelo.PENDIENTE).update(
+            estado=modelo.EN_CURSO, trabajador=trabajador, reclamada_en=ahora, intentos=F('intentos') + 1, **campos,
+        ):
+            objeto.refresh_from_db()
+            return objeto
+
+
+def reclamar(trabajador, tipos=None):
+    """
+    Reclama la siguiente parte pendiente o, si no hay, la siguiente tarea
+    pendiente para dividirla. Devuelve una ParteTarea, una Tarea o None.
+    """
+    partes = ParteTarea.objects.filter(estado=ParteTarea.PENDIENTE, tarea__estado=Tarea.EN_CURSO)
+    tareas = Tarea.objects.filter(estado=Tarea.PENDIENTE)
+    if tipos:
+        partes = partes.filter(tarea__tipo__in=tipos)
+        tareas = tareas.filter(tipo__in=tipos)
+    with transaction.atomic():
+        parte = _reclamar(partes.order_by('tarea_id', 'numero'), ParteTarea, trabajador)
+        if parte is not None:
+            return parte
+        return _reclamar(
+            tareas.order_by('creada', 'pk'), Tarea, trabajador,
+            iniciada=Coalesce('iniciada', Value(timezone.now(), output_field=DateTimeField())),
+        )
+
+
+def _fallar(objeto, trabajador, error):
+    # Devuelve True si el error ya no se reintenta
+    modelo = type(objeto)
+    permanente = isinstance(error, (ValidationError, LookupError))
+    if isinstance(error, ValidationError):
+        mensaje = '\n'.join(error.messages)
+    elif permanente:
+        mensaje = str(error)
+    else:
+        mensaje = ''.join(traceback.format_exception(error))
+    ahora = timezone.now()
+    propia = modelo.objects.filter(pk=objeto.pk, estado=modelo.EN_CURSO, trabajador=trabajador)
+    if not permanente and objeto.intentos < intentos_maximos():
+        propia.update(estado=modelo.PENDIENTE, trabajador='', error=mensaje, disponible_desde=ahora + espera_reintento(objeto.intentos))
+        return False
+    with transaction.atomic():
+        if propia.update(estado=modelo.FALLIDA, error=mensaje, terminada=ahora) and modelo is ParteTarea:
+            Tarea.objects.filter(pk=objeto.tarea_id, estado=Tarea.EN_CURSO).update(
+                estado=Tarea.FALLIDA, error=f"Parte {objeto.numero}: {mensaje}", terminada=ahora,
+            )
+    return True
+
+
+def terminar_si_completa(tarea):
+    """Marca la tarea como completada si ya termino todas sus partes y guarda el resumen."""
+    with transaction.atomic():
+        if not Tarea.objects.filter(pk=tarea.pk, estado=Tarea.EN_CURSO, partes_completadas=F('total_partes')).update(
+            estado=Tarea.COMPLETADA, terminada=timezone.now(), trabajador='', error='',
+        ):
+            return False
+        resultados = ParteTarea.objects.filter(tarea=tarea).order_by('numero').values_list('resultado', flat=True)
+        Tarea.objects.filter(pk=tarea.pk).update(resultado=registro.obtener(tarea.tipo).resumir(resultados.iterator()))
+    return True
+
+
+def planificar(tarea, trabajador):
+    """Divide una tarea reclamada en sus partes."""
+    try:
+        trabajo = registro.obtener(tarea.tipo)
+        with transaction.atomic():
+            partes = [
+                ParteTarea(tarea=tarea, numero=numero, datos=datos)
+                for numero, datos in enumerate(trabajo.partes(tarea), start=1)
+            ]
+            ParteTarea.objects.bulk_create(partes, batch_size=500)
+            if not Tarea.objects.filter(pk=tarea.pk, estado=Tarea.EN_CURSO, trabajador=trabajador, total_partes=None).update(
+                total_partes=len(partes), error='',
+            ):
+                raise ParteReclamada
+    except ParteReclamada:
+        return
+    except Exception as error:
+        _fallar(tarea, trabajador, error)
+        return
+    if not partes:
+        terminar_si_completa(tarea)
+
+
+def ejecutar(parte, trabajador):
+    """Ejecuta una parte reclamada y la marca como completada, o la devuelve a la cola si falla."""
+    tarea = parte.tarea
+    try:
+        trabajo = registro.obtener(tarea.tipo)
+        with transaction.atomic() if trabajo.atomico else nullcontext():
+            resultado = trabajo.ejecutar(tarea, parte.datos) or {}
+            with transaction.atomic():
+                if not ParteTarea.objects.filter(pk=parte.pk, estado=ParteTarea.EN_CURSO, trabajador=trabajador).update(
+                    estado=ParteTarea.COMPLETADA, resultado=resultado, terminada=timezone.now(), error='',
+                ):
+                    # Con atomico se deshace lo que hizo la parte
+                    raise ParteReclamada
+                Tarea.objects.filter(pk=tarea.pk).update(partes_completadas=F('partes_completadas') + 1)
+    except ParteReclamada:
+        return
+    except Exception as error:
+        _fallar(parte, trabajador, error)
+        return
+    terminar_si_completa(tarea)
+
+
+def ejecutar_siguiente(trabajador, tipos=None):
+    """Reclama y procesa una unidad de trabajo; devuelve la unidad o None si no habia."""
+    unidad = reclamar(trabajador, tipos)
+    if isinstance(unidad, ParteTarea):
+        ejecutar(unidad, trabajador)
+    elif unidad is not None:
+        planificar(unidad, trabajador)
+    return unidad
+
+
+def hay_en_curso(tipos=None):
+    """Si algun trabajador esta procesando una parte o dividiendo una tarea."""
+    partes = ParteTarea.objects.filter(estado=ParteTarea.EN_CURSO, tarea__estado=Tarea.EN_CURSO)
+    tareas = Tarea.objects.filter(estado=Tarea.EN_CURSO, total_partes=None)
+    if tipos:
+        partes = partes.filter(tarea__tipo__in=tipos)
+        tareas = tareas.filter(tipo__in=tipos)
+    return partes.exists() or tareas.exists()
+
+
+def recuperar_abandonadas():
+    """
+    Devuelve a la cola las partes y divisiones en curso desde hace mas de
+    TAREAS_TIEMPO_MAXIMO; las que ya agotaron sus intentos fallan.
+    Devuelve cuantas se recuperaron.
+    """
+    ahora = timezone.now()
+    limite = ahora - tiempo_maximo()
+    mensaje = "El trabajador no terminó a tiempo (se detuvo o tardó más de TAREAS_TIEMPO_MAXIMO)."
+    recuperadas = 0
+    with transaction.atomic():
+        for abandonadas in (
+            ParteTarea.objects.filter(estado=ParteTarea.EN_CURSO, reclamada_en__lt=limite),
+            Tarea.objects.filter(estado=Tarea.EN_CURSO, total_partes=None, reclamada_en__lt=limite),
+        ):
+            recuperadas += abandonadas.filter(intentos__lt=intentos_maximos()).update(
+                estado=Tarea.PENDIENTE, trabajador='', error=mensaje, disponible_desde=ahora,
+            )
+            agotadas = abandonadas.filter(intentos__gte=intentos_maximos())
+            if abandonadas.model is ParteTarea:
+                Tarea.objects.filter(pk__in=agotadas.values('tarea_id'), estado=Tarea.EN_CURSO).update(
+                    estado=Tarea.FALLIDA, error=mensaje, terminada=ahora,
+                )
+            agotadas.update(estado=Tarea.FALLIDA, error=mensaje, terminada=ahora)
+    return recuperadas
+
+
+def cancelar(tareas):
+    """Cancela las tareas pendientes o en curso; las partes que ya se ejecutan terminan."""
+    return tareas.filter(estado__in=[Tarea.PENDIENTE, Tarea.EN_CURSO]).update(estado=Tarea.CANCELADA, terminada=timezone.now())
+
+
+def reintentar(tareas):
+    """Vuelve a encolar las tareas fallidas o canceladas; solo se repiten sus partes sin completar."""
+    ids = list(tareas.filter(estado__in=[Tarea.FALLIDA, Tarea.CANCELADA]).values_list('pk', flat=True))
+    ahora = timezone.now()
+    with transaction.atomic():
+        ParteTarea.objects.filter(tarea__in=ids).exclude(estado=ParteTarea.COMPLETADA).update(
+            estado=ParteTarea.PENDIENTE, intentos=0, trabajador='', disponible_desde=ahora, error='',
+        )
+        reiniciadas = Tarea.objects.filter(pk__in=ids)
+        reiniciadas.filter(total_partes=None).update(estado=Tarea.PENDIENTE, intentos=0, disponible_desde=ahora)
+        reiniciadas.exclude(total_partes=None).update(estado=Tarea.EN_CURSO)
+        reiniciadas.update(error='', terminada=None, trabajador='')
+    for tarea in Tarea.objects.filter(pk__in=ids).exclude(total_partes=None):
+        terminar_si_completa(tarea)
+    return len(ids)
@@ -0,0 +1,79 @@
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+
+from tareas import cola, registro
+from tareas.models import ParteTarea
+
+
+class Command(BaseCommand):
+    help = "Procesa la cola de tareas en segundo plano (importaciones y recalculos encolados desde el admin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrencia', type=int, default=1,
+                            help="Hilos que procesan partes a la vez (con SQLite las escrituras igual se turnan).")
+        parser.add_argument('--intervalo', type=float, default=5,
+                            help="Segundos de espera cuando la cola esta vacia.")
+        parser.add_argument('--tipo', action='append', dest='tipos', choices=sorted(registro.TRABAJOS),
+                            help="Solo procesa tareas de este tipo (se puede repetir).")
+        parser.add_argument('--una-vez', action='store_true',
+                            help="Procesa lo que haya en la cola y termina, sin esperar los reintentos programados.")
+
+    def handle(self, *args, **options):
+        if options['concurrencia'] < 1:
+            raise CommandError("--concurrencia debe ser al menos 1.")
+        self.tipos = options['tipos']
+        self.intervalo = options['intervalo']
+        self.una_vez = options['una_vez']
+        self.detener = threading.Event()
+        self.salida = threading.Lock()
+
+        def detener(signum, frame):
+            self.escribir(self.style.WARNING("Deteniendo: se terminan las partes en curso..."))
+            self.detener.set()
+        signal.signal(signal.SIGINT, detener)
+        signal.signal(signal.SIGTERM, detener)
+
+        prefijo = f"{socket.gethostname()}:{os.getpid()}"
+        hilos = [
+            threading.Thread(target=self.trabajar, args=(f"{prefijo}:{numero}",), daemon=True)
+            for numero in range(1, options['concurrencia'] + 1)
+        ]
+        self.escribir(f"Procesando tareas con {len(hilos)} hilo(s).")
+        for hilo in hilos:
+            hilo.start()
+        while any(hilo.is_alive() for hilo in hilos):
+            recuperadas = cola.recuperar_abandonadas()
+            if recuperadas:
+                self.escribir(self.style.WARNING(f"Partes abandonadas devueltas a la cola: {recuperadas}."))
+            close_old_connections()
+            for hilo in hilos:
+                hilo.join(timeout=self.intervalo / len(hilos))
+        connection.close()
+
+    def escribir(self, mensaje):
+        with self.salida:
+            self.stdout.write(mensaje)
+
+    def trabajar(self, trabajador):
+        try:
+            while not self.detener.is_set():
+                unidad = cola.ejecutar_siguiente(trabajador, self.tipos)
+                if unidad is None:
+                    if self.una_vez and not cola.hay_en_curso(self.tipos):
+                        return
+                    self.detener.wait(self.intervalo)
+                    continue
+                unidad.refresh_from_db()
+                if isinstance(unidad, ParteTarea) or unidad.total_partes is None:
+                    self.escribir(f"[{trabajador}] {unidad}: {unidad.get_estado_display().lower()}.")
+                else:
+                    self.escribir(f"[{trabajador}] {unidad}: dividida en {unidad.total_partes} parte(s).")
+                if unidad.error and unidad.estado != ParteTarea.COMPLETADA:
+                    self.escribir(self.style.ERROR(unidad.error.strip().splitlines()[-1]))
+        finally:
+            connection.close()
@@ -0,0 +1,91 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:25
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=100)),
+                ('parametros', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('completada', 'Completada'), ('fallida', 'Fallida'), ('cancelada', 'Cancelada')], default='pendiente', max_length=15)),
+                ('creada', models.DateTimeField(default=django.utils.timezone.now)),
+                ('iniciada', models.DateTimeField(blank=True, null=True)),
+                ('terminada', models.DateTimeField(blank=True, null=True)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('disponible_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('reclamada_en', models.DateTimeField(blank=True, null=True)),
+                ('trabajador', models.CharField(blank=True, max_length=100)),
+                ('total_partes', models.PositiveIntegerField(blank=True, null=True)),
+                ('partes_completadas', models.PositiveIntegerField(default=0)),
+                ('resultado', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('error', models.TextField(blank=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Tarea',
+                'verbose_name_plural': 'Tareas',
+            },
+        ),
+        migrations.CreateModel(
+            name='ParteTarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveIntegerField()),
+                ('datos', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('completada', 'Completada'), ('fallida', 'Fallida')], default='pendiente', max_length=15)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('disponible_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('reclamada_en', models.DateTimeField(blank=True, null=True)),
+                ('trabajador', models.CharField(blank=True, max_length=100)),
+                ('terminada', models.DateTimeField(blank=True, null=True)),
+                ('resultado', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('error', models.TextField(blank=True)),
+                ('tarea', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='partes', to='tareas.tarea')),
+            ],
+            options={
+                'verbose_name': 'Parte de tarea',
+                'verbose_name_plural': 'Partes de tareas',
+                'ordering': ['tarea', 'numero'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivoTarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255)),
+                ('contenido', models.BinaryField()),
+                ('tarea', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archivos', to='tareas.tarea')),
+            ],
+            options={
+                'verbose_name': 'Archivo de tarea',
+                'verbose_name_plural': 'Archivos de tareas',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tarea',
+            index=models.Index(fields=['estado', 'disponible_desde'], name='tareas_tare_estado_27d332_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='partetarea',
+            index=models.Index(fields=['estado', 'disponible_desde'], name='tareas_part_estado_44b585_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='partetarea',
+            constraint=models.UniqueConstraint(fields=('tarea', 'numero'), name='parte_unica_por_tarea'),
+        ),
+    ]
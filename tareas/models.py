@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.utils import timezone
+
+
+class Tarea(models.Model):
+    PENDIENTE = 'pendiente'
+    EN_CURSO = 'en_curso'
+    COMPLETADA = 'completada'
+    FALLIDA = 'fallida'
+    CANCELADA = 'cancelada'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_CURSO, 'En curso'),
+        (COMPLETADA, 'Completada'),
+        (FALLIDA, 'Fallida'),
+        (CANCELADA, 'Cancelada'),
+    ]
+
+    tipo = models.CharField(max_length=100)
+    parametros = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    estado = models.CharField(max_length=15, choices=ESTADOS, default=PENDIENTE)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    creada = models.DateTimeField(default=timezone.now)
+    iniciada = models.DateTimeField(null=True, blank=True)
+    terminada = models.DateTimeField(null=True, blank=True)
+    # Reintentos de la division en partes; los de cada parte van en ParteTarea
+    intentos = models.PositiveSmallIntegerField(default=0)
+    disponible_desde = models.DateTimeField(default=timezone.now)
+    reclamada_en = models.DateTimeField(null=True, blank=True)
+    trabajador = models.CharField(max_length=100, blank=True)
+    # None mientras la tarea no se divide en partes
+    total_partes = models.PositiveIntegerField(null=True, blank=True)
+    partes_completadas = models.PositiveIntegerField(default=0)
+    resultado = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "Tarea"
+        verbose_name_plural = "Tareas"
+        indexes = [models.Index(fields=['estado', 'disponible_desde'])]
+
+    @classmethod
+    def encolar(cls, tipo, parametros=None, archivos=(), usuario=None):
+        """Crea una tarea pendiente con sus archivos, una lista de (nombre, contenido)."""
+        with transaction.atomic():
+            tarea = cls.objects.create(tipo=tipo, parametros=parametros or {}, usuario=usuario)
+            ArchivoTarea.objects.bulk_create([
+                ArchivoTarea(tarea=tarea, nombre=nombre, contenido=contenido) for nombre, contenido in archivos
+            ])
+        return tarea
+
+    @property
+    def activa(self):
+        return self.estado in (self.PENDIENTE, self.EN_CURSO)
+
+    @property
+    def progreso(self):
+        """Porcentaje de partes completadas, o None si aun no se dividio en partes."""
+        if not self.total_partes:
+            return 100 if self.estado == self.COMPLETADA else None
+        return self.partes_completadas * 100 // self.total_partes
+
+    def __str__(self):
+        return f"{self.tipo} #{self.pk}"
+
+
+class ParteTarea(models.Model):
+    PENDIENTE = 'pendiente'
+    EN_CURSO = 'en_curso'
+    COMPLETADA = 'completada'
+    FALLIDA = 'fallida'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_CURSO, 'En curso'),
+        (COMPLETADA, 'Completada'),
+        (FALLIDA, 'Fallida'),
+    ]
+
+    tarea = models.ForeignKey(Tarea, on_delete=models.CASCADE, related_name='partes')
+    numero = models.PositiveIntegerField()
+    datos = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    estado = models.CharField(max_length=15, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    disponible_desde = models.DateTimeField(default=timezone.now)
+    reclamada_en = models.DateTimeField(null=True, blank=True)
+    trabajador = models.CharField(max_length=100, blank=True)
+    terminada = models.DateTimeField(null=True, blank=True)
+    resultado = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "Parte de tarea"
+        verbose_name_plural = "Partes de tareas"
+        ordering = ['tarea', 'numero']
+        constraints = [models.UniqueConstraint(fields=['tarea', 'numero'], name='parte_unica_por_tarea')]
+        indexes = [models.Index(fields=['estado', 'disponible_desde'])]
+
+    def __str__(self):
+        return f"{self.tarea} parte {self.numero}"
+
+
+class ArchivoTarea(models.Model):
+    tarea = models.ForeignKey(Tarea, on_delete=models.CASCADE, related_name='archivos')
+    nombre = models.CharField(max_length=255)
+    contenido = models.BinaryField()
+
+    class Meta:
+        verbose_name = "Archivo de tarea"
+        verbose_name_plural = "Archivos de tareas"
+
+    def __str__(self):
+        return self.nombre
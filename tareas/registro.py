@@ -0,0 +1,76 @@
+"""
+Tipos de tarea en segundo plano.
+
+Cada app declara sus trabajos en un modulo trabajos.py, que se carga al
+iniciar Django, con una subclase de Trabajo decorada con @registrar. Un
+trabajo divide la tarea en partes (partes()) y ejecuta una parte a la vez
+(ejecutar()); las partes quedan guardadas al dividir la tarea, asi que
+reintentarla solo repite las que no terminaron.
+"""
+from django.core.files.uploadedfile import UploadedFile
+
+TRABAJOS = {}
+
+
+def _subidos(valor):
+    valores = valor if isinstance(valor, (list, tuple)) else [valor]
+    return [archivo for archivo in valores if isinstance(archivo, UploadedFile)]
+
+
+class Trabajo:
+    nombre = None  # identificador guardado en Tarea.tipo
+    descripcion = ''
+    formulario = None  # Form del admin para encolar la tarea; los archivos se guardan aparte
+    # Con atomico cada parte corre en una transaccion junto con su marca de
+    # completada: si falla no deja nada a medias. Los trabajos que manejan sus
+    # propias transacciones deben poder repetir una parte sin duplicar datos.
+    atomico = True
+
+    def parametros(self, datos):
+        """Parametros de la tarea a partir del cleaned_data del formulario, sin los archivos."""
+        return {campo: valor for campo, valor in datos.items() if not _subidos(valor)}
+
+    def archivos(self, datos):
+        """(nombre, contenido) de los archivos subidos en el formulario."""
+        return [(archivo.name, archivo.read()) for valor in datos.values() for archivo in _subidos(valor)]
+
+    def partes(self, tarea):
+        """Lista de datos (serializables en JSON) de cada parte; por defecto una sola."""
+        return [None]
+
+    def ejecutar(self, tarea, datos):
+        """Ejecuta una parte y devuelve un diccionario con su resultado."""
+        raise NotImplementedError
+
+    def resumir(self, resultados):
+        """Combina los resultados de las partes: suma los numeros y junta las listas."""
+        resumen = {}
+        for resultado in resultados:
+            for clave, valor in (resultado or {}).items():
+                if isinstance(valor, bool) or not isinstance(valor, (int, float, list)):
+                    resumen[clave] = valor
+                elif isinstance(valor, list):
+                    resumen.setdefault(clave, []).extend(valor)
+                else:
+                    resumen[clave] = resumen.get(clave, 0) + valor
+        return resumen
+
+
+def registrar(clase):
+    if not clase.nombre:
+        raise ValueError(f"{clase.__name__} necesita un nombre.")
+    if clase.nombre in TRABAJOS and type(TRABAJOS[clase.nombre]) is not clase:
+        raise ValueError(f"Ya hay un trabajo registrado como '{clase.nombre}'.")
+    TRABAJOS[clase.nombre] = clase()
+    return clase
+
+
+def obtener(nombre):
+    try:
+        return TRABAJOS[nombre]
+    except KeyError:
+        raise LookupError(f"No hay un trabajo registrado como '{nombre}'.")
+
+
+def opciones():
+    return sorted((nombre, trabajo.descripcion or nombre) for nombre, trabajo in TRABAJOS.items())
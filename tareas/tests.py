@@ -0,0 +1,187 @@
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import registro
+from .cola import (
+    ejecutar, ejecutar_siguiente, planificar, reclamar, recuperar_abandonadas, reintentar, terminar_si_completa,
+)
+from .models import ParteTarea, Tarea
+
+
+class TrabajoDePrueba(registro.Trabajo):
+    nombre = 'prueba_cola'
+    fallos = {}  # numero de parte -> error que lanza al ejecutarla
+    ejecutadas = []
+
+    def partes(self, tarea):
+        return [{'numero': numero, 'valor': valor} for numero, valor in enumerate(tarea.parametros['valores'], start=1)]
+
+    def ejecutar(self, tarea, datos):
+        self.ejecutadas.append(datos['numero'])
+        if datos['numero'] in self.fallos:
+            raise self.fallos[datos['numero']]
+        return {'filas': datos['valor'], 'partes': [datos['numero']], 'ultima': f"parte {datos['numero']}"}
+
+
+@override_settings(TAREAS_INTENTOS=3, TAREAS_ESPERA_REINTENTO=10, TAREAS_TIEMPO_MAXIMO=60)
+class ColaTareasTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        registro.registrar(TrabajoDePrueba)
+        cls.addClassCleanup(registro.TRABAJOS.pop, TrabajoDePrueba.nombre)
+
+    def setUp(self):
+        TrabajoDePrueba.fallos = {}
+        TrabajoDePrueba.ejecutadas = []
+
+    def encolar(self, *valores):
+        return Tarea.objects.create(tipo=TrabajoDePrueba.nombre, parametros={'valores': list(valores)})
+
+    def procesar(self, trabajador='trabajador-1'):
+        while ejecutar_siguiente(trabajador) is not None:
+            pass
+
+    def parte(self, tarea, numero):
+        return ParteTarea.objects.get(tarea=tarea, numero=numero)
+
+    def test_una_unidad_no_se_reclama_dos_veces(self):
+        tarea = self.encolar(1, 2)
+
+        self.assertEqual(reclamar('trabajador-1'), tarea)
+        self.assertIsNone(reclamar('trabajador-2'))
+
+        planificar(tarea, 'trabajador-1')
+        primera, segunda = reclamar('trabajador-1'), reclamar('trabajador-2')
+
+        self.assertEqual((primera.numero, primera.trabajador), (1, 'trabajador-1'))
+        self.assertEqual((segunda.numero, segunda.trabajador), (2, 'trabajador-2'))
+        self.assertIsNone(reclamar('trabajador-3'))
+
+    def test_solo_el_trabajador_que_reclamo_completa_la_parte(self):
+        tarea = self.encolar(1)
+        ejecutar_siguiente('trabajador-1')
+        parte = reclamar('trabajador-1')
+
+        ejecutar(parte, 'trabajador-2')
+
+        parte.refresh_from_db()
+        self.assertEqual((parte.estado, parte.trabajador), (ParteTarea.EN_CURSO, 'trabajador-1'))
+        self.assertEqual(Tarea.objects.get(pk=tarea.pk).partes_completadas, 0)
+
+    def test_error_reintenta_con_espera_creciente_y_luego_falla(self):
+        tarea = self.encolar(5)
+        TrabajoDePrueba.fallos = {1: RuntimeError('sin conexion')}
+        ejecutar_siguiente('trabajador-1')  # divide la tarea
+
+        for intento, espera in ((1, 10), (2, 20)):
+            antes = timezone.now()
+            ejecutar_siguiente('trabajador-1')
+            parte = self.parte(tarea, 1)
+            self.assertEqual((parte.estado, parte.intentos), (ParteTarea.PENDIENTE, intento))
+            self.assertIn('sin conexion', parte.error)
+            self.assertGreaterEqual(parte.disponible_desde, antes + timedelta(seconds=espera))
+            self.assertLessEqual(parte.disponible_desde, timezone.now() + timedelta(seconds=espera))
+            # Mientras espera no se vuelve a reclamar
+            self.assertIsNone(reclamar('trabajador-2'))
+            ParteTarea.objects.filter(pk=parte.pk).update(disponible_desde=timezone.now())
+
+        ejecutar_siguiente('trabajador-1')
+
+        parte = self.parte(tarea, 1)
+        tarea.refresh_from_db()
+        self.assertEqual((parte.estado, parte.intentos), (ParteTarea.FALLIDA, 3))
+        self.assertEqual(tarea.estado, Tarea.FALLIDA)
+        self.assertTrue(tarea.error.startswith('Parte 1:'))
+
+    def test_validation_error_falla_sin_reintentar(self):
+        tarea = self.encolar(5, 6)
+        TrabajoDePrueba.fallos = {1: ValidationError("Archivo no valido.")}
+
+        self.procesar()
+
+        parte = self.parte(tarea, 1)
+        tarea.refresh_from_db()
+        self.assertEqual((parte.estado, parte.intentos, parte.error), (ParteTarea.FALLIDA, 1, "Archivo no valido."))
+        self.assertEqual((tarea.estado, tarea.error), (Tarea.FALLIDA, "Parte 1: Archivo no valido."))
+        # Las demas partes de una tarea fallida ya no se reclaman
+        self.assertEqual(TrabajoDePrueba.ejecutadas, [1])
+
+    def test_recuperar_abandonadas(self):
+        tarea = self.encolar(5)
+        ejecutar_siguiente('trabajador-1')
+        parte = reclamar('trabajador-1')
+        ParteTarea.objects.filter(pk=parte.pk).update(reclamada_en=timezone.now() - timedelta(seconds=61))
+
+        self.assertEqual(recuperar_abandonadas(), 1)
+
+        recuperada = self.parte(tarea, 1)
+        self.assertEqual((recuperada.estado, recuperada.trabajador), (ParteTarea.PENDIENTE, ''))
+        # El trabajador que la abandono ya no puede completarla
+        ejecutar(parte, 'trabajador-1')
+        self.assertEqual(self.parte(tarea, 1).estado, ParteTarea.PENDIENTE)
+        self.procesar('trabajador-2')
+        self.assertEqual(Tarea.objects.get(pk=tarea.pk).estado, Tarea.COMPLETADA)
+
+    def test_recuperar_abandonadas_sin_intentos_falla_la_tarea(self):
+        tarea = self.encolar(5)
+        ejecutar_siguiente('trabajador-1')
+        parte = reclamar('trabajador-1')
+        ParteTarea.objects.filter(pk=parte.pk).update(intentos=3, reclamada_en=timezone.now() - timedelta(seconds=61))
+
+        self.assertEqual(recuperar_abandonadas(), 0)
+
+        self.assertEqual(self.parte(tarea, 1).estado, ParteTarea.FALLIDA)
+        self.assertEqual(Tarea.objects.get(pk=tarea.pk).estado, Tarea.FALLIDA)
+
+    def test_no_recupera_las_que_siguen_a_tiempo(self):
+        self.encolar(5)
+        ejecutar_siguiente('trabajador-1')
+        reclamar('trabajador-1')
+
+        self.assertEqual(recuperar_abandonadas(), 0)
+
+    def test_reintentar_repite_solo_las_partes_sin_completar(self):
+        tarea = self.encolar(1, 2, 3)
+        TrabajoDePrueba.fallos = {2: ValidationError("Falta el material.")}
+        self.procesar()
+        self.assertEqual(Tarea.objects.get(pk=tarea.pk).estado, Tarea.FALLIDA)
+        self.assertEqual(TrabajoDePrueba.ejecutadas, [1, 2])
+
+        TrabajoDePrueba.fallos = {}
+        TrabajoDePrueba.ejecutadas = []
+        self.assertEqual(reintentar(Tarea.objects.filter(pk=tarea.pk)), 1)
+        self.procesar()
+
+        tarea.refresh_from_db()
+        self.assertEqual(TrabajoDePrueba.ejecutadas, [2, 3])
+        self.assertEqual((tarea.estado, tarea.partes_completadas, tarea.error), (Tarea.COMPLETADA, 3, ''))
+        self.assertEqual(tarea.resultado['filas'], 6)
+
+    def test_terminar_si_completa_combina_los_resultados_de_las_partes(self):
+        tarea = self.encolar(4, 5, 6)
+        ejecutar_siguiente('trabajador-1')
+        ejecutar_siguiente('trabajador-1')
+
+        self.assertFalse(terminar_si_completa(tarea))
+        self.assertEqual(Tarea.objects.get(pk=tarea.pk).progreso, 33)
+
+        self.procesar()
+
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, Tarea.COMPLETADA)
+        self.assertEqual(tarea.progreso, 100)
+        # Los numeros se suman, las listas se juntan en orden de parte y lo demas queda el de la ultima
+        self.assertEqual(tarea.resultado, {'filas': 15, 'partes': [1, 2, 3], 'ultima': 'parte 3'})
+        self.assertFalse(terminar_si_completa(tarea))
+
+    def test_tarea_sin_partes_se_completa_al_dividirla(self):
+        tarea = self.encolar()
+
+        self.procesar()
+
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.total_partes, tarea.resultado), (Tarea.COMPLETADA, 0, {}))